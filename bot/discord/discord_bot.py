@@ -8,6 +8,9 @@ from discord import app_commands
 import asyncio
 import sys
 import sqlite3
+import time
+import psutil
+from collections import OrderedDict
 from pathlib import Path
 
 # 添加 shared 目录到 Python 路径
@@ -17,19 +20,28 @@ from shared.config import Config
 from shared.logger import get_logger
 from shared.message_queue import MessageQueue, Message, MessageDirection, MessageStatus, MessageTag, ChannelType, AttachmentInfo
 from shared.file_mapping import FileMapping
+from shared.attachment_store import AttachmentStore
 from shared.cron_scheduler import BotCronScheduler
 from bot.discord.discord_commands import DiscordCommandsMixin
 from bot.discord.discord_message_handlers import DiscordMessageHandlersMixin
 from bot.discord.discord_pollers import DiscordPollersMixin
 from bot.discord.discord_sequence_sender import DiscordSequenceSenderMixin
+from bot.discord.discord_live_edit import DiscordLiveEditMixin
+from bot.discord.discord_tool_activity import DiscordToolActivityMixin
+from bot.discord.discord_resolver import DiscordDestinationResolver
+from bot.discord.discord_downloader import AttachmentDownloader
+from bot.discord.discord_typing import DiscordTypingMultiplexer
+from bot.discord.discord_sticker_cache import StickerUploadCache
 
 log = get_logger("DiscordBot", "discord")
 
 
 class DiscordBot(
-    discord.Client,
+    discord.AutoShardedClient,
     DiscordPollersMixin,
     DiscordSequenceSenderMixin,
+    DiscordLiveEditMixin,
+    DiscordToolActivityMixin,
     DiscordMessageHandlersMixin,
     DiscordCommandsMixin,
 ):
@@ -40,10 +52,26 @@ class DiscordBot(
         intents = discord.Intents.default()
         intents.message_content = True  # 需要在 Discord Developer Portal 启用
         intents.messages = True
+        intents.members = config.discord_intent_members  # 特权 Intent
+        intents.presences = config.discord_intent_presences  # 特权 Intent
+        intents.typing = config.discord_intent_typing
+
+        shard_ids = config.discord_shard_ids
+        if shard_ids and not config.discord_shard_count:
+            raise ValueError("配置了 discord.sharding.shard_ids 时必须同时设置 shard_count")
 
         super().__init__(
-            intents=intents
+            intents=intents,
+            shard_count=config.discord_shard_count,  # None = 使用 Discord 推荐的分片数
+            shard_ids=shard_ids,
+            max_messages=config.discord_max_messages,
+            member_cache_flags=(
+                discord.MemberCacheFlags.from_intents(intents)
+                if config.discord_cache_members else discord.MemberCacheFlags.none()
+            ),
+            chunk_guilds_at_startup=config.discord_chunk_guilds_at_startup
         )
+        self.started_at = time.monotonic()  # 用于统计启动耗时
 
         # 手动创建命令树（discord.Client 需要，commands.Bot 自带）
         self.tree = app_commands.CommandTree(self)
@@ -51,12 +79,38 @@ class DiscordBot(
         self.config = config
         self.message_queue = MessageQueue(config.database_path)
         self.file_mapping = FileMapping()  # 文件映射表管理器
+        self.resolver = DiscordDestinationResolver(self)  # 用户/私聊/频道解析缓存
+        self.attachment_store = AttachmentStore(  # 内容寻址附件存储（去重 + LRU 淘汰）
+            config.database_path,
+            config.default_download_directory,
+            config.attachment_store_budget
+        ) if config.attachment_store_enabled else None
+        self.attachment_downloader = AttachmentDownloader(  # 附件下载服务（共享 HTTP 会话）
+            self.file_mapping,
+            max_concurrent=config.file_download_max_concurrent,
+            chunk_size=config.file_download_chunk_size,
+            store=self.attachment_store
+        )
+        self.attachment_prefetch_tasks = set()  # 后台附件下载任务
+        self.sticker_cache = StickerUploadCache(  # 表情包 CDN 地址缓存（避免重复上传）
+            config.database_path
+        ) if config.sticker_cache_enabled else None
+        self.typing_multiplexer = DiscordTypingMultiplexer(  # 按目的地共享的 typing indicator 循环
+            max_retries=config.typing_indicator_max_retries,
+            retry_delay=config.typing_indicator_retry_delay
+        )
         self.response_check_task = None
         self.file_request_check_task = None
         self.file_download_check_task = None
         self.message_request_check_task = None  # 新增：消息发送请求检查任务
         self.pending_messages = {}  # 追踪待处理的消息 {message_id: {"channel": channel, "user_msg": message, "start_time": time}}
         self.stop_requests = {}  # 追踪停止请求 {user_id: {"timestamp": time}}
+        self.warmup_hint_times = {}  # 会话预热提示节流 {session_key: 上次发布时间}
+        self.live_edit_states = {}  # 实时编辑状态 {message_id: 预览状态}
+        self.live_edit_task = None
+        self.tool_card_cache = OrderedDict()  # 工具调用卡片消息对象 {(message_id, tool_use_index): discord.Message}
+        self.tool_activity = {}  # compact 模式的工具活动卡片 {message_id: 卡片状态}
+        self.tool_activity_task = None
 
         # ⏰ 定时任务调度器
         self.cron_scheduler = None
@@ -66,24 +120,31 @@ class DiscordBot(
         """Bot 启动后的钩子"""
         log.log(f"Bot 已启动，登录为 {self.user}")
 
+        # 多进程分片部署时，全局任务只由负责分片 0 的进程执行
+        primary = self._is_primary_process()
+        if not primary:
+            log.log(f"🧩 本进程负责分片 {self.shard_ids}，跳过卡住消息清理、命令同步和定时任务（由分片 0 的进程执行）")
+
         # 清理上次崩溃时卡住的消息
-        await self.cleanup_stuck_messages()
+        if primary:
+            await self.cleanup_stuck_messages()
 
-        # 注册斜杠命令
+        # 注册斜杠命令（每个进程都需要注册才能处理自己分片的交互）
         await self.add_commands()
 
         # 同步命令到 Discord（全局同步）
-        try:
-            log.log("🔄 正在同步斜杠命令到 Discord（全局）...")
-            synced = await self.tree.sync()
-            log.log(f"✅ 已同步 {len(synced)} 个斜杠命令")
-            log.log(f"⏱️  注意：全局命令可能需要 1-5 分钟才能生效")
+        if primary:
+            try:
+                log.log("🔄 正在同步斜杠命令到 Discord（全局）...")
+                synced = await self.tree.sync()
+                log.log(f"✅ 已同步 {len(synced)} 个斜杠命令")
+                log.log(f"⏱️  注意：全局命令可能需要 1-5 分钟才能生效")
 
-        except Exception as e:
-            log.log(f"⚠️ 命令同步失败: {e}")
-            log.log(f"📋 请确认：")
-            log.log(f"   1. Bot Token 是否正确")
-            log.log(f"   2. 是否已在 Discord Developer Portal 启用 'applications.commands' scope")
+            except Exception as e:
+                log.log(f"⚠️ 命令同步失败: {e}")
+                log.log(f"📋 请确认：")
+                log.log(f"   1. Bot Token 是否正确")
+                log.log(f"   2. 是否已在 Discord Developer Portal 启用 'applications.commands' scope")
 
         # 启动响应检查任务
         self.response_check_task = asyncio.create_task(self.check_responses())
@@ -100,17 +161,26 @@ class DiscordBot(
         # 🔥 启动工具执行结果检查任务
         self.tool_result_check_task = asyncio.create_task(self.check_tool_use_results())
 
+        # ✏️ 启动实时编辑任务（流式预览）
+        if self.config.live_edit_enabled:
+            self.live_edit_task = asyncio.create_task(self.check_live_edits())
+
+        # 🧰 启动工具活动卡片任务（compact 模式）
+        if self._is_compact_tool_mode():
+            self.tool_activity_task = asyncio.create_task(self.check_tool_activity())
+
         # ⏰ 启动定时任务调度器
-        try:
-            tasks_file = Path(__file__).parent.parent.parent / "shared" / "cron_jobs.json"
-            self.cron_scheduler = BotCronScheduler(str(tasks_file))
-            await self.cron_scheduler.start()
+        if primary:
+            try:
+                tasks_file = Path(__file__).parent.parent.parent / "shared" / "cron_jobs.json"
+                self.cron_scheduler = BotCronScheduler(str(tasks_file))
+                await self.cron_scheduler.start()
 
-            # 启动任务文件扫描任务
-            self.cron_scan_task = asyncio.create_task(self.cron_scheduler.scan_loop())
-        except Exception as e:
-            log.log(f"⚠️  定时任务调度器启动失败: {e}")
-            self.cron_scheduler = None
+                # 启动任务文件扫描任务
+                self.cron_scan_task = asyncio.create_task(self.cron_scheduler.scan_loop())
+            except Exception as e:
+                log.log(f"⚠️  定时任务调度器启动失败: {e}")
+                self.cron_scheduler = None
 
     async def cleanup_stuck_messages(self):
         """清理上次崩溃时卡住的消息"""
@@ -186,18 +256,26 @@ class DiscordBot(
         except Exception as e:
             log.log(f"⚠️ 清理卡住消息时出错: {e}")
 
-    async def _send_long_message(self, channel, content: str):
-        """发送长消息，自动分割超过 2000 字符的消息"""
+    def _split_long_message(self, content: str, max_length: int = 1000) -> list:
+        """将长消息分割为不超过 max_length 字符的多条（按行分割，保留代码块结构）
+
+        Args:
+            content: 消息内容
+            max_length: 单条消息最大长度
+
+        Returns:
+            分割后的消息列表（内容为空时返回空列表）
+        """
         if not content or not content.strip():
-            return
+            return []
 
         content = content.strip()
 
-        # Discord 消息长度限制（设置为 1000 以提前分割）
-        MAX_LENGTH = 1000
+        # Discord 消息长度限制
+        MAX_LENGTH = max_length
 
         if len(content) <= MAX_LENGTH:
-            await channel.send(content)
+            return [content]
         else:
             # 分割长消息
             parts = []
@@ -248,23 +326,47 @@ class DiscordBot(
             if current_part.strip():
                 parts.append(current_part.strip())
 
-            # 发送所有部分
-            for i, part in enumerate(parts, 1):
-                if part:
-                    try:
-                        await channel.send(part[:MAX_LENGTH])
-                        # 如果不是最后一部分，稍微延迟一下
-                        if i < len(parts):
-                            await asyncio.sleep(0.5)
-                    except discord.errors.HTTPException as e:
-                        log.log(f"❌ 发送消息部分 {i}/{len(parts)} 失败: {e}")
-                        # 尝试再次强制分割
-                        if len(part) > MAX_LENGTH:
-                            for j in range(0, len(part), MAX_LENGTH):
-                                try:
-                                    await channel.send(part[j:j+MAX_LENGTH])
-                                except Exception:
-                                    pass
+            return [part for part in parts if part]
+
+    async def _send_long_message(self, channel, content: str, max_length: int = 1000) -> int:
+        """发送长消息，自动分割超过 max_length 字符的消息
+
+        Args:
+            channel: 目标频道
+            content: 消息内容
+            max_length: 单条消息最大长度（默认 1000 以提前分割，合并发送时最大 2000）
+
+        Returns:
+            实际发送的消息条数
+        """
+        parts = self._split_long_message(content, max_length)
+        if not parts:
+            return 0
+
+        MAX_LENGTH = max_length
+
+        if len(parts) == 1:
+            await channel.send(parts[0])
+            return 1
+
+        # 发送所有部分
+        for i, part in enumerate(parts, 1):
+            if part:
+                try:
+                    await channel.send(part[:MAX_LENGTH])
+                    # 如果不是最后一部分，稍微延迟一下
+                    if i < len(parts):
+                        await asyncio.sleep(0.5)
+                except discord.errors.HTTPException as e:
+                    log.log(f"❌ 发送消息部分 {i}/{len(parts)} 失败: {e}")
+                    # 尝试再次强制分割
+                    if len(part) > MAX_LENGTH:
+                        for j in range(0, len(part), MAX_LENGTH):
+                            try:
+                                await channel.send(part[j:j+MAX_LENGTH])
+                            except Exception:
+                                pass
+        return len(parts)
 
     async def send_startup_notification(self):
         """发送启动通知"""
@@ -341,10 +443,17 @@ class DiscordBot(
             except Exception as e:
                 log.log(f"❌ 发送到用户私聊失败: {e}")
 
+    async def on_shard_ready(self, shard_id: int):
+        """单个分片准备就绪"""
+        guild_count = sum(1 for guild in self.guilds if guild.shard_id == shard_id)
+        log.log(f"✓ 分片 {shard_id}/{self.shard_count} 已就绪（{guild_count} 个服务器，启动耗时 {time.monotonic() - self.started_at:.1f} 秒）")
+
     async def on_ready(self):
-        """Bot 准备就绪"""
+        """Bot 准备就绪（所有分片均已就绪）"""
+        rss_mb = psutil.Process().memory_info().rss / 1024 / 1024
         log.log(f"✓ Bot 已准备就绪!")
-        log.log(f"✓ 在 {len(self.guilds)} 个服务器中")
+        log.log(f"✓ 在 {len(self.guilds)} 个服务器中（分片 {sorted(self.shards)} / 共 {self.shard_count} 个）")
+        log.log(f"📊 启动耗时 {time.monotonic() - self.started_at:.1f} 秒，内存占用 {rss_mb:.1f} MB，缓存消息上限 {self.config.discord_max_messages or 0} 条")
         log.log(f"✓ 斜杠命令: /new, /status, /stop, /restart, /abort, /mention")
         log.log(f"✓ 上下文菜单: 下载附件")
 
@@ -388,6 +497,22 @@ class DiscordBot(
             # 处理普通消息
             await self.handle_user_message(message)
 
+    async def on_typing(self, channel, user, when):
+        """用户正在输入：发布会话预热提示"""
+        if user == self.user or not self.config.session_warmup_enabled:
+            return
+        self.publish_warmup_hint(channel, user)
+
+    async def on_guild_channel_delete(self, channel):
+        """频道被删除：移除解析缓存"""
+        self.resolver.invalidate("channel", channel.id)
+
+    async def on_private_channel_delete(self, channel):
+        """私聊频道被删除：移除解析缓存"""
+        self.resolver.invalidate("channel", channel.id)
+        if channel.recipient:
+            self.resolver.invalidate("dm", channel.recipient.id)
+
     async def on_close(self):
         """Bot 关闭时的清理"""
         if self.response_check_task:
@@ -400,8 +525,20 @@ class DiscordBot(
             self.message_request_check_task.cancel()
         if hasattr(self, 'sequence_check_task') and self.sequence_check_task:
             self.sequence_check_task.cancel()
+        for sender in list(getattr(self, 'destination_senders', {}).values()):
+            sender.cancel()
         if hasattr(self, 'tool_result_check_task') and self.tool_result_check_task:
             self.tool_result_check_task.cancel()
+        if self.live_edit_task:
+            self.live_edit_task.cancel()
+        if self.tool_activity_task:
+            self.tool_activity_task.cancel()
+        self.typing_multiplexer.stop_all()
+
+        # 关闭附件下载服务的 HTTP 会话
+        await self.attachment_downloader.close()
+        if self.sticker_cache:
+            await self.sticker_cache.close()
 
         # ⏰ 停止定时任务调度器
         if self.cron_scheduler:
@@ -405,7 +405,6 @@ class DiscordCommandsMixin:
         @self.tree.context_menu(name="下载附件")
         async def download_context_menu(interaction: discord.Interaction, message: discord.Message):
             """右键消息下载附件（上下文菜单）"""
-            import aiohttp
             from pathlib import Path
 
             log.log(f"[下载命令] 用户 {interaction.user.display_name} 右键点击消息 {message.id}")
@@ -420,10 +419,6 @@ class DiscordCommandsMixin:
 
             # 使用配置的默认下载目录
             save_dir = Path(self.config.default_download_directory)
-            save_dir.mkdir(parents=True, exist_ok=True)
-
-            downloaded_files = []
-            failed_files = []
 
             # 先响应，告知用户正在处理
             await interaction.response.send_message(
@@ -432,55 +427,10 @@ class DiscordCommandsMixin:
             # 获取原始消息以便后续编辑
             status_message = await interaction.original_response()
 
-            # 下载所有附件
-            async with aiohttp.ClientSession() as session:
-                for attachment in message.attachments:
-                    try:
-                        # 检查映射表中是否已有该附件的本地文件名
-                        mapped_filename = self.file_mapping.get_local_filename(attachment.id)
-                        if mapped_filename:
-                            # 使用映射表中的文件名
-                            local_path = save_dir / mapped_filename
-                            log.log(f"[下载命令] 使用已映射文件名: {mapped_filename}")
-                        else:
-                            # 处理文件名冲突
-                            local_path = save_dir / attachment.filename
-                            counter = 1
-                            original_stem = Path(attachment.filename).stem
-                            original_suffix = Path(attachment.filename).suffix
-
-                            # 检查文件是否存在，如存在则添加后缀
-                            while local_path.exists():
-                                local_path = save_dir / f"{original_stem}_{counter}{original_suffix}"
-                                counter += 1
-
-                            # 记录映射关系
-                            self.file_mapping.set_local_filename(attachment.id, local_path.name)
-
-                        # 下载文件
-                        async with session.get(attachment.url) as resp:
-                            if resp.status == 200:
-                                file_content = await resp.read()
-                                with open(local_path, 'wb') as f:
-                                    f.write(file_content)
-
-                                downloaded_files.append({
-                                    "id": attachment.id,
-                                    "filename": attachment.filename,
-                                    "local_filename": local_path.name,
-                                    "local_path": str(local_path),
-                                    "size": len(file_content)
-                                })
-                                log.log(f"[下载命令] ✓ 已下载: {attachment.filename} -> {local_path}")
-                            else:
-                                raise ValueError(f"HTTP {resp.status}")
-
-                    except Exception as e:
-                        failed_files.append({
-                            "filename": attachment.filename,
-                            "error": str(e)
-                        })
-                        log.log(f"[下载命令] ✗ 下载失败: {attachment.filename} - {e}")
+            # 并发下载所有附件（共享下载服务，流式写入磁盘）
+            downloaded_files, failed_files = await self.attachment_downloader.download_attachments(
+                message.attachments, save_dir
+            )
 
             # 构建响应消息
             response_lines = [
@@ -0,0 +1,190 @@
+"""
+Discord Bot - 附件下载服务
+共享连接池的 HTTP 会话，多个附件并发下载，分块流式写入磁盘（不阻塞事件循环）
+"""
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import aiofiles
+import aiohttp
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class AttachmentDownloader:
+    """附件下载服务
+
+    - 所有下载共用一个 aiohttp 会话（连接池复用）
+    - 同一批附件并发下载，全局并发数受 max_concurrent 限制
+    - 响应按块读取，经 aiofiles 写入临时文件，完成后重命名为目标文件
+    - 每批下载完成后输出总大小、耗时和吞吐量
+    """
+
+    def __init__(self, file_mapping, max_concurrent: int = 3, chunk_size: int = 256 * 1024, store=None):
+        self.file_mapping = file_mapping
+        self.store = store  # 内容寻址附件存储（AttachmentStore，可选）
+        self.chunk_size = chunk_size
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self._max_concurrent = max(1, max_concurrent)
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享 HTTP 会话（首次使用时创建）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._max_concurrent * 2)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """关闭共享 HTTP 会话"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def resolve_local_path(self, attachment, save_dir: Path, reserved: set = None) -> Path:
+        """
+        确定附件的本地保存路径（优先使用映射表中的文件名，否则处理重名并记录映射）
+
+        Args:
+            attachment: Discord 附件
+            save_dir: 保存目录
+            reserved: 同一批次中已分配的路径（避免并发下载时重名文件互相覆盖）
+        """
+        reserved = reserved if reserved is not None else set()
+
+        mapped_filename = self.file_mapping.get_local_filename(attachment.id)
+        if mapped_filename:
+            log.log(f"[附件下载] 使用已映射文件名: {mapped_filename}")
+            return save_dir / mapped_filename
+
+        # 处理文件名冲突
+        local_path = save_dir / attachment.filename
+        counter = 1
+        original_stem = Path(attachment.filename).stem
+        original_suffix = Path(attachment.filename).suffix
+        while local_path.exists() or local_path in reserved:
+            local_path = save_dir / f"{original_stem}_{counter}{original_suffix}"
+            counter += 1
+
+        # 记录映射关系
+        self.file_mapping.set_local_filename(attachment.id, local_path.name)
+        return local_path
+
+    def plan_downloads(self, attachments, save_dir: Path) -> List[Tuple[object, Path]]:
+        """
+        为一批附件分配本地保存路径（不下载）
+
+        Returns:
+            [(attachment, local_path)]，按附件原顺序排列
+        """
+        save_dir.mkdir(parents=True, exist_ok=True)
+        reserved = set()
+        targets = []
+        for attachment in attachments:
+            local_path = self.resolve_local_path(attachment, save_dir, reserved)
+            reserved.add(local_path)
+            targets.append((attachment, local_path))
+        return targets
+
+    async def download(self, url: str, local_path: Path, source_key=None) -> int:
+        """
+        流式下载单个文件
+
+        Args:
+            url: 下载地址
+            local_path: 保存路径
+            source_key: Discord 附件 ID（启用附件存储时用于命中已下载文件和记录来源）
+
+        Returns:
+            写入的字节数
+        """
+        loop = asyncio.get_running_loop()
+
+        # 附件已在存储中（同一附件再次引用）：不重复下载
+        if self.store and source_key is not None and local_path.exists():
+            if await loop.run_in_executor(None, self.store.touch, str(local_path)):
+                log.log(f"[附件下载] ♻️ 已存在，跳过下载: {local_path.name}")
+                return local_path.stat().st_size
+
+        temp_path = local_path.with_name(local_path.name + ".part")
+        size = 0
+        async with self._semaphore:
+            session = self._get_session()
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    raise ValueError(f"HTTP {resp.status}")
+                try:
+                    async with aiofiles.open(temp_path, 'wb') as f:
+                        async for chunk in resp.content.iter_chunked(self.chunk_size):
+                            await f.write(chunk)
+                            size += len(chunk)
+                    os.replace(temp_path, local_path)
+                except BaseException:
+                    if temp_path.exists():
+                        temp_path.unlink()
+                    raise
+
+        # 纳入内容寻址存储（哈希和链接在线程中进行，不阻塞事件循环）
+        if self.store:
+            try:
+                await loop.run_in_executor(None, self.store.ingest, str(local_path), 'discord', source_key)
+            except Exception as e:
+                log.log(f"⚠️ 附件存入存储失败: {local_path.name} - {e}")
+        return size
+
+    async def download_attachments(self, attachments, save_dir: Path) -> Tuple[List[dict], List[dict]]:
+        """
+        并发下载一批附件
+
+        Returns:
+            (downloaded_files, failed_files)，均按附件原顺序排列
+            downloaded_files: [{"id", "filename", "local_filename", "local_path", "size"}]
+            failed_files: [{"id", "filename", "error"}]
+        """
+        # 先按顺序分配本地路径，再并发下载
+        targets = self.plan_downloads(attachments, save_dir)
+        return await self.download_targets(targets)
+
+    async def download_targets(self, targets: List[Tuple[object, Path]]) -> Tuple[List[dict], List[dict]]:
+        """
+        并发下载已分配路径的附件（plan_downloads 的结果）
+
+        Returns:
+            同 download_attachments；failed_files 额外包含附件 "id"
+        """
+        start = time.monotonic()
+        results = await asyncio.gather(
+            *(self.download(attachment.url, local_path, attachment.id) for attachment, local_path in targets),
+            return_exceptions=True
+        )
+        elapsed = time.monotonic() - start
+
+        downloaded_files = []
+        failed_files = []
+        for (attachment, local_path), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                failed_files.append({"id": attachment.id, "filename": attachment.filename, "error": str(result)})
+                log.log(f"[附件下载] ✗ 下载失败: {attachment.filename} - {result}")
+                continue
+            downloaded_files.append({
+                "id": attachment.id,
+                "filename": attachment.filename,
+                "local_filename": local_path.name,
+                "local_path": str(local_path),
+                "size": result
+            })
+            log.log(f"[附件下载] ✓ 已下载: {attachment.filename} -> {local_path}")
+
+        if downloaded_files:
+            total_bytes = sum(f["size"] for f in downloaded_files)
+            speed = total_bytes / elapsed / 1024 / 1024 if elapsed > 0 else 0
+            log.log(
+                f"[附件下载] 📊 {len(downloaded_files)} 个文件，共 {total_bytes / 1024 / 1024:.2f} MB，"
+                f"耗时 {elapsed:.2f} 秒，吞吐 {speed:.2f} MB/s"
+            )
+
+        return downloaded_files, failed_files
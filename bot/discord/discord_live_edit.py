@@ -0,0 +1,199 @@
+"""
+Discord Bot - 实时编辑模块
+AI 输出文本块的过程中，先发送一条预览消息并随文本增量持续编辑，
+文本块完成后由序列发送模块把预览消息原地编辑为正式内容
+"""
+import asyncio
+import time
+import traceback
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class DiscordLiveEditMixin:
+    """实时编辑（流式预览）Mixin"""
+
+    # 单条预览消息的最大长度（预留光标和余量，Discord 上限 2000）
+    LIVE_EDIT_CHUNK_LENGTH = 1900
+    # 预览末尾的光标
+    LIVE_EDIT_CURSOR = " ▌"
+
+    def _get_live_edit_state(self, message_id: int) -> dict:
+        """获取消息的实时编辑状态（不存在时创建）"""
+        states = self.live_edit_states
+        state = states.get(message_id)
+        if state is None:
+            state = {
+                "lock": asyncio.Lock(),
+                "block": 0,  # 当前预览的文本块编号
+                "finalized_upto": 0,  # 已由正式序列替换的文本块编号
+                "messages": [],  # 预览消息对象（超长时多条）
+                "chunks": [],  # 各条预览消息当前显示的内容
+                "last_edit": 0.0,
+            }
+            states[message_id] = state
+        return state
+
+    async def check_live_edits(self):
+        """轮询流式预览并编辑 Discord 预览消息"""
+        await self.wait_until_ready()
+
+        log.log("✏️ 实时编辑任务已启动")
+
+        while not self.is_closed():
+            try:
+                previews = self.message_queue.get_stream_previews('discord')
+                for preview in previews:
+                    # 跳过其他进程分片负责的目的地
+                    if not await self._owns_destination(preview):
+                        continue
+                    await self._update_live_preview(preview)
+
+                await asyncio.sleep(0.3 if previews else 0.5)
+
+            except Exception as e:
+                log.log(f"❌ 实时编辑出错: {e}")
+                traceback.print_exc()
+                await asyncio.sleep(5)
+
+    async def _update_live_preview(self, preview: dict):
+        """根据最新的预览文本编辑（或新建）预览消息"""
+        message_id = preview["id"]
+        pending_info = self.pending_messages.get(message_id)
+        channel = pending_info.get("channel") if pending_info else None
+        if channel is None:
+            return
+
+        state = self._get_live_edit_state(message_id)
+        if preview["block"] <= state["finalized_upto"]:
+            # 该文本块已由正式序列替换
+            return
+
+        # 序列发送模块还有待发送项时不插入预览，保证消息顺序
+        if self.message_queue.get_message_sequences_stats(message_id)["pending"] > 0:
+            return
+        # 同一目的地中更早的消息还没发送完时也不插入预览（否则预览会排在更早消息的剩余内容之前）
+        if self._has_earlier_pending_messages(preview):
+            return
+
+        if time.monotonic() - state["last_edit"] < self.config.live_edit_interval:
+            return
+
+        async with state["lock"]:
+            if preview["block"] <= state["finalized_upto"]:
+                return
+
+            if preview["block"] != state["block"]:
+                # 新的文本块：之前的预览保留给正式内容替换前的过渡，重新开始
+                await self._delete_preview_messages(state)
+                state["block"] = preview["block"]
+
+            text = preview["text"].strip()
+            if not text:
+                return
+
+            chunks = [
+                text[i:i + self.LIVE_EDIT_CHUNK_LENGTH]
+                for i in range(0, len(text), self.LIVE_EDIT_CHUNK_LENGTH)
+            ]
+            chunks[-1] += self.LIVE_EDIT_CURSOR
+
+            rate_limiter = getattr(self, "rate_limiter", None)
+            for index, chunk in enumerate(chunks):
+                if index < len(state["chunks"]) and state["chunks"][index] == chunk:
+                    continue
+                if rate_limiter:
+                    await rate_limiter.acquire(channel.id)
+                if index < len(state["messages"]):
+                    await state["messages"][index].edit(content=chunk)
+                    state["chunks"][index] = chunk
+                else:
+                    # 超出单条长度：翻页发送新的预览消息
+                    sent = await channel.send(chunk)
+                    state["messages"].append(sent)
+                    state["chunks"].append(chunk)
+                if rate_limiter:
+                    rate_limiter.record(channel.id)
+
+            state["last_edit"] = time.monotonic()
+
+    def _has_earlier_pending_messages(self, preview: dict) -> bool:
+        """同一目的地队列中是否有 ID 更小、仍有待发送序列项的消息"""
+        queue = getattr(self, "destination_queues", {}).get(self._get_destination_key(preview), {})
+        return any(
+            other_id < preview["id"] and self.message_queue.get_message_sequences_stats(other_id)["pending"] > 0
+            for other_id in list(queue)
+        )
+
+    async def _delete_preview_messages(self, state: dict):
+        """删除预览消息"""
+        for preview_message in state["messages"]:
+            try:
+                await preview_message.delete()
+            except Exception as e:
+                log.log(f"⚠️ 删除预览消息失败: {e}")
+        state["messages"] = []
+        state["chunks"] = []
+
+    async def _finalize_live_preview(self, message_id: int, final_parts: list = None, channel=None) -> int:
+        """
+        正式序列即将发送：把预览消息原地编辑为正式内容，后续不再显示该文本块的预览
+
+        正式内容按顺序编辑进已有的预览消息，多出的部分发送新消息，用不完的预览消息删除；
+        下一项不是文本（final_parts 为 None）时只删除预览
+
+        Args:
+            message_id: 消息 ID
+            final_parts: 正式文本分割后的各条内容（None 表示不替换）
+            channel: 发送溢出内容的频道
+
+        Returns:
+            已交付正式内容的 Discord 消息条数（0 表示没有预览可替换，需要正常发送）
+        """
+        state = self.live_edit_states.get(message_id)
+        if state is None:
+            return 0
+        async with state["lock"]:
+            state["finalized_upto"] = max(state["finalized_upto"], state["block"])
+            if not state["messages"]:
+                return 0
+            if not final_parts or channel is None:
+                await self._delete_preview_messages(state)
+                return 0
+
+            previews = state["messages"]
+            delivered = 0
+            for index, part in enumerate(final_parts):
+                edited = False
+                if index < len(previews):
+                    try:
+                        await previews[index].edit(content=part)
+                        edited = True
+                    except Exception as e:
+                        # 预览消息已被删除等情况：改为发送新消息
+                        log.log(f"⚠️ 编辑预览消息失败，改为发送新消息: {e}")
+                if not edited:
+                    await channel.send(part)
+                delivered += 1
+
+            # 删除用不完的预览消息
+            state["messages"] = previews[len(final_parts):]
+            await self._delete_preview_messages(state)
+            return delivered
+
+    async def _drop_live_preview(self, message_id: int):
+        """消息结束或失败：删除还没替换为正式内容的预览消息（如中断时的半截文本块），并丢弃实时编辑状态"""
+        state = self.live_edit_states.pop(message_id, None)
+        if state is None:
+            return
+        async with state["lock"]:
+            # 等待同一把锁的预览更新随后直接返回，不再发送新的预览
+            state["finalized_upto"] = float("inf")
+            if state["messages"]:
+                await self._delete_preview_messages(state)
@@ -4,13 +4,13 @@ Discord Bot - 消息处理模块
 """
 import discord
 import asyncio
-import aiohttp
+import time
 from pathlib import Path
 import sys
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from shared.message_queue import Message, MessageDirection, MessageStatus, MessageTag, ChannelType, AttachmentInfo
+from shared.message_queue import Message, MessageDirection, MessageStatus, MessageTag, ChannelType, AttachmentInfo, AttachmentStatus
 from shared.logger import get_logger
 
 log = get_logger("DiscordBot", "discord")
@@ -19,10 +19,43 @@ log = get_logger("DiscordBot", "discord")
 class DiscordMessageHandlersMixin:
     """消息处理 Mixin"""
 
+    def publish_warmup_hint(self, channel, user):
+        """发布会话预热提示（用户可能即将发送消息）
+
+        只对真正会触发对话的场景发布：私聊，或不需要 @ 的允许频道。
+        同一会话在 hint_interval 秒内只发布一次。
+        """
+        is_dm = isinstance(channel, discord.DMChannel)
+
+        if not is_dm:
+            if self.config.allowed_channels and channel.id not in self.config.allowed_channels:
+                return
+            if self.message_queue.get_channel_mention_required(channel.id, default=self.config.mention_required):
+                return
+        if self.config.allowed_users and user.id not in self.config.allowed_users:
+            return
+
+        session_key = f"dm_{user.id}" if is_dm else f"channel_{channel.id}"
+        now = asyncio.get_event_loop().time()
+        last = self.warmup_hint_times.get(session_key)
+        if last is not None and now - last < self.config.session_warmup_hint_interval:
+            return
+        self.warmup_hint_times[session_key] = now
+
+        try:
+            self.message_queue.add_warmup_hint(
+                session_key,
+                channel_id=None if is_dm else channel.id,
+                user_id=user.id if is_dm else None,
+                is_dm=is_dm,
+                channel_type=ChannelType.DISCORD.value
+            )
+        except Exception as e:
+            log.log(f"⚠️ 发布会话预热提示失败: {e}")
+
     async def handle_user_message(self, message: discord.Message):
         """处理用户消息"""
         try:
-            import aiohttp
             from pathlib import Path
 
             # 移除 bot 提及，提取实际内容
@@ -41,69 +74,22 @@ class DiscordMessageHandlersMixin:
 
                 # 使用配置的默认下载目录
                 save_dir = Path(self.config.default_download_directory)
-                save_dir.mkdir(parents=True, exist_ok=True)
-
-                downloaded_files = []
-
-                # 下载所有附件
-                async with aiohttp.ClientSession() as session:
-                    for attachment in message.attachments:
-                        try:
-                            # 检查映射表中是否已有该附件的本地文件名
-                            mapped_filename = self.file_mapping.get_local_filename(attachment.id)
-                            if mapped_filename:
-                                # 使用映射表中的文件名
-                                local_path = save_dir / mapped_filename
-                                log.log(f"[附件下载] 使用已映射文件名: {mapped_filename}")
-                            else:
-                                # 处理文件名冲突
-                                local_path = save_dir / attachment.filename
-                                counter = 1
-                                original_stem = Path(attachment.filename).stem
-                                original_suffix = Path(attachment.filename).suffix
-
-                                # 检查文件是否存在，如存在则添加后缀
-                                while local_path.exists():
-                                    local_path = save_dir / f"{original_stem}_{counter}{original_suffix}"
-                                    counter += 1
-
-                                # 记录映射关系
-                                self.file_mapping.set_local_filename(attachment.id, local_path.name)
-
-                            # 下载文件
-                            async with session.get(attachment.url) as resp:
-                                if resp.status == 200:
-                                    file_content = await resp.read()
-                                    with open(local_path, 'wb') as f:
-                                        f.write(file_content)
-
-                                    downloaded_files.append({
-                                        "id": attachment.id,
-                                        "filename": attachment.filename,
-                                        "local_filename": local_path.name,
-                                        "local_path": str(local_path),
-                                        "size": len(file_content)
-                                    })
-                                    log.log(f"[附件下载] ✓ 已下载: {attachment.filename} -> {local_path}")
-                                else:
-                                    raise ValueError(f"HTTP {resp.status}")
-
-                        except Exception as e:
-                            log.log(f"[附件下载] ✗ 下载失败: {attachment.filename} - {e}")
-
-                # 构建附件信息对象列表
-                if downloaded_files:
-                    attachment_infos = []
-                    for f in downloaded_files:
-                        attachment_infos.append(AttachmentInfo(
-                            id=f['id'],
-                            filename=f['local_filename'],  # 使用本地文件名
-                            local_filename=f['local_filename'],
-                            size=f['size'],
-                            url=f"file://{f['local_path']}",  # 使用本地文件路径
-                            description=None
-                        ))
-                    log.log(f"[附件处理] 成功处理 {len(attachment_infos)} 个附件")
+
+                # 先分配本地路径，附件以"下载中"状态随消息入队，下载在后台进行
+                # （Bridge 只在构建提示词前等待这些文件，下载与 CLI 启动重叠）
+                prefetch_targets = self.attachment_downloader.plan_downloads(message.attachments, save_dir)
+                attachment_infos = [
+                    AttachmentInfo(
+                        id=attachment.id,
+                        filename=local_path.name,  # 使用本地文件名
+                        local_filename=local_path.name,
+                        size=attachment.size,
+                        url=f"file://{local_path}",  # 使用本地文件路径
+                        description=None,
+                        status=AttachmentStatus.PENDING.value
+                    )
+                    for attachment, local_path in prefetch_targets
+                ]
 
             # 如果没有内容也没有附件，返回错误
             if not content and not attachment_infos:
@@ -142,14 +128,18 @@ class DiscordMessageHandlersMixin:
             # 添加到消息队列（状态为 PENDING，等待 Claude Bridge 接收）
             message_id = self.message_queue.add_message(msg)
 
+            # 后台下载附件
+            if attachment_infos:
+                prefetch_task = asyncio.create_task(self._prefetch_attachments(message_id, prefetch_targets))
+                self.attachment_prefetch_tasks.add(prefetch_task)
+                prefetch_task.add_done_callback(self.attachment_prefetch_tasks.discard)
+
             # 打印日志，包含附件信息
             attach_info = f" (+{len(attachment_infos)}个附件)" if attachment_infos else ""
             log.log(f"[消息 #{message_id}] 收到来自 {message.author.display_name} 的消息: {content[:50] if content else '(仅附件)'}...{attach_info} ({'私聊' if is_dm else '频道'})")
 
             # 不发送确认消息，直接启动 typing indicator
-            typing_task = asyncio.create_task(
-                self._maintain_typing_indicator(message.channel)
-            )
+            self.typing_multiplexer.acquire(message_id, message.channel)
 
             self.pending_messages[message_id] = {
                 "channel": message.channel,
@@ -158,7 +148,6 @@ class DiscordMessageHandlersMixin:
                 "start_time": asyncio.get_event_loop().time(),
                 "content": content[:50],
                 "notified_processing": False,
-                "typing_task": typing_task,
                 "typing_active": True,
             }
             log.log(f"[消息 #{message_id}] 已启动 typing indicator")
@@ -169,6 +158,27 @@ class DiscordMessageHandlersMixin:
             traceback.print_exc()
             await message.channel.send(f"❌ 处理消息时出错: {str(e)}")
 
+    async def _prefetch_attachments(self, message_id: int, targets: list):
+        """后台并发下载消息附件，每个文件完成后立即更新其状态（Bridge 据此等待所需文件）"""
+        async def prefetch_one(attachment, local_path):
+            try:
+                start = time.monotonic()
+                size = await self.attachment_downloader.download(attachment.url, local_path, attachment.id)
+                elapsed = max(time.monotonic() - start, 0.001)
+                self.message_queue.update_attachment_status(
+                    message_id, attachment.id, AttachmentStatus.READY.value,
+                    local_filename=local_path.name, size=size
+                )
+                log.log(f"[附件下载] ✓ 已下载: {attachment.filename} -> {local_path}（{size / 1024 / 1024:.2f} MB，{size / elapsed / 1024 / 1024:.2f} MB/s）")
+                return True
+            except Exception as e:
+                self.message_queue.update_attachment_status(message_id, attachment.id, AttachmentStatus.FAILED.value)
+                log.log(f"[附件下载] ✗ 下载失败: {attachment.filename} - {e}")
+                return False
+
+        results = await asyncio.gather(*(prefetch_one(attachment, local_path) for attachment, local_path in targets))
+        log.log(f"[消息 #{message_id}] 附件预取完成: 成功 {sum(results)} 个，失败 {len(results) - sum(results)} 个")
+
     async def handle_file_download_command(self, message: discord.Message):
         """处理附件引用消息（转发/回复消息）"""
         try:
@@ -179,17 +189,15 @@ class DiscordMessageHandlersMixin:
             log.log(f"[附件引用] 用户 {message.author.display_name} 引用了消息 {original_message_id}")
 
             # 获取原始消息
-            channel = self.get_channel(original_channel_id)
-            if not channel:
-                # 可能是私聊频道，尝试获取
-                try:
-                    channel = await self.fetch_channel(original_channel_id)
-                except discord.NotFound:
-                    await message.channel.send(f"❌ 找不到原始消息")
-                    return
-                except discord.Forbidden:
-                    await message.channel.send(f"❌ 没有权限访问原始消息")
-                    return
+            # 可能是私聊频道，缓存中找不到时通过 REST 获取
+            try:
+                channel = await self.resolver.resolve_channel(original_channel_id)
+            except discord.NotFound:
+                await message.channel.send(f"❌ 找不到原始消息")
+                return
+            except discord.Forbidden:
+                await message.channel.send(f"❌ 没有权限访问原始消息")
+                return
 
             try:
                 original_message = await channel.fetch_message(original_message_id)
@@ -286,9 +294,7 @@ class DiscordMessageHandlersMixin:
                 log.log(f"[消息 #{message_id}] 收到来自 {message.author.display_name} 的附件引用消息 ({'私聊' if is_dm else '频道'})")
 
                 # 直接回复模式（固定启用）：不发送确认消息，直接启动 typing indicator
-                typing_task = asyncio.create_task(
-                    self._maintain_typing_indicator(message.channel)
-                )
+                self.typing_multiplexer.acquire(message_id, message.channel)
 
                 self.pending_messages[message_id] = {
                     "channel": message.channel,
@@ -297,7 +303,6 @@ class DiscordMessageHandlersMixin:
                     "start_time": asyncio.get_event_loop().time(),
                     "content": content[:50] if content else "(空消息)",
                     "notified_processing": False,
-                    "typing_task": typing_task,
                     "typing_active": True,
                 }
                 log.log(f"[消息 #{message_id}] 已启动 typing indicator")
@@ -5,10 +5,8 @@ Discord Bot - 后台轮询任务模块
 import discord
 import asyncio
 import json
-import sqlite3
 import os
 import traceback
-import aiohttp
 import sys
 from pathlib import Path
 
@@ -26,59 +24,138 @@ log = get_logger("DiscordBot", "discord")
 class DiscordPollersMixin:
     """后台轮询任务 Mixin"""
 
+    # 外部消息增量扫描的分页大小
+    EXTERNAL_SCAN_PAGE_SIZE = 200
+    # 外部消息需要追踪的状态（未进入终态）
+    EXTERNAL_ACTIVE_STATUSES = (
+        MessageStatus.PENDING.value,
+        MessageStatus.QUEUED.value,
+        MessageStatus.PROCESSING.value,
+        MessageStatus.AI_STARTED.value,
+    )
+
+    def _is_primary_process(self) -> bool:
+        """
+        本进程是否负责分片 0（多进程分片部署时，全局任务和私聊只由该进程处理）
+
+        全局任务：启动时清理卡住的消息、同步斜杠命令、定时任务调度
+        """
+        return not self.shard_ids or 0 in self.shard_ids
+
+    async def _owns_destination(self, message_info: dict) -> bool:
+        """
+        目的地是否由本进程的分片负责（多进程分片部署时，每个进程只处理自己分片的消息）
+
+        私聊固定由分片 0 负责；频道按所属服务器计算分片（见 _owns_channel）。
+        本进程负责全部分片时总是返回 True
+        """
+        if not self.shard_ids:
+            return True
+        if message_info['is_dm']:
+            return self._is_primary_process()
+        return await self._owns_channel(message_info['discord_channel_id'])
+
+    async def _owns_channel(self, channel_id) -> bool:
+        """
+        只知道频道 ID（不知道是否私聊）的目的地是否由本进程负责
+
+        本进程分片的服务器频道都在缓存中；缓存中找不到的频道（私聊、未缓存或已归档的子区、
+        其他分片的服务器频道）由分片 0 的进程通过 REST 获取后按服务器 ID 计算所属分片
+        """
+        if not self.shard_ids:
+            return True
+        channel = self.get_channel(int(channel_id))
+        if channel is None:
+            if not self._is_primary_process():
+                return False
+            try:
+                channel = await self.resolver.resolve_channel(int(channel_id))
+            except (discord.NotFound, discord.Forbidden):
+                # 频道不存在或无权访问：由本进程处理并报告失败
+                return True
+            except Exception as e:
+                log.log(f"⚠️ 获取频道 {channel_id} 失败，无法确定所属分片（稍后重试）: {e}")
+                return False
+        guild = getattr(channel, "guild", None)
+        if guild is None:
+            return self._is_primary_process()
+        return (guild.id >> 22) % self.shard_count in self.shard_ids
+
+    async def _owns_message_request(self, message_request) -> bool:
+        """消息发送请求的目的地是否由本进程负责（发给用户的私聊由分片 0 的进程发送）"""
+        if message_request.channel_id and not message_request.user_id:
+            return await self._owns_channel(message_request.channel_id)
+        return self._is_primary_process()
+
     async def check_responses(self):
         """定期检查 Claude 的响应和消息状态"""
         await self.wait_until_ready()
 
+        # 增量扫描状态：高水位线（已看到的最大消息 ID）+ 加载失败待重试的消息
+        high_water = 0
+        retry_messages = {}  # {message_id: message_info}
+
         while not self.is_closed():
             try:
                 # 扫描外部插入的消息（is_external=True）
-                # 查询 pending 和 processing 状态，并过滤已追踪的消息（只获取 Discord 频道）
-                conn = sqlite3.connect(self.config.database_path)
-                cursor = conn.cursor()
-                cursor.execute("""
-                               SELECT id, discord_user_id, discord_channel_id, username, content, is_dm
-                               FROM messages
-                               WHERE status IN (?, ?) AND direction = ? AND is_external = 1 AND channel_type = ?
-                               ORDER BY created_at ASC
-                               """, (MessageStatus.PENDING.value, MessageStatus.PROCESSING.value, MessageDirection.TO_CLAUDE.value, ChannelType.DISCORD.value))
-                external_messages = cursor.fetchall()
-                conn.close()
-
-                for msg_info in external_messages:
-                    msg_id, user_id, channel_id, username, content, is_dm = msg_info
+                # 只查询 ID 大于高水位线的新消息（主键范围查询，开销不随积压增长）
+                new_messages = []
+                while True:
+                    page = self.message_queue.get_external_messages_after(
+                        ChannelType.DISCORD.value, high_water, limit=self.EXTERNAL_SCAN_PAGE_SIZE
+                    )
+                    new_messages.extend(page)
+                    if page:
+                        high_water = page[-1]["id"]
+                    if len(page) < self.EXTERNAL_SCAN_PAGE_SIZE:
+                        break
+
+                # 对账：重试中的消息如果已进入终态（完成/失败等）则不再加载
+                if retry_messages:
+                    statuses = self.message_queue.get_message_statuses(list(retry_messages))
+                    for msg_id in list(retry_messages):
+                        if statuses.get(msg_id) not in self.EXTERNAL_ACTIVE_STATUSES:
+                            del retry_messages[msg_id]
+
+                candidates = list(retry_messages.values()) + [
+                    m for m in new_messages if m["status"] in self.EXTERNAL_ACTIVE_STATUSES
+                ]
+
+                for msg_info in candidates:
+                    msg_id = msg_info["id"]
+                    user_id = msg_info["discord_user_id"]
+                    channel_id = msg_info["discord_channel_id"]
+                    is_dm = msg_info["is_dm"]
+                    retry_messages.pop(msg_id, None)
+                    # 跳过其他进程分片负责的目的地
+                    if not await self._owns_destination(msg_info):
+                        continue
                     # 跳过已追踪的消息
                     if msg_id not in self.pending_messages:
                         try:
-                            if is_dm:
-                                user = self.get_user(user_id)
-                                if not user:
-                                    user = await self.fetch_user(user_id)
-                                channel = await user.create_dm()
-                            else:
-                                channel = self.get_channel(channel_id)
-                                if not channel:
-                                    log.log(f"⚠️  外部消息 #{msg_id}: 找不到频道 {channel_id}")
-                                    continue
+                            try:
+                                channel = await self.resolver.resolve(is_dm, user_id, channel_id)
+                            except (discord.NotFound, discord.Forbidden):
+                                log.log(f"⚠️  外部消息 #{msg_id}: 找不到{'用户' if is_dm else '频道'} {user_id if is_dm else channel_id}")
+                                continue
 
                             # 直接回复模式（固定启用）：不发送确认消息，直接启动 typing indicator
-                            typing_task = asyncio.create_task(
-                                self._maintain_typing_indicator(channel)
-                            )
+                            self.typing_multiplexer.acquire(msg_id, channel)
 
                             self.pending_messages[msg_id] = {
                                 "channel": channel,
                                 "user_message": None,
                                 "confirmation_msg": None,  # 无确认消息
                                 "start_time": asyncio.get_event_loop().time(),
-                                "content": content[:50],
+                                "content": msg_info["content"][:50],
                                 "notified_processing": False,
-                                "typing_task": typing_task,
                                 "typing_active": True,
                             }
-                            log.log(f"📨 [消息 #{msg_id}] 已加载外部消息: {username}")
+                            log.log(f"📨 [消息 #{msg_id}] 已加载外部消息: {msg_info['username']}")
 
                         except Exception as e:
+                            # 临时错误：下一轮重试
+                            retry_messages[msg_id] = msg_info
                             log.log(f"⚠️  外部消息 #{msg_id} 加载失败: {e}")
 
                 # 等待一段时间再检查
@@ -97,8 +174,12 @@ class DiscordPollersMixin:
 
         while not self.is_closed():
             try:
-                # 获取下一个待处理的下载请求
-                download_request = self.message_queue.get_next_file_download_request()
+                # 获取下一个由本进程负责的待处理下载请求（其他分片的请求留给对应进程）
+                download_request = None
+                for pending_request in self.message_queue.get_pending_file_download_requests():
+                    if await self._owns_channel(pending_request.discord_channel_id):
+                        download_request = pending_request
+                        break
 
                 if download_request:
                     log.log(f"📥 处理文件下载请求 #{download_request.id}")
@@ -110,18 +191,13 @@ class DiscordPollersMixin:
 
                     try:
                         # 获取 Discord 频道/私聊
-                        channel = self.get_channel(download_request.discord_channel_id)
-
-                        # 如果获取不到，尝试从用户获取（私聊情况）
-                        if not channel:
-                            # 可能是私聊频道，需要通过消息获取用户
-                            try:
-                                # 尝试获取消息来获取用户信息
-                                channel = await self.fetch_channel(download_request.discord_channel_id)
-                            except discord.NotFound:
-                                raise ValueError(f"找不到频道: {download_request.discord_channel_id}")
-                            except discord.Forbidden:
-                                raise ValueError(f"没有权限访问频道: {download_request.discord_channel_id}")
+                        # 获取不到时通过 REST 获取（私聊频道等）
+                        try:
+                            channel = await self.resolver.resolve_channel(download_request.discord_channel_id)
+                        except discord.NotFound:
+                            raise ValueError(f"找不到频道: {download_request.discord_channel_id}")
+                        except discord.Forbidden:
+                            raise ValueError(f"没有权限访问频道: {download_request.discord_channel_id}")
 
                         # 获取消息
                         try:
@@ -142,46 +218,13 @@ class DiscordPollersMixin:
                         except Exception as e:
                             raise ValueError(f"无法创建保存目录 {save_dir}: {e}")
 
-                        # 下载所有附件
-                        downloaded_files = []
-                        async with aiohttp.ClientSession() as session:
-                            for attachment in message.attachments:
-                                # 检查映射表中是否已有该附件的本地文件名
-                                mapped_filename = self.file_mapping.get_local_filename(attachment.id)
-                                if mapped_filename:
-                                    # 使用映射表中的文件名
-                                    local_path = save_dir / mapped_filename
-                                    log.log(f"  [文件下载] 使用已映射文件名: {mapped_filename}")
-                                else:
-                                    # 处理文件名冲突
-                                    local_path = save_dir / attachment.filename
-                                    counter = 1
-                                    while local_path.exists():
-                                        stem = Path(attachment.filename).stem
-                                        suffix = Path(attachment.filename).suffix
-                                        local_path = save_dir / f"{stem}_{counter}{suffix}"
-                                        counter += 1
-
-                                    # 记录映射关系
-                                    self.file_mapping.set_local_filename(attachment.id, local_path.name)
-
-                                # 下载文件
-                                async with session.get(attachment.url) as resp:
-                                    if resp.status == 200:
-                                        # 写入文件
-                                        with open(local_path, 'wb') as f:
-                                            f.write(await resp.read())
-
-                                        downloaded_files.append({
-                                            "id": attachment.id,
-                                            "filename": attachment.filename,
-                                            "local_filename": local_path.name,
-                                            "local_path": str(local_path),
-                                            "size": attachment.size
-                                        })
-                                        log.log(f"  ✓ 已下载: {attachment.filename} -> {local_path}")
-                                    else:
-                                        raise ValueError(f"下载文件失败: {attachment.filename} (HTTP {resp.status})")
+                        # 并发下载所有附件（共享下载服务，流式写入磁盘）
+                        downloaded_files, failed_files = await self.attachment_downloader.download_attachments(
+                            message.attachments, save_dir
+                        )
+                        if failed_files:
+                            failed = failed_files[0]
+                            raise ValueError(f"下载文件失败: {failed['filename']} ({failed['error']})")
 
                         # 标记为完成
                         result = json.dumps({
@@ -227,8 +270,12 @@ class DiscordPollersMixin:
 
         while not self.is_closed():
             try:
-                # 获取下一个待处理的消息请求
-                message_request = self.message_queue.get_next_message_request()
+                # 获取下一个由本进程负责的待处理消息请求（其他分片的请求留给对应进程）
+                message_request = None
+                for pending_request in self.message_queue.get_pending_message_requests():
+                    if await self._owns_message_request(pending_request):
+                        message_request = pending_request
+                        break
 
                 if message_request:
                     log.log(f"💬 处理消息请求 #{message_request.id}")
@@ -242,15 +289,14 @@ class DiscordPollersMixin:
                         # 确定发送目标
                         if message_request.user_id:
                             # 发送到用户私聊
-                            user = self.get_user(message_request.user_id)
-                            if not user:
-                                user = await self.fetch_user(message_request.user_id)
-                            target_channel = await user.create_dm()
+                            user = await self.resolver.resolve_user(message_request.user_id)
+                            target_channel = await self.resolver.resolve_dm(message_request.user_id)
                             target_info = f"用户 {user.display_name}"
                         elif message_request.channel_id:
                             # 发送到频道
-                            target_channel = self.get_channel(message_request.channel_id)
-                            if not target_channel:
+                            try:
+                                target_channel = await self.resolver.resolve_channel(message_request.channel_id)
+                            except (discord.NotFound, discord.Forbidden):
                                 raise ValueError(f"找不到频道: {message_request.channel_id}")
                             target_info = f"频道 {target_channel.name}"
                         else:
@@ -305,78 +351,64 @@ class DiscordPollersMixin:
                 traceback.print_exc()
                 await asyncio.sleep(5)
 
-    async def _maintain_typing_indicator(self, channel):
-        """
-        维持 typing indicator（仅用于直接回复模式）
-        带重试机制，网络波动时会自动恢复
-        使用持续刷新模式，避免 typing indicator 中断闪烁
-
-        Args:
-            channel: Discord 频道对象
-        """
-        retry_count = 0
-        max_retries = self.config.typing_indicator_max_retries  # 最大连续重试次数
-        retry_delay = self.config.typing_indicator_retry_delay  # 重试等待时间（秒）
-
-        try:
-            while not self.is_closed():
-                try:
-                    # Discord typing indicator 默认持续 10 秒
-                    # 我们每 8 秒刷新一次，确保有足够余量避免中断
-                    async with channel.typing():
-                        await asyncio.sleep(8)
-
-                    # 成功完成一次循环，重置重试计数
-                    retry_count = 0
-
-                except asyncio.CancelledError:
-                    # 任务被取消，正常退出
-                    break
-                except Exception as e:
-                    retry_count += 1
-                    log.log(f"⚠️ 维持 typing indicator 时出错 (第{retry_count}次): {e}")
-
-                    if retry_count >= max_retries:
-                        log.log(f"❌ 维持 typing indicator 失败，已达最大重试次数 ({max_retries})，停止尝试")
-                        break
-
-                    log.log(f"🔄 {retry_delay}秒后重试...")
-                    await asyncio.sleep(retry_delay)
-
-        except asyncio.CancelledError:
-            # 任务被取消，正常退出
-            pass
-        except Exception as e:
-            log.log(f"❌ 维持 typing indicator 时发生未预期错误: {e}")
-
     def stop_typing_indicator(self, message_id):
         """
-        停止指定消息对应的 typing indicator 任务
+        停止指定消息对应的 typing indicator
+
+        typing 循环按目的地共享（见 DiscordTypingMultiplexer），这里只释放该消息的引用，
+        目的地没有其他活跃消息时循环立即停止
 
         Args:
             message_id: 消息记录在数据库中的唯一 ID
         """
-        # 从 pending_messages 字典中找到这根消息记录并取消它的 typing_task
         if message_id in self.pending_messages:
             msg_info = self.pending_messages[message_id]
-            task = msg_info.get("typing_task")
 
             # 检查是否已经在停止状态
             if not msg_info.get("typing_active", False):
                 # 已经停止，静默返回
                 return
 
-            if task and not task.done():
-                task.cancel()  # 这会触发 _maintain_typing_indicator 中的 CancelledError
+            if self.typing_multiplexer.release(message_id):
                 log.log(f"🛑 [消息 #{message_id}] 已停止 typing indicator")
 
             # 更新状态为已停止
             msg_info["typing_active"] = False
-            msg_info["typing_task"] = None
         else:
             # 消息不在缓存中，可能已经被清理，静默返回
             pass
 
+    async def _get_tool_card_message(self, message_id: int, tool_use_index: int):
+        """获取工具调用卡片的消息对象
+
+        优先使用发送时缓存的消息对象，不在缓存中（如 Bot 重启或被淘汰）时才通过 REST 获取
+        （工具结果查询按卡片引用关联，结果出现时卡片必然已发送）
+
+        Returns:
+            discord.Message，找不到时返回 None
+        """
+        key = (message_id, tool_use_index)
+        cached = self.tool_card_cache.get(key)
+        if cached is not None:
+            self.tool_card_cache.move_to_end(key)
+            return cached
+
+        ref = self.message_queue.get_tool_use_message_ref(message_id, tool_use_index)
+        if not ref:
+            log.log(f"❌ [Bot] 未找到卡片引用: 消息 #{message_id}, 工具 #{tool_use_index}")
+            return None
+
+        # 缓存未命中：通过 REST 获取原消息
+        if ref['is_dm']:
+            channel = await self.resolver.resolve_dm(ref['channel_id'])
+        else:
+            channel = await self.resolver.resolve_channel(ref['channel_id'])
+        message = await channel.fetch_message(ref['discord_message_id'])
+
+        if message:
+            self._remember_tool_card(message_id, tool_use_index, message)
+        return message
+
     async def _update_tool_use_card(self, message_id: int, tool_use_index: int, success: bool):
         """更新工具调用卡片的状态
 
@@ -385,37 +417,8 @@ class DiscordPollersMixin:
             tool_use_index: 工具调用索引
             success: 工具执行是否成功
         """
-        # 获取保存的消息引用，带重试机制（最多10次，每次间隔1秒）
-        max_retries = 10
-        ref = None
-
-        for retry in range(max_retries):
-            ref = self.message_queue.get_tool_use_message_ref(message_id, tool_use_index)
-            if ref:
-                break
-
-            if retry < max_retries - 1:  # 不是最后一次重试
-                await asyncio.sleep(1)  # 等待1秒后重试
-            else:
-                log.log(f"❌ [Bot] 未找到卡片引用: 消息 #{message_id}, 工具 #{tool_use_index}，已达最大重试次数")
-                return  # 达到最大重试次数，放弃
-
         try:
-            # 获取原消息
-            if ref['is_dm']:
-                user = self.get_user(ref['channel_id'])
-                if not user:
-                    user = await self.fetch_user(ref['channel_id'])
-                if not user:
-                    return
-                dm_channel = await user.create_dm()
-                message = await dm_channel.fetch_message(ref['discord_message_id'])
-            else:
-                channel = self.get_channel(ref['channel_id'])
-                if not channel:
-                    return
-                message = await channel.fetch_message(ref['discord_message_id'])
-
+            message = await self._get_tool_card_message(message_id, tool_use_index)
             if not message or not message.embeds:
                 return
 
@@ -426,6 +429,8 @@ class DiscordPollersMixin:
             old_title = embed.title
             if old_title:
                 new_title = old_title.replace('🔄', '✅' if success else '❌', 1)
+                if new_title == old_title:
+                    return
 
                 # 更新 embed
                 embed.title = new_title
@@ -433,8 +438,9 @@ class DiscordPollersMixin:
                 # 更新颜色
                 embed.color = discord.Color.green() if success else discord.Color.red()
 
-                # 编辑消息
-                await message.edit(embed=embed)
+                # 编辑消息（缓存编辑后的消息对象）
+                edited = await message.edit(embed=embed)
+                self._remember_tool_card(message_id, tool_use_index, edited or message)
 
         except Exception as e:
             pass  # 静默失败，避免刷屏
@@ -453,8 +459,17 @@ class DiscordPollersMixin:
                     tool_use_index = result['tool_use_index']
                     success = result['success']
 
-                    # 更新工具调用卡片
-                    await self._update_tool_use_card(message_id, tool_use_index, success)
+                    # 跳过其他进程分片负责的卡片（由对应进程更新并标记）
+                    if not await self._owns_destination({
+                        'is_dm': result['is_dm'],
+                        'discord_channel_id': result['channel_id'],
+                    }):
+                        continue
+
+                    # compact 模式：更新活动卡片中的状态行，由活动卡片任务节流编辑
+                    if not self._set_tool_activity_result(message_id, tool_use_index, success):
+                        # 更新工具调用卡片（使用缓存的消息对象）
+                        await self._update_tool_use_card(message_id, tool_use_index, success)
 
                     # 标记为已处理
                     self.message_queue.mark_tool_use_result_processed(message_id, tool_use_index)
@@ -0,0 +1,112 @@
+"""
+Discord Bot - 发送速率追踪模块
+按路由（频道/私聊频道）追踪 Discord 消息发送的速率限制桶
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Dict
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class RouteBucket:
+    """单个路由的速率桶（滑动窗口 + 429 惩罚期）"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.sent_at = deque()  # 窗口内的发送时间戳
+        self.blocked_until = 0.0  # 收到 429 后的冷却截止时间
+
+    def _prune(self, now: float):
+        """移除窗口外的发送记录"""
+        while self.sent_at and now - self.sent_at[0] >= self.window:
+            self.sent_at.popleft()
+
+    def remaining(self, now: float) -> int:
+        """窗口内剩余可发送次数"""
+        self._prune(now)
+        return max(0, self.limit - len(self.sent_at))
+
+    def wait_time(self, now: float) -> float:
+        """距离下一个可用发送槽位的等待时间（秒）"""
+        wait = max(0.0, self.blocked_until - now)
+        if self.remaining(now) == 0:
+            wait = max(wait, self.window - (now - self.sent_at[0]))
+        return wait
+
+
+class DiscordRateLimiter:
+    """Discord 发送速率追踪器
+
+    - 按频道 ID 维护速率桶（Discord 频道发消息限制：每 5 秒 5 条）
+    - 监听 discord.http 日志中的 429 响应，对对应频道施加冷却期
+    - 桶"过热"（剩余槽位不足或处于冷却期）时，发送方可合并相邻文本减少请求数
+    """
+
+    # Discord 频道发消息的速率限制（每个频道独立）
+    CHANNEL_LIMIT = 5
+    CHANNEL_WINDOW = 5.0
+
+    # 剩余槽位小于等于此值时视为过热
+    HOT_THRESHOLD = 2
+
+    def __init__(self):
+        self.buckets: Dict[int, RouteBucket] = {}
+        self._install_429_listener()
+
+    def _bucket(self, channel_id: int) -> RouteBucket:
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            bucket = RouteBucket(self.CHANNEL_LIMIT, self.CHANNEL_WINDOW)
+            self.buckets[channel_id] = bucket
+        return bucket
+
+    def is_hot(self, channel_id: int) -> bool:
+        """频道的速率桶是否过热"""
+        now = time.monotonic()
+        bucket = self._bucket(channel_id)
+        return bucket.blocked_until > now or bucket.remaining(now) <= self.HOT_THRESHOLD
+
+    async def acquire(self, channel_id: int):
+        """等待频道有可用的发送槽位（避免触发 429 后被动重试）"""
+        bucket = self._bucket(channel_id)
+        wait = bucket.wait_time(time.monotonic())
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, channel_id: int, count: int = 1):
+        """记录频道的发送次数"""
+        now = time.monotonic()
+        bucket = self._bucket(channel_id)
+        for _ in range(count):
+            bucket.sent_at.append(now)
+        bucket._prune(now)
+
+    def penalize(self, channel_id: int, retry_after: float):
+        """收到 429：在 retry_after 秒内将频道视为过热"""
+        bucket = self._bucket(channel_id)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + retry_after)
+        log.log(f"🐢 频道 {channel_id} 触发速率限制，冷却 {retry_after:.2f} 秒")
+
+    def _install_429_listener(self):
+        """挂载 discord.http 日志监听，从 429 警告中学习各频道的冷却时间"""
+        limiter = self
+
+        class _RateLimitLogHandler(logging.Handler):
+            pattern = re.compile(r'/channels/(\d+)/.*?Retrying in ([\d.]+) seconds')
+
+            def emit(self, record):
+                try:
+                    match = self.pattern.search(record.getMessage())
+                    if match:
+                        limiter.penalize(int(match.group(1)), float(match.group(2)))
+                except Exception:
+                    pass
+
+        logging.getLogger('discord.http').addHandler(_RateLimitLogHandler(level=logging.WARNING))
@@ -0,0 +1,116 @@
+"""
+Discord Bot - 发送目的地解析模块
+缓存用户、私聊频道和频道的解析结果，避免轮询任务反复调用 fetch_user / create_dm / fetch_channel
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class _NegativeResult:
+    """缓存的失败结果（只保存异常类型和响应，不保存异常实例及其 traceback）"""
+
+    __slots__ = ("exc_type", "response", "text")
+
+    def __init__(self, exc: discord.HTTPException):
+        self.exc_type = type(exc)
+        self.response = exc.response
+        self.text = exc.text
+
+    def to_exception(self) -> discord.HTTPException:
+        """构造一个新的异常实例"""
+        return self.exc_type(self.response, self.text)
+
+
+class DiscordDestinationResolver:
+    """Discord 目的地解析器（LRU + TTL 缓存）
+
+    - 解析成功的对象缓存 TTL 秒，缓存条目数超过上限时按 LRU 淘汰
+    - 用户/频道不存在或无权限（NotFound / Forbidden）时缓存失败结果 NEGATIVE_TTL 秒，
+      期间每次抛出新的同类异常，避免对已删除的目的地反复请求
+    - 频道被删除时由 Bot 调用 invalidate 移除缓存
+    - 同一目的地的并发解析合并为一次请求（single-flight）
+    - 其他错误（网络异常等）不缓存，下次重新解析
+    """
+
+    TTL = 600
+    NEGATIVE_TTL = 120
+    MAX_SIZE = 1024
+
+    def __init__(self, client: discord.Client):
+        self.client = client
+        self._cache = OrderedDict()  # {key: (过期时间, 对象或 _NegativeResult)}
+        self._inflight = {}  # {key: asyncio.Task}
+
+    async def resolve_user(self, user_id: int) -> discord.User:
+        """解析用户（优先使用 discord.py 内存缓存）"""
+        user = self.client.get_user(user_id)
+        if user:
+            return user
+        return await self._resolve(("user", user_id), lambda: self.client.fetch_user(user_id))
+
+    async def resolve_dm(self, user_id: int) -> discord.DMChannel:
+        """解析用户的私聊频道"""
+        async def load():
+            user = await self.resolve_user(user_id)
+            return await user.create_dm()
+        return await self._resolve(("dm", user_id), load)
+
+    async def resolve_channel(self, channel_id: int):
+        """解析频道（优先使用 discord.py 内存缓存，找不到时通过 REST 获取）"""
+        channel = self.client.get_channel(channel_id)
+        if channel:
+            return channel
+        return await self._resolve(("channel", channel_id), lambda: self.client.fetch_channel(channel_id))
+
+    async def resolve(self, is_dm: bool, user_id: int, channel_id: int):
+        """按消息的目的地信息解析发送频道（私聊按用户，频道按频道）"""
+        if is_dm:
+            return await self.resolve_dm(user_id)
+        return await self.resolve_channel(channel_id)
+
+    def invalidate(self, kind: str, target_id: int):
+        """移除指定目的地的缓存（如发送时发现频道已失效）"""
+        self._cache.pop((kind, target_id), None)
+
+    async def _resolve(self, key: tuple, loader):
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                if isinstance(value, _NegativeResult):
+                    raise value.to_exception()
+                return value
+            del self._cache[key]
+
+        # 合并同一目的地的并发解析
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: tuple, loader):
+        try:
+            value = await loader()
+            self._store(key, value, self.TTL)
+            return value
+        except (discord.NotFound, discord.Forbidden) as e:
+            log.log(f"🚫 目的地不可用，暂存失败结果 {self.NEGATIVE_TTL} 秒: {key[0]} {key[1]} ({e.__class__.__name__})")
+            self._store(key, _NegativeResult(e), self.NEGATIVE_TTL)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: tuple, value, ttl: float):
+        self._cache[key] = (time.monotonic() + ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.MAX_SIZE:
+            self._cache.popitem(last=False)
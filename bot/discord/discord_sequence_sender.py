@@ -1,10 +1,16 @@
 """
 Discord Bot - 消息序列发送模块
 负责按顺序发送消息序列（文本、表情包、工具调用卡片等）
+
+发送模型：
+- 调度循环（check_message_sequences）扫描有待发送序列的消息，按目的地（频道/私聊）分组
+- 每个目的地一个独立的发送任务，目的地内严格按消息 ID、序列顺序发送
+- 不同目的地之间并发发送，全局并发数由 queue.max_concurrent_sends 限制
 """
 import discord
 import asyncio
 import os
+import time
 import traceback
 import sys
 from pathlib import Path
@@ -13,6 +19,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from shared.message_queue import MessageStatus
 from shared.logger import get_logger
+from bot.discord.discord_rate_limiter import DiscordRateLimiter
 
 log = get_logger("DiscordBot", "discord")
 
@@ -20,480 +27,706 @@ log = get_logger("DiscordBot", "discord")
 class DiscordSequenceSenderMixin:
     """消息序列发送 Mixin"""
 
+    # 队列深度统计输出间隔（秒）
+    QUEUE_DEPTH_LOG_INTERVAL = 60
+
+    # 合并文本的最大长度（Discord 单条消息上限）
+    COALESCE_MAX_LENGTH = 2000
+    # 单次合并最多查看的待发送序列项数
+    COALESCE_LOOKAHEAD = 20
+
+    # 工具调用卡片消息对象缓存上限
+    TOOL_CARD_CACHE_SIZE = 256
+
+    # 目的地发送任务空闲（都在等待 AI 输出）时的轮询间隔：从最小值开始指数退避到最大值（秒）
+    SENDER_IDLE_MIN_DELAY = 0.1
+    SENDER_IDLE_MAX_DELAY = 0.5
+
     async def check_message_sequences(self):
-        """检查并发送消息序列（统一的发送任务）"""
+        """检查消息序列并分发到各目的地的发送任务（统一的发送调度）"""
         await self.wait_until_ready()
 
         log.log("🌊 消息序列检查任务已启动")
 
-        # 追踪每个消息的发送状态
-        message_states = {}
+        # 目的地发送状态
+        self.destination_queues = {}  # {dest_key: {message_id: message_info}}
+        self.destination_senders = {}  # {dest_key: asyncio.Task}
+        self.destination_queue_depths = {}  # {dest_key: 待发送序列项数}
+        self.sequence_send_semaphore = asyncio.Semaphore(max(1, self.config.queue_max_concurrent_sends))
+        self.rate_limiter = DiscordRateLimiter()
+        last_depth_log = time.monotonic()
 
         while not self.is_closed():
             try:
-                # 获取有待发送序列的消息
-                messages = self.message_queue.get_messages_with_pending_sequences('discord', limit=1)
+                # 获取有待发送序列的消息（按消息 ID 升序）
+                messages = self.message_queue.get_messages_with_pending_sequences('discord', limit=100)
+
+                depths = {}
+                for message_info in messages:
+                    # 只发送本进程分片负责的目的地（多进程分片部署）
+                    if not await self._owns_destination(message_info):
+                        continue
+                    dest_key = self._get_destination_key(message_info)
+                    depths[dest_key] = depths.get(dest_key, 0) + message_info.get('pending_count', 0)
+
+                    queue = self.destination_queues.setdefault(dest_key, {})
+                    if message_info['id'] not in queue:
+                        queue[message_info['id']] = message_info
+
+                    sender = self.destination_senders.get(dest_key)
+                    if sender is None or sender.done():
+                        self.destination_senders[dest_key] = asyncio.create_task(
+                            self._destination_sender_loop(dest_key)
+                        )
+                self.destination_queue_depths = depths
 
                 if not messages:
-                    # 没有待发送的序列，检查 pending_messages 中的消息是否完成
+                    # 没有待发送的序列，检查不在任何目的地队列中的 pending_messages 是否完成
+                    queued_ids = {mid for queue in self.destination_queues.values() for mid in queue}
                     for message_id in list(self.pending_messages.keys()):
-                        stats = self.message_queue.get_message_sequences_stats(message_id)
-
-                        # 检查 AI 响应是否已完成，且所有序列都已发送
-                        if stats["total"] > 0 and stats["total"] == stats["sent"] and self.message_queue.is_ai_response_complete(message_id):
-                            # 1. 停止正在输入状态
-                            self.stop_typing_indicator(message_id)
-                            # 2. 所有序列都已发送，清理数据库相关序列
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            # 3. 更新消息状态为 COMPLETED（防止重复加载）
-                            self.message_queue.update_status(message_id, MessageStatus.COMPLETED)
-                            # 4. 清理内存缓存，防止内存泄漏
-                            if message_id in message_states:
-                                del message_states[message_id]
-                            if message_id in self.pending_messages:
-                                del self.pending_messages[message_id]
-
-                    # 等待一会儿再检查
-                    await asyncio.sleep(0.5)
-                    continue
+                        if message_id not in queued_ids:
+                            await self._finish_message_if_complete(message_id)
 
-                message_info = messages[0]
-                message_id = message_info['id']
-                channel_id = message_info['discord_channel_id']
-                user_id = message_info['discord_user_id']
-                is_dm = message_info['is_dm']
-                username = message_info['username']
+                # 定期输出各目的地队列深度
+                now = time.monotonic()
+                if now - last_depth_log >= self.QUEUE_DEPTH_LOG_INTERVAL:
+                    last_depth_log = now
+                    self._log_queue_depths()
 
-                try:
+                await asyncio.sleep(0.2 if messages else 0.5)
 
-                    # 发现未追踪的消息：立即占位 + 启动 typing indicator（和微信 bot 一致的兜底机制）
-                    if message_id not in self.pending_messages:
-                        log.log(f"📨 [消息 #{message_id}] 已加载未追踪消息: {username}")
-
-                        # 解析频道
-                        channel = None
-                        if is_dm:
-                            user = self.get_user(user_id)
-                            if not user:
-                                try:
-                                    user = await self.fetch_user(user_id)
-                                except (discord.NotFound, Exception):
-                                    pass
-                            if user:
-                                try:
-                                    channel = await user.create_dm()
-                                except (discord.NotFound, discord.Forbidden):
-                                    pass
-                        else:
-                            channel = self.get_channel(channel_id)
+            except Exception as e:
+                log.log(f"❌ 检查消息序列时出错: {e}")
+                traceback.print_exc()
+                await asyncio.sleep(5)
 
-                        if channel:
-                            typing_task = asyncio.create_task(
-                                self._maintain_typing_indicator(channel)
-                            )
-                            self.pending_messages[message_id] = {
-                                "channel": channel,
-                                "user_message": None,
-                                "confirmation_msg": None,
-                                "start_time": asyncio.get_event_loop().time(),
-                                "content": "",
-                                "notified_processing": False,
-                                "typing_task": typing_task,
-                                "typing_active": True,
-                            }
-                        else:
-                            # 频道解析失败，仍然占位（避免重复尝试解析）
-                            self.pending_messages[message_id] = {
-                                "channel": None,
-                                "user_message": None,
-                                "confirmation_msg": None,
-                                "start_time": asyncio.get_event_loop().time(),
-                                "content": "",
-                                "notified_processing": False,
-                                "typing_task": None,
-                                "typing_active": False,
-                            }
-
-                    # 初始化消息状态
-                    if message_id not in message_states:
-                        message_states[message_id] = {"pending": []}
-
-                    # 获取待发送的序列项（每次只取一条，确保严格按顺序发送）
+    def _get_destination_key(self, message_info: dict) -> str:
+        """获取消息的发送目的地标识（私聊按用户，频道按频道）"""
+        if message_info['is_dm']:
+            return f"dm_{message_info['discord_user_id']}"
+        return f"channel_{message_info['discord_channel_id']}"
+
+    def _log_queue_depths(self):
+        """输出各目的地的待发送队列深度"""
+        depths = {k: v for k, v in self.destination_queue_depths.items() if v > 0}
+        if not depths:
+            return
+        top = sorted(depths.items(), key=lambda item: item[1], reverse=True)[:10]
+        detail = ", ".join(f"{k}={v}" for k, v in top)
+        log.log(f"📊 发送队列深度: {detail}（活跃目的地 {len(depths)}，发送任务 {len(self.destination_senders)}）")
+
+    async def _finish_message_if_complete(self, message_id: int) -> bool:
+        """
+        检查消息是否已全部发送完成，完成时执行收尾清理
+
+        AI 处理失败或被中止、且没有任何序列的消息同样视为结束（保留 FAILED 状态）
+
+        Returns:
+            消息是否已完成
+        """
+        stats = self.message_queue.get_message_sequences_stats(message_id)
+
+        # 检查 AI 响应是否已完成，且所有序列都已发送
+        if stats["total"] > 0 and stats["pending"] == 0 and self.message_queue.is_ai_response_complete(message_id):
+            # 1. 停止正在输入状态
+            self.stop_typing_indicator(message_id)
+            # 2. 所有序列都已发送，清理数据库相关序列
+            self.message_queue.cleanup_message_sequences(message_id)
+            # 3. 更新消息状态为 COMPLETED（防止重复加载）
+            self.message_queue.update_status(message_id, MessageStatus.COMPLETED)
+            # 4. 清理内存缓存，防止内存泄漏
+            if message_id in self.pending_messages:
+                del self.pending_messages[message_id]
+            # 5. 移除未替换为正式内容的预览消息
+            await self._drop_live_preview(message_id)
+            # 6. 最后刷新一次工具活动卡片
+            self._finish_tool_activity(message_id)
+            return True
+
+        if stats["total"] == 0 and self.message_queue.get_message_status(message_id) == MessageStatus.FAILED:
+            # AI 处理中途出错或被中止：移除预览并释放状态
+            self.stop_typing_indicator(message_id)
+            self.pending_messages.pop(message_id, None)
+            await self._drop_live_preview(message_id)
+            self._drop_tool_activity(message_id)
+            return True
+        return False
+
+    async def _fail_message(self, message_id: int, error: str):
+        """标记消息发送失败并清理序列"""
+        self.message_queue.cleanup_message_sequences(message_id)
+        self.message_queue.update_status(message_id, MessageStatus.FAILED, error=error)
+        # 释放预览消息和工具活动卡片状态（失败的消息不会再走 _finish_message_if_complete）
+        await self._drop_live_preview(message_id)
+        self._drop_tool_activity(message_id)
+
+    async def _destination_sender_loop(self, dest_key: str):
+        """
+        单个目的地的发送任务
+
+        目的地内按消息 ID 顺序处理：优先发送 ID 最小且有待发送序列项的消息，
+        每次只发送一条序列项，确保严格按顺序发送。目的地队列清空后任务退出。
+        """
+        channels = {}  # {message_id: channel} 每条消息只解析一次频道
+        idle_delay = self.SENDER_IDLE_MIN_DELAY
+
+        try:
+            while not self.is_closed():
+                queue = self.destination_queues.get(dest_key)
+                if not queue:
+                    break
+
+                target = None
+                for message_id in sorted(queue):
                     pending_sequences = self.message_queue.get_pending_message_sequences(message_id, limit=1)
+                    if pending_sequences:
+                        target = (message_id, pending_sequences[0])
+                        break
+                    # 没有待发送的序列，检查是否完成
+                    if await self._finish_message_if_complete(message_id):
+                        log.log(f"✅ [消息 #{message_id}] 所有序列已发送，停止 typing indicator")
+                        queue.pop(message_id, None)
+                        channels.pop(message_id, None)
+
+                if target is None:
+                    # 队列中的消息都在等待 AI 继续输出：逐步拉长检查间隔，减少数据库查询
+                    await asyncio.sleep(idle_delay)
+                    idle_delay = min(idle_delay * 2, self.SENDER_IDLE_MAX_DELAY)
+                    continue
+                idle_delay = self.SENDER_IDLE_MIN_DELAY
 
-                    if not pending_sequences:
-                        # 没有待发送的序列，检查是否完成
-                        stats = self.message_queue.get_message_sequences_stats(message_id)
-                        log.log(f"🔍 [消息 #{message_id}] 序列统计: total={stats['total']}, pending={stats['pending']}, sent={stats['sent']}")
-
-                        # 检查 AI 响应是否已完成，且所有序列都已发送
-                        if stats["total"] > 0 and stats["pending"] == 0 and self.message_queue.is_ai_response_complete(message_id):
-                            log.log(f"✅ [消息 #{message_id}] 所有序列已发送，停止 typing indicator")
-                            # 1. 停止正在输入状态
-                            self.stop_typing_indicator(message_id)
-                            # 2. 所有序列都已发送，清理数据库相关序列
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            # 3. 更新消息状态为 COMPLETED（防止重复加载）
-                            self.message_queue.update_status(message_id, MessageStatus.COMPLETED)
-                            # 4. 清理内存缓存，防止内存泄漏
-                            if message_id in message_states:
-                                del message_states[message_id]
-                            if message_id in self.pending_messages:
-                                del self.pending_messages[message_id]
-                        else:
-                            # 还未完成，等待下一轮
-                            await asyncio.sleep(0.1)
-                        continue
+                message_id, seq = target
+                message_info = queue[message_id]
 
-                    # 获取频道
-                    if is_dm:
-                        user = self.get_user(user_id)
-                        if not user:
-                            try:
-                                user = await self.fetch_user(user_id)
-                            except discord.NotFound:
-                                # 用户不存在，标记消息为失败并清理
-                                log.log(f"❌ 消息 #{message_id} 发送失败: 用户不存在 (user_id={user_id})")
-                                self.message_queue.cleanup_message_sequences(message_id)
-                                self.message_queue.update_status(message_id, MessageStatus.FAILED, error=f"用户不存在: {user_id}")
-                                continue
-                            except Exception as e:
-                                log.log(f"⚠️  获取用户失败: {user_id}, 错误: {e}")
-                                continue
-                        if not user:
-                            continue
-                        try:
-                            channel = await user.create_dm()
-                        except discord.NotFound:
-                            # 无法创建 DM（用户不存在），标记消息为失败
-                            log.log(f"❌ 消息 #{message_id} 发送失败: 无法创建私聊频道 (user_id={user_id})")
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            self.message_queue.update_status(message_id, MessageStatus.FAILED, error=f"无法创建私聊频道: {user_id}")
-                            continue
-                        except discord.Forbidden:
-                            # 没有权限创建 DM
-                            log.log(f"❌ 消息 #{message_id} 发送失败: 没有权限创建私聊频道 (user_id={user_id})")
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            self.message_queue.update_status(message_id, MessageStatus.FAILED, error=f"没有权限创建私聊频道: {user_id}")
-                            continue
-                    else:
-                        channel = self.get_channel(channel_id)
-                        if not channel:
-                            # 频道不存在，标记消息为失败并清理
-                            log.log(f"❌ 消息 #{message_id} 发送失败: 频道不存在 (channel_id={channel_id})")
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            self.message_queue.update_status(message_id, MessageStatus.FAILED, error=f"频道不存在: {channel_id}")
-                            continue
+                try:
+                    # 发现未追踪的消息：立即占位 + 启动 typing indicator
+                    if message_id not in self.pending_messages:
+                        await self._track_untracked_message(message_info)
 
-                    # 发送序列项（只有一条）
-                    seq = pending_sequences[0]
-                    seq_id = seq["id"]
-                    seq_index = seq["sequence_index"]
-                    item_type = seq["item_type"]
-                    item_data = seq["item_data"]
-                    tool_use_index = seq.get("tool_use_index")  # 获取工具调用索引
-
-                    try:
-                        if item_type == "text":
-                            # 发送文本消息
-                            text = item_data.get("text", "")
-                            if text and text.strip():
-                                await self._send_long_message(channel, text.strip())
-
-                        elif item_type == "sticker":
-                            # 表情包：从 item_data 获取文件路径，发送为图片
-                            sticker_path = item_data.get("file_path", "") if item_data else ""
-                            if sticker_path and os.path.exists(sticker_path):
-                                try:
-                                    file = discord.File(sticker_path)
-                                    await channel.send(file=file)
-                                    log.log(f"✅ [消息 #{message_id}] 已发送表情包: {os.path.basename(sticker_path)}")
-                                except Exception as e:
-                                    log.log(f"❌ [消息 #{message_id}] 表情包发送失败: {sticker_path} - {e}")
-                            else:
-                                log.log(f"⚠️ [消息 #{message_id}] 表情包文件不存在: {sticker_path}")
-
-                        elif item_type == "tool_use":
-                            # 发送工具调用通知（直接发送，不使用队列）
-                            tool_name = item_data.get("name", "")
-                            tool_input = item_data.get("input", {})
-
-                            # 过滤管理命令的工具调用通知（避免噪音）
-                            should_skip = False
-                            if tool_name == "Bash" and tool_input.get("command"):
-                                command = tool_input["command"]
-                                management_keywords = ["restart.bat", "im_claude_bridge_manager.py", "restart", "shutdown", "stop"]
-                                if any(keyword in command.lower() for keyword in management_keywords):
-                                    should_skip = True
-
-                            if not should_skip:
-                                # 构建工具调用Embed
-                                TOOL_EMOJIS = self.config.tool_emoji_mapping
-                                is_mcp = tool_name.startswith('mcp__')
-
-                                if is_mcp:
-                                    parts = tool_name.split('__')
-                                    if len(parts) >= 3:
-                                        mcp_server = parts[1]
-                                        mcp_tool = parts[2]
-                                        display_title = f"MCP {mcp_server}"
-                                        emoji = TOOL_EMOJIS.get(tool_name)
-                                        if emoji is None:
-                                            emoji = TOOL_EMOJIS.get(mcp_server, "🔧")
-
-                                        embed = discord.Embed(
-                                            title=f"🔄 {emoji} {display_title}",
-                                            color=discord.Color.blue()
-                                        )
-                                        embed.description = mcp_tool
-                                    else:
-                                        emoji = TOOL_EMOJIS.get(tool_name, "🔧")
-                                        embed = discord.Embed(
-                                            title=f"🔄 {emoji} {tool_name}",
-                                            color=discord.Color.blue()
-                                        )
-                                        embed.description = "无参数"
-                                else:
-                                    emoji = TOOL_EMOJIS.get(tool_name, "🔧")
-                                    embed = discord.Embed(
-                                        title=f"🔄 {emoji} {tool_name}",
-                                        color=discord.Color.blue()
-                                    )
-
-                                    # 智能显示参数（为每个工具定制显示内容）
-                                    display_value = None
-
-                                    if tool_name == 'Read':
-                                        # Read: 显示文件路径
-                                        display_value = tool_input.get('file_path', '无路径')
-                                    elif tool_name == 'Write':
-                                        # Write: 显示文件路径
-                                        display_value = tool_input.get('file_path', '无路径')
-                                    elif tool_name == 'Edit':
-                                        # Edit: 显示文件路径
-                                        display_value = tool_input.get('file_path', '无路径')
-                                    elif tool_name == 'Glob':
-                                        # Glob: 显示路径和 pattern
-                                        pattern = tool_input.get('pattern', '无 pattern')
-                                        path = tool_input.get('path', '')
-                                        if path:
-                                            display_value = f"{path}: {pattern}"
-                                        else:
-                                            display_value = pattern
-                                    elif tool_name == 'Grep':
-                                        # Grep: 显示 pattern
-                                        display_value = tool_input.get('pattern', '无 pattern')
-                                    elif tool_name == 'Bash':
-                                        # Bash: 显示命令（截断）
-                                        cmd = tool_input.get('command', '')
-                                        if len(cmd) > 100:
-                                            cmd = cmd[:97] + "..."
-                                        display_value = cmd
-                                    elif tool_name == 'WebSearch':
-                                        # WebSearch: 显示 query
-                                        display_value = tool_input.get('query', '无 query')
-                                    elif tool_name == 'Skill':
-                                        # Skill: 显示 skill 名称
-                                        display_value = tool_input.get('skill', '无 skill')
-                                    elif tool_name == 'Agent':
-                                        # Agent: 显示描述和 subagent_type
-                                        desc = tool_input.get('description', '')
-                                        subagent = tool_input.get('subagent_type', 'general-purpose')
-                                        display_value = f"{subagent}: {desc}"
-                                    elif tool_name == 'EnterPlanMode':
-                                        # EnterPlanMode: 无需显示参数
-                                        display_value = "进入计划模式"
-                                    elif tool_name == 'ExitPlanMode':
-                                        # ExitPlanMode: 无需显示参数
-                                        display_value = "退出计划模式"
-                                    elif tool_name == 'AskUserQuestion':
-                                        # AskUserQuestion: 显示每个问题的内容和选项
-                                        questions = tool_input.get('questions', [])
-                                        question_lines = []
-                                        for i, q in enumerate(questions, 1):
-                                            question_text = q.get('question', '无问题')
-                                            question_lines.append(f"Q{i}: {question_text}")
-
-                                            # 显示选项
-                                            options = q.get('options', [])
-                                            if options:
-                                                for opt in options:
-                                                    label = opt.get('label', '无标签')
-                                                    desc = opt.get('description', '')
-                                                    if desc:
-                                                        question_lines.append(f"  - {label}: {desc}")
-                                                    else:
-                                                        question_lines.append(f"  - {label}")
-
-                                        display_value = '\n'.join(question_lines)
-                                    elif tool_name == 'TodoWrite':
-                                        # TodoWrite: 显示所有任务（不截断）
-                                        todos = tool_input.get('todos', [])
-
-                                        if not todos:
-                                            display_value = "无任务"
-                                        else:
-                                            # 统计各状态任务数量
-                                            status_counts = {'pending': 0, 'in_progress': 0, 'completed': 0}
-                                            for todo in todos:
-                                                status = todo.get('status', 'pending')
-                                                if status in status_counts:
-                                                    status_counts[status] += 1
-
-                                            # 构建任务列表（按状态分组：已完成 → 进行中 → 待办中）
-                                            todo_lines = []
-
-                                            # 1. 显示已完成任务
-                                            completed_tasks = [t for t in todos if t.get('status') == 'completed']
-                                            if completed_tasks:
-                                                todo_lines.append("✅ 已完成:")
-                                                for todo in completed_tasks:
-                                                    content = todo.get('content', '')
-                                                    todo_lines.append(f"  • {content}")
-                                                todo_lines.append("")
-
-                                            # 2. 显示进行中任务
-                                            in_progress_tasks = [t for t in todos if t.get('status') == 'in_progress']
-                                            if in_progress_tasks:
-                                                todo_lines.append("🔄 进行中:")
-                                                for todo in in_progress_tasks:
-                                                    active_form = todo.get('activeForm', todo.get('content', ''))
-                                                    todo_lines.append(f"  • {active_form}")
-                                                todo_lines.append("")
-
-                                            # 3. 显示待办中任务
-                                            pending_tasks = [t for t in todos if t.get('status') == 'pending']
-                                            if pending_tasks:
-                                                todo_lines.append("📋 待办中:")
-                                                for todo in pending_tasks:
-                                                    content = todo.get('content', '')
-                                                    todo_lines.append(f"  • {content}")
-                                                todo_lines.append("")
-
-                                            # 添加进度统计
-                                            total = len(todos)
-                                            completed = status_counts['completed']
-                                            if completed > 0:
-                                                todo_lines.append(f"进度: {completed}/{total} ({completed*100//total}%)")
-                                            else:
-                                                todo_lines.append(f"总任务: {total} 个")
-
-                                            display_value = '\n'.join(todo_lines)
-                                    elif tool_name == 'CronCreate':
-                                        # CronCreate: 显示 cron 表达式
-                                        display_value = tool_input.get('cron', '无 cron')
-                                    elif tool_name == 'CronDelete':
-                                        # CronDelete: 显示任务 ID
-                                        display_value = tool_input.get('id', '无 id')
-                                    elif tool_name == 'CronList':
-                                        # CronList: 无参数
-                                        display_value = "列出定时任务"
-                                    elif tool_name == 'TaskOutput':
-                                        # TaskOutput: 显示任务 ID
-                                        display_value = tool_input.get('task_id', '无 id')
-                                    elif tool_name == 'TaskStop':
-                                        # TaskStop: 显示任务 ID
-                                        display_value = tool_input.get('task_id', '无 id')
-                                    elif tool_name == 'NotebookEdit':
-                                        # NotebookEdit: 显示 notebook 路径
-                                        display_value = tool_input.get('notebook_path', '无路径')
-                                    elif tool_name == 'ListMcpResourcesTool':
-                                        # ListMcpResourcesTool: 显示服务器名
-                                        display_value = tool_input.get('server', '全部服务器')
-                                    elif tool_name == 'ReadMcpResourceTool':
-                                        # ReadMcpResourceTool: 显示服务器和 URI
-                                        server = tool_input.get('server', '')
-                                        uri = tool_input.get('uri', '')
-                                        display_value = f"{server}: {uri}"
-                                    elif tool_name == 'EnterWorktree':
-                                        # EnterWorktree: 显示名称
-                                        display_value = tool_input.get('name', '默认名称')
-                                    elif tool_name == 'ExitWorktree':
-                                        # ExitWorktree: 显示操作
-                                        action = tool_input.get('action', 'keep')
-                                        display_value = f"操作: {action}"
-                                    elif 'prompt' in tool_input:
-                                        # 有 prompt 字段的工具（完整显示，不截断）
-                                        display_value = tool_input['prompt']
-                                    else:
-                                        # 其他工具：显示第一个参数
-                                        if tool_input:
-                                            first_key = list(tool_input.keys())[0]
-                                            first_value = str(tool_input[first_key])
-                                            if len(first_value) > 50:
-                                                first_value = first_value[:47] + "..."
-                                            display_value = f"{first_key}: {first_value}"
-                                        else:
-                                            display_value = "无参数"
-
-                                    if display_value:
-                                        embed.description = display_value
-                                    else:
-                                        embed.description = "无参数"
-
-                                # 直接发送Embed（不使用队列）
-                                sent_message = await channel.send(embed=embed)
-
-                                # 保存消息引用（用于后续更新）
-                                if sent_message:
-                                    # 使用正确的tool_use_index（而不是sequence_index）
-                                    ref_tool_use_index = tool_use_index if tool_use_index is not None else seq_index
-                                    self.message_queue.save_tool_use_message_ref(
-                                        message_id,
-                                        ref_tool_use_index,
-                                        sent_message.id,
-                                        channel_id,
-                                        is_dm,
-                                        channel_type='discord'
-                                    )
-
-                        elif item_type == "file":
-                            # 文件发送：从 item_data 获取文件路径列表，发送为 Discord 文件
-                            file_paths = item_data.get("file_paths", []) if item_data else []
-                            valid_files = []
-                            for fp in file_paths:
-                                if os.path.exists(fp):
-                                    valid_files.append(discord.File(fp))
-
-                            if valid_files:
-                                try:
-                                    await channel.send(files=valid_files)
-                                    log.log(f"✅ [消息 #{message_id}] 已发送 {len(valid_files)} 个文件")
-                                except Exception as e:
-                                    log.log(f"❌ [消息 #{message_id}] 文件发送失败: {e}")
-                            else:
-                                log.log(f"⚠️ [消息 #{message_id}] 没有有效的文件可发送")
-
-                        # 标记为已发送
-                        self.message_queue.mark_sequence_sent(seq_id)
-
-                        # 控制发送速率，避免触发Discord速率限制
-                        await asyncio.sleep(self.config.queue_send_interval)
-
-                    except discord.NotFound as e:
-                        # 频道/用户不存在，标记消息为失败并清理
-                        log.log(f"❌ 消息 #{message_id} 发送失败: 资源不存在 - {e}")
-                        self.message_queue.cleanup_message_sequences(message_id)
-                        self.message_queue.update_status(message_id, MessageStatus.FAILED, error=f"资源不存在: {e}")
-                        traceback.print_exc()
-                    except discord.Forbidden as e:
-                        # 没有权限，标记消息为失败并清理
-                        log.log(f"❌ 消息 #{message_id} 发送失败: 没有权限 - {e}")
-                        self.message_queue.cleanup_message_sequences(message_id)
-                        self.message_queue.update_status(message_id, MessageStatus.FAILED, error=f"没有权限: {e}")
-                        traceback.print_exc()
-                    except Exception as e:
-                        log.log(f"❌ 发送序列项失败: 消息#{message_id}, 序列#{seq_index}, 错误: {e}")
-                        traceback.print_exc()
+                    channel = channels.get(message_id)
+                    if channel is None:
+                        channel = await self._resolve_sequence_channel(message_info)
+                        if channel is None:
+                            queue.pop(message_id, None)
+                            continue
+                        channels[message_id] = channel
+
+                    # 速率桶过热时，合并相邻的文本序列项（不跨越表情包/文件/工具卡片）
+                    batch = self._collect_coalescible_texts(message_id, seq, channel)
+
+                    # 等待频道速率槽位，然后发送（全局并发受信号量限制）
+                    await self.rate_limiter.acquire(channel.id)
+                    async with self.sequence_send_semaphore:
+                        # 实时编辑：正式文本直接编辑进流式预览消息（非文本项只移除预览）
+                        swapped_count = 0
+                        if message_id in self.live_edit_states:
+                            swapped_count = await self._finalize_live_preview(
+                                message_id, self._final_text_parts(batch), channel
+                            )
 
+                        if swapped_count:
+                            sent_count = swapped_count
+                        elif len(batch) > 1:
+                            merged = "\n\n".join(item["item_data"].get("text", "").strip() for item in batch)
+                            sent_count = await self._send_long_message(channel, merged, max_length=self.COALESCE_MAX_LENGTH)
+                            log.log(f"🧩 [消息 #{message_id}] 频道速率过热，已合并 {len(batch)} 条文本发送")
+                        else:
+                            sent_count = await self._send_sequence_item(channel, message_info, seq)
+                    self.rate_limiter.record(channel.id, sent_count)
+                    if seq["item_type"] != "tool_use":
+                        self._close_tool_activity_page(message_id)
+
+                    # 标记为已发送
+                    for item in batch:
+                        self.message_queue.mark_sequence_sent(item["id"])
+
+                    # 控制发送速率，避免触发Discord速率限制
+                    await asyncio.sleep(self.config.queue_send_interval)
+
+                except discord.NotFound as e:
+                    # 频道/用户不存在，标记消息为失败并清理
+                    log.log(f"❌ 消息 #{message_id} 发送失败: 资源不存在 - {e}")
+                    await self._fail_message(message_id, f"资源不存在: {e}")
+                    queue.pop(message_id, None)
+                    traceback.print_exc()
+                except discord.Forbidden as e:
+                    # 没有权限，标记消息为失败并清理
+                    log.log(f"❌ 消息 #{message_id} 发送失败: 没有权限 - {e}")
+                    await self._fail_message(message_id, f"没有权限: {e}")
+                    queue.pop(message_id, None)
+                    traceback.print_exc()
                 except Exception as e:
-                    log.log(f"❌ 处理消息序列失败: 消息#{message_id}, 错误: {e}")
+                    log.log(f"❌ 发送序列项失败: 消息#{message_id}, 序列#{seq['sequence_index']}, 错误: {e}")
                     traceback.print_exc()
-
-                # 极小延迟，避免无消息时CPU空转
-                await asyncio.sleep(0.01)
-
+                    await asyncio.sleep(1)
+
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            log.log(f"❌ 目的地发送任务出错 [{dest_key}]: {e}")
+            traceback.print_exc()
+        finally:
+            if not self.destination_queues.get(dest_key):
+                self.destination_queues.pop(dest_key, None)
+            if self.destination_senders.get(dest_key) is asyncio.current_task():
+                del self.destination_senders[dest_key]
+
+    async def _track_untracked_message(self, message_info: dict):
+        """发现未追踪的消息：立即占位 + 启动 typing indicator（和微信 bot 一致的兜底机制）"""
+        message_id = message_info['id']
+        user_id = message_info['discord_user_id']
+        log.log(f"📨 [消息 #{message_id}] 已加载未追踪消息: {message_info['username']}")
+
+        # 解析频道
+        try:
+            channel = await self.resolver.resolve(message_info['is_dm'], user_id, message_info['discord_channel_id'])
+        except Exception:
+            channel = None
+
+        if channel:
+            self.typing_multiplexer.acquire(message_id, channel)
+            self.pending_messages[message_id] = {
+                "channel": channel,
+                "user_message": None,
+                "confirmation_msg": None,
+                "start_time": asyncio.get_event_loop().time(),
+                "content": "",
+                "notified_processing": False,
+                "typing_active": True,
+            }
+        else:
+            # 频道解析失败，仍然占位（避免重复尝试解析）
+            self.pending_messages[message_id] = {
+                "channel": None,
+                "user_message": None,
+                "confirmation_msg": None,
+                "start_time": asyncio.get_event_loop().time(),
+                "content": "",
+                "notified_processing": False,
+                "typing_active": False,
+            }
+
+    async def _resolve_sequence_channel(self, message_info: dict):
+        """
+        解析消息的发送频道，失败时标记消息为失败
+
+        Returns:
+            频道对象，无法解析时返回 None
+        """
+        message_id = message_info['id']
+        user_id = message_info['discord_user_id']
+        channel_id = message_info['discord_channel_id']
+
+        if message_info['is_dm']:
+            try:
+                return await self.resolver.resolve_dm(user_id)
+            except discord.NotFound:
+                # 用户不存在或无法创建 DM，标记消息为失败并清理
+                log.log(f"❌ 消息 #{message_id} 发送失败: 用户不存在或无法创建私聊频道 (user_id={user_id})")
+                await self._fail_message(message_id, f"用户不存在: {user_id}")
+                return None
+            except discord.Forbidden:
+                # 没有权限创建 DM
+                log.log(f"❌ 消息 #{message_id} 发送失败: 没有权限创建私聊频道 (user_id={user_id})")
+                await self._fail_message(message_id, f"没有权限创建私聊频道: {user_id}")
+                return None
             except Exception as e:
-                log.log(f"❌ 检查消息序列时出错: {e}")
-                traceback.print_exc()
-                await asyncio.sleep(5)
+                log.log(f"⚠️  获取用户失败: {user_id}, 错误: {e}")
+                return None
+        else:
+            try:
+                return await self.resolver.resolve_channel(channel_id)
+            except (discord.NotFound, discord.Forbidden):
+                # 频道不存在，标记消息为失败并清理
+                log.log(f"❌ 消息 #{message_id} 发送失败: 频道不存在 (channel_id={channel_id})")
+                await self._fail_message(message_id, f"频道不存在: {channel_id}")
+                return None
+            except Exception as e:
+                log.log(f"⚠️  获取频道失败: {channel_id}, 错误: {e}")
+                return None
+
+    def _collect_coalescible_texts(self, message_id: int, seq: dict, channel) -> list:
+        """
+        收集可合并发送的相邻文本序列项
+
+        仅在启用合并且频道速率桶过热时合并；只合并从当前项开始连续的 text 项，
+        遇到非文本项、代码块围栏不成对的文本或超过 2000 字符时停止，保证顺序和代码块完整。
+
+        Returns:
+            需要一起发送的序列项列表（至少包含当前项）
+        """
+        if seq["item_type"] != "text" or not self.config.queue_coalesce_text:
+            return [seq]
+        if not self.rate_limiter.is_hot(channel.id):
+            return [seq]
+
+        batch = []
+        total_length = 0
+        for item in self.message_queue.get_pending_message_sequences(message_id, limit=self.COALESCE_LOOKAHEAD):
+            if item["item_type"] != "text":
+                break
+            text = item["item_data"].get("text", "").strip()
+            # 围栏不成对的文本（代码块被空行拆开）不参与合并
+            if text.count("```") % 2 != 0:
+                break
+            added_length = len(text) + (2 if batch else 0)
+            if batch and total_length + added_length > self.COALESCE_MAX_LENGTH:
+                break
+            batch.append(item)
+            total_length += added_length
+
+        # 兜底：当前项必须在批次开头（否则按单条发送）
+        if not batch or batch[0]["id"] != seq["id"]:
+            return [seq]
+        return batch
+
+    def _final_text_parts(self, batch: list) -> list:
+        """
+        计算文本序列项最终发送的各条内容（与 _send_long_message 的分割一致）
+
+        Returns:
+            分割后的内容列表，批次不是文本时返回 None
+        """
+        if batch[0]["item_type"] != "text":
+            return None
+        if len(batch) > 1:
+            text = "\n\n".join(item["item_data"].get("text", "").strip() for item in batch)
+            max_length = self.COALESCE_MAX_LENGTH
+        else:
+            text = batch[0]["item_data"].get("text", "")
+            max_length = 1000
+        parts = []
+        for part in self._split_long_message(text, max_length):
+            # 超长的单行强制截断为多条
+            parts.extend(part[i:i + max_length] for i in range(0, len(part), max_length))
+        return parts or None
+
+    async def _send_sequence_item(self, channel, message_info: dict, seq: dict) -> int:
+        """发送单条序列项（文本、表情包、工具调用卡片、文件）
+
+        Returns:
+            实际发送的 Discord 消息条数（用于速率追踪）
+        """
+        message_id = message_info['id']
+        seq_index = seq["sequence_index"]
+        item_type = seq["item_type"]
+        item_data = seq["item_data"]
+        tool_use_index = seq.get("tool_use_index")  # 获取工具调用索引
+
+        sent_count = 0
+
+        if item_type == "text":
+            # 发送文本消息
+            text = item_data.get("text", "")
+            if text and text.strip():
+                sent_count = await self._send_long_message(channel, text.strip())
+
+        elif item_type == "sticker":
+            # 表情包：从 item_data 获取文件路径，发送为图片
+            sticker_path = item_data.get("file_path", "") if item_data else ""
+            if sticker_path and os.path.exists(sticker_path):
+                try:
+                    await self._send_sticker(channel, sticker_path)
+                    sent_count = 1
+                    log.log(f"✅ [消息 #{message_id}] 已发送表情包: {os.path.basename(sticker_path)}")
+                except Exception as e:
+                    log.log(f"❌ [消息 #{message_id}] 表情包发送失败: {sticker_path} - {e}")
+            else:
+                log.log(f"⚠️ [消息 #{message_id}] 表情包文件不存在: {sticker_path}")
+
+        elif item_type == "tool_use":
+            # 发送工具调用通知（直接发送，不使用队列）
+            embed = self._build_tool_use_embed(item_data.get("name", ""), item_data.get("input", {}))
+            if embed is not None and self._is_compact_tool_mode():
+                # compact 模式：追加到本轮的工具活动卡片
+                ref_tool_use_index = tool_use_index if tool_use_index is not None else seq_index
+                sent_count = await self._add_tool_activity(channel, message_info, ref_tool_use_index, embed)
+            elif embed is not None:
+                # 直接发送Embed（不使用队列）
+                sent_message = await channel.send(embed=embed)
+                sent_count = 1
+
+                # 保存消息引用（用于后续更新）
+                if sent_message:
+                    # 使用正确的tool_use_index（而不是sequence_index）
+                    ref_tool_use_index = tool_use_index if tool_use_index is not None else seq_index
+                    # 先缓存消息对象，再持久化引用
+                    self._remember_tool_card(message_id, ref_tool_use_index, sent_message)
+                    self.message_queue.save_tool_use_message_ref(
+                        message_id,
+                        ref_tool_use_index,
+                        sent_message.id,
+                        message_info['discord_channel_id'],
+                        message_info['is_dm'],
+                        channel_type='discord'
+                    )
+
+        elif item_type == "file":
+            # 文件发送：从 item_data 获取文件路径列表，发送为 Discord 文件
+            file_paths = item_data.get("file_paths", []) if item_data else []
+            valid_files = []
+            for fp in file_paths:
+                if os.path.exists(fp):
+                    valid_files.append(discord.File(fp))
+
+            if valid_files:
+                try:
+                    await channel.send(files=valid_files)
+                    sent_count = 1
+                    log.log(f"✅ [消息 #{message_id}] 已发送 {len(valid_files)} 个文件")
+                except Exception as e:
+                    log.log(f"❌ [消息 #{message_id}] 文件发送失败: {e}")
+            else:
+                log.log(f"⚠️ [消息 #{message_id}] 没有有效的文件可发送")
+
+        return sent_count
+
+    async def _send_sticker(self, channel, sticker_path: str):
+        """
+        发送表情包：优先以图片 Embed 引用之前上传得到的 CDN 地址（复用前先校验地址仍可访问），
+        没有可用地址、地址已失效或引用失败时作为普通附件重新上传并刷新缓存
+        """
+        if self.sticker_cache:
+            url = self.sticker_cache.lookup(sticker_path)
+            if url and not await self.sticker_cache.is_reachable(url):
+                self.sticker_cache.invalidate(sticker_path)
+                url = None
+            if url:
+                try:
+                    await channel.send(embed=discord.Embed().set_image(url=url))
+                    return
+                except discord.HTTPException as e:
+                    log.log(f"⚠️ 引用表情包 CDN 地址失败，改为重新上传: {e}")
+                    self.sticker_cache.invalidate(sticker_path)
+
+        sent_message = await channel.send(file=discord.File(sticker_path))
+        if self.sticker_cache and sent_message and sent_message.attachments:
+            self.sticker_cache.remember(sticker_path, sent_message.attachments[0].url)
+
+    def _remember_tool_card(self, message_id: int, tool_use_index: int, card_message):
+        """缓存工具调用卡片的消息对象（LRU，有上限）"""
+        key = (message_id, tool_use_index)
+        self.tool_card_cache[key] = card_message
+        self.tool_card_cache.move_to_end(key)
+        while len(self.tool_card_cache) > self.TOOL_CARD_CACHE_SIZE:
+            self.tool_card_cache.popitem(last=False)
+
+    def _build_tool_use_embed(self, tool_name: str, tool_input: dict):
+        """
+        构建工具调用通知 Embed
+
+        Returns:
+            discord.Embed，需要跳过通知时返回 None
+        """
+        # 过滤管理命令的工具调用通知（避免噪音）
+        if tool_name == "Bash" and tool_input.get("command"):
+            command = tool_input["command"]
+            management_keywords = ["restart.bat", "im_claude_bridge_manager.py", "restart", "shutdown", "stop"]
+            if any(keyword in command.lower() for keyword in management_keywords):
+                return None
+
+        # 构建工具调用Embed
+        TOOL_EMOJIS = self.config.tool_emoji_mapping
+        is_mcp = tool_name.startswith('mcp__')
+
+        if is_mcp:
+            parts = tool_name.split('__')
+            if len(parts) >= 3:
+                mcp_server = parts[1]
+                mcp_tool = parts[2]
+                display_title = f"MCP {mcp_server}"
+                emoji = TOOL_EMOJIS.get(tool_name)
+                if emoji is None:
+                    emoji = TOOL_EMOJIS.get(mcp_server, "🔧")
+
+                embed = discord.Embed(
+                    title=f"🔄 {emoji} {display_title}",
+                    color=discord.Color.blue()
+                )
+                embed.description = mcp_tool
+            else:
+                emoji = TOOL_EMOJIS.get(tool_name, "🔧")
+                embed = discord.Embed(
+                    title=f"🔄 {emoji} {tool_name}",
+                    color=discord.Color.blue()
+                )
+                embed.description = "无参数"
+        else:
+            emoji = TOOL_EMOJIS.get(tool_name, "🔧")
+            embed = discord.Embed(
+                title=f"🔄 {emoji} {tool_name}",
+                color=discord.Color.blue()
+            )
+
+            # 智能显示参数（为每个工具定制显示内容）
+            display_value = None
+
+            if tool_name == 'Read':
+                # Read: 显示文件路径
+                display_value = tool_input.get('file_path', '无路径')
+            elif tool_name == 'Write':
+                # Write: 显示文件路径
+                display_value = tool_input.get('file_path', '无路径')
+            elif tool_name == 'Edit':
+                # Edit: 显示文件路径
+                display_value = tool_input.get('file_path', '无路径')
+            elif tool_name == 'Glob':
+                # Glob: 显示路径和 pattern
+                pattern = tool_input.get('pattern', '无 pattern')
+                path = tool_input.get('path', '')
+                if path:
+                    display_value = f"{path}: {pattern}"
+                else:
+                    display_value = pattern
+            elif tool_name == 'Grep':
+                # Grep: 显示 pattern
+                display_value = tool_input.get('pattern', '无 pattern')
+            elif tool_name == 'Bash':
+                # Bash: 显示命令（截断）
+                cmd = tool_input.get('command', '')
+                if len(cmd) > 100:
+                    cmd = cmd[:97] + "..."
+                display_value = cmd
+            elif tool_name == 'WebSearch':
+                # WebSearch: 显示 query
+                display_value = tool_input.get('query', '无 query')
+            elif tool_name == 'Skill':
+                # Skill: 显示 skill 名称
+                display_value = tool_input.get('skill', '无 skill')
+            elif tool_name == 'Agent':
+                # Agent: 显示描述和 subagent_type
+                desc = tool_input.get('description', '')
+                subagent = tool_input.get('subagent_type', 'general-purpose')
+                display_value = f"{subagent}: {desc}"
+            elif tool_name == 'EnterPlanMode':
+                # EnterPlanMode: 无需显示参数
+                display_value = "进入计划模式"
+            elif tool_name == 'ExitPlanMode':
+                # ExitPlanMode: 无需显示参数
+                display_value = "退出计划模式"
+            elif tool_name == 'AskUserQuestion':
+                # AskUserQuestion: 显示每个问题的内容和选项
+                questions = tool_input.get('questions', [])
+                question_lines = []
+                for i, q in enumerate(questions, 1):
+                    question_text = q.get('question', '无问题')
+                    question_lines.append(f"Q{i}: {question_text}")
+
+                    # 显示选项
+                    options = q.get('options', [])
+                    if options:
+                        for opt in options:
+                            label = opt.get('label', '无标签')
+                            desc = opt.get('description', '')
+                            if desc:
+                                question_lines.append(f"  - {label}: {desc}")
+                            else:
+                                question_lines.append(f"  - {label}")
+
+                display_value = '\n'.join(question_lines)
+            elif tool_name == 'TodoWrite':
+                # TodoWrite: 显示所有任务（不截断）
+                todos = tool_input.get('todos', [])
+
+                if not todos:
+                    display_value = "无任务"
+                else:
+                    # 统计各状态任务数量
+                    status_counts = {'pending': 0, 'in_progress': 0, 'completed': 0}
+                    for todo in todos:
+                        status = todo.get('status', 'pending')
+                        if status in status_counts:
+                            status_counts[status] += 1
+
+                    # 构建任务列表（按状态分组：已完成 → 进行中 → 待办中）
+                    todo_lines = []
+
+                    # 1. 显示已完成任务
+                    completed_tasks = [t for t in todos if t.get('status') == 'completed']
+                    if completed_tasks:
+                        todo_lines.append("✅ 已完成:")
+                        for todo in completed_tasks:
+                            content = todo.get('content', '')
+                            todo_lines.append(f"  • {content}")
+                        todo_lines.append("")
+
+                    # 2. 显示进行中任务
+                    in_progress_tasks = [t for t in todos if t.get('status') == 'in_progress']
+                    if in_progress_tasks:
+                        todo_lines.append("🔄 进行中:")
+                        for todo in in_progress_tasks:
+                            active_form = todo.get('activeForm', todo.get('content', ''))
+                            todo_lines.append(f"  • {active_form}")
+                        todo_lines.append("")
+
+                    # 3. 显示待办中任务
+                    pending_tasks = [t for t in todos if t.get('status') == 'pending']
+                    if pending_tasks:
+                        todo_lines.append("📋 待办中:")
+                        for todo in pending_tasks:
+                            content = todo.get('content', '')
+                            todo_lines.append(f"  • {content}")
+                        todo_lines.append("")
+
+                    # 添加进度统计
+                    total = len(todos)
+                    completed = status_counts['completed']
+                    if completed > 0:
+                        todo_lines.append(f"进度: {completed}/{total} ({completed*100//total}%)")
+                    else:
+                        todo_lines.append(f"总任务: {total} 个")
+
+                    display_value = '\n'.join(todo_lines)
+            elif tool_name == 'CronCreate':
+                # CronCreate: 显示 cron 表达式
+                display_value = tool_input.get('cron', '无 cron')
+            elif tool_name == 'CronDelete':
+                # CronDelete: 显示任务 ID
+                display_value = tool_input.get('id', '无 id')
+            elif tool_name == 'CronList':
+                # CronList: 无参数
+                display_value = "列出定时任务"
+            elif tool_name == 'TaskOutput':
+                # TaskOutput: 显示任务 ID
+                display_value = tool_input.get('task_id', '无 id')
+            elif tool_name == 'TaskStop':
+                # TaskStop: 显示任务 ID
+                display_value = tool_input.get('task_id', '无 id')
+            elif tool_name == 'NotebookEdit':
+                # NotebookEdit: 显示 notebook 路径
+                display_value = tool_input.get('notebook_path', '无路径')
+            elif tool_name == 'ListMcpResourcesTool':
+                # ListMcpResourcesTool: 显示服务器名
+                display_value = tool_input.get('server', '全部服务器')
+            elif tool_name == 'ReadMcpResourceTool':
+                # ReadMcpResourceTool: 显示服务器和 URI
+                server = tool_input.get('server', '')
+                uri = tool_input.get('uri', '')
+                display_value = f"{server}: {uri}"
+            elif tool_name == 'EnterWorktree':
+                # EnterWorktree: 显示名称
+                display_value = tool_input.get('name', '默认名称')
+            elif tool_name == 'ExitWorktree':
+                # ExitWorktree: 显示操作
+                action = tool_input.get('action', 'keep')
+                display_value = f"操作: {action}"
+            elif 'prompt' in tool_input:
+                # 有 prompt 字段的工具（完整显示，不截断）
+                display_value = tool_input['prompt']
+            else:
+                # 其他工具：显示第一个参数
+                if tool_input:
+                    first_key = list(tool_input.keys())[0]
+                    first_value = str(tool_input[first_key])
+                    if len(first_value) > 50:
+                        first_value = first_value[:47] + "..."
+                    display_value = f"{first_key}: {first_value}"
+                else:
+                    display_value = "无参数"
+
+            if display_value:
+                embed.description = display_value
+            else:
+                embed.description = "无参数"
+
+        return embed
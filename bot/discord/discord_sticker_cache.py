@@ -0,0 +1,139 @@
+"""
+Discord Bot - 表情包上传复用模块
+记录每个表情包文件首次上传后的 CDN 地址，之后发送同一表情包时直接引用该地址，不再重复上传
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class StickerUploadCache:
+    """表情包 CDN 地址缓存
+
+    - 按文件内容的 SHA-256 记录首次上传得到的附件 CDN 地址（保存在 SQLite sticker_uploads 表，重启后仍有效）
+    - 文件内容变化（哈希不同）时视为新表情包，重新上传
+    - Discord CDN 地址带签名过期时间（ex 参数），临近过期的地址不再复用；
+      没有过期参数时按 MAX_AGE 处理
+    - 复用前用 HEAD 请求确认地址仍可访问（Discord 不会校验 Embed 中的图片地址，失效地址会显示为空白）
+    """
+
+    # 没有签名过期时间时，地址的最长复用时间（秒）
+    MAX_AGE = 12 * 3600
+    # 距离签名过期不足该时间的地址不再复用（秒）
+    EXPIRY_MARGIN = 600
+    # 校验地址的 HEAD 请求超时（秒）
+    HEAD_TIMEOUT = 5
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._hashes: Dict[str, Tuple[float, int, str]] = {}  # {文件路径: (mtime, size, sha256)}
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取（或创建）校验地址用的 HTTP 会话"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.HEAD_TIMEOUT))
+        return self._session
+
+    async def close(self):
+        """关闭 HTTP 会话"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def _get_connection(self):
+        """获取数据库连接"""
+        return sqlite3.connect(self.db_path)
+
+    def _hash_file(self, path: str) -> str:
+        """计算文件的 SHA-256（按 mtime 和大小缓存，文件未变化时不重复读取）"""
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+            return cached[2]
+        with open(path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        self._hashes[path] = (stat.st_mtime, stat.st_size, sha256)
+        return sha256
+
+    @classmethod
+    def _get_expires_at(cls, url: str, now: float) -> float:
+        """解析 CDN 地址的签名过期时间（ex 参数为十六进制 Unix 时间戳）"""
+        expires_at = now + cls.MAX_AGE
+        try:
+            ex = parse_qs(urlparse(url).query).get("ex")
+            if ex:
+                expires_at = min(expires_at, int(ex[0], 16))
+        except ValueError:
+            pass
+        return expires_at
+
+    def lookup(self, path: str) -> Optional[str]:
+        """
+        查找表情包可复用的 CDN 地址
+
+        Returns:
+            CDN 地址，没有可用地址时返回 None
+        """
+        sha256 = self._hash_file(path)
+        now = time.time()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT url FROM sticker_uploads
+                WHERE sha256 = ? AND expires_at > ?
+            """, (sha256, now + self.EXPIRY_MARGIN))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            cursor.execute("UPDATE sticker_uploads SET last_used_at = ? WHERE sha256 = ?", (now, sha256))
+            conn.commit()
+            return row[0]
+        finally:
+            conn.close()
+
+    async def is_reachable(self, url: str) -> bool:
+        """用 HEAD 请求确认 CDN 地址仍可访问"""
+        try:
+            async with self._get_session().head(url, allow_redirects=True) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.log(f"⚠️ 校验表情包 CDN 地址失败: {e}")
+            return False
+
+    def remember(self, path: str, url: str):
+        """记录表情包上传后的 CDN 地址"""
+        sha256 = self._hash_file(path)
+        now = time.time()
+        conn = self._get_connection()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO sticker_uploads (sha256, file_path, url, expires_at, uploaded_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (sha256, path, url, self._get_expires_at(url, now), now, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def invalidate(self, path: str):
+        """地址已失效：删除记录，下次发送时重新上传"""
+        cached = self._hashes.get(path)
+        if not cached:
+            return
+        conn = self._get_connection()
+        try:
+            conn.execute("DELETE FROM sticker_uploads WHERE sha256 = ?", (cached[2],))
+            conn.commit()
+        finally:
+            conn.close()
+        log.log(f"🗑️ 表情包 CDN 地址已失效，将重新上传: {os.path.basename(path)}")
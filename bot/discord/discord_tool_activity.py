@@ -0,0 +1,203 @@
+"""
+Discord Bot - 工具活动卡片模块（compact 模式）
+每轮只发送一张"工具活动"卡片，逐行列出工具调用及其 🔄/✅/❌ 状态，
+定时编辑更新，超出 Embed 限制时翻页
+"""
+import discord
+import asyncio
+import time
+import traceback
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class DiscordToolActivityMixin:
+    """工具活动卡片 Mixin"""
+
+    # 单张活动卡片最多列出的工具调用数
+    ACTIVITY_MAX_LINES = 25
+    # 单张活动卡片描述的最大长度（Discord Embed 描述上限 4096）
+    ACTIVITY_MAX_LENGTH = 3800
+    # 单行工具参数的最大显示长度
+    ACTIVITY_DETAIL_LENGTH = 80
+
+    def _is_compact_tool_mode(self) -> bool:
+        """是否使用 compact 工具活动卡片模式"""
+        return self.config.tool_use_notification_mode == 'compact'
+
+    def _format_activity_line(self, embed: discord.Embed) -> str:
+        """将单个工具调用卡片压缩为一行（标题 + 截断的参数）"""
+        detail = (embed.description or "").replace("\n", " ").strip()
+        if len(detail) > self.ACTIVITY_DETAIL_LENGTH:
+            detail = detail[:self.ACTIVITY_DETAIL_LENGTH - 3] + "..."
+        return f"{embed.title} · {detail}" if detail else embed.title
+
+    def _render_activity_page(self, state: dict, page: dict) -> discord.Embed:
+        """渲染一页活动卡片"""
+        lines = [state["entries"][index] for index in page["tool_use_indexes"]]
+        if any(line.startswith("🔄") for line in lines):
+            color = discord.Color.blue()
+        elif any(line.startswith("❌") for line in lines):
+            color = discord.Color.red()
+        else:
+            color = discord.Color.green()
+        embed = discord.Embed(
+            title=f"🧰 工具调用 ({len(lines)})",
+            description="\n".join(lines),
+            color=color
+        )
+        return embed
+
+    async def _add_tool_activity(self, channel, message_info: dict, tool_use_index: int, embed: discord.Embed) -> int:
+        """
+        将工具调用追加到当前活动卡片，需要新卡片（首次/翻页/被其他内容隔开）时立即发送
+
+        Returns:
+            实际发送的 Discord 消息条数（用于速率追踪）
+        """
+        message_id = message_info['id']
+        state = self.tool_activity.get(message_id)
+        if state is None:
+            state = {
+                "channel": channel,
+                "destination": {  # 用于多进程分片部署时确认目的地归属
+                    "is_dm": message_info['is_dm'],
+                    "discord_channel_id": message_info['discord_channel_id'],
+                },
+                "pages": [],  # [{"message": discord.Message, "tool_use_indexes": [...], "rendered": str}]
+                "entries": {},  # {tool_use_index: 行内容}
+                "open": False,  # 当前页是否可以继续追加（发送过其他内容后关闭）
+                "dirty": False,
+                "last_update": 0.0,
+                "finished": False,
+            }
+            self.tool_activity[message_id] = state
+
+        line = self._format_activity_line(embed)
+        state["entries"][tool_use_index] = line
+
+        page = state["pages"][-1] if state["pages"] else None
+        if page is not None and state["open"]:
+            lines = [state["entries"][index] for index in page["tool_use_indexes"]]
+            fits = (
+                len(lines) < self.ACTIVITY_MAX_LINES
+                and sum(len(item) + 1 for item in lines) + len(line) <= self.ACTIVITY_MAX_LENGTH
+            )
+            if fits:
+                page["tool_use_indexes"].append(tool_use_index)
+                state["dirty"] = True
+                self._save_activity_ref(message_info, tool_use_index, page["message"])
+                return 0
+
+        # 新的一页：立即发送
+        page = {"message": None, "tool_use_indexes": [tool_use_index], "rendered": ""}
+        rendered = self._render_activity_page(state, page)
+        page["message"] = await channel.send(embed=rendered)
+        page["rendered"] = rendered.description
+        state["pages"].append(page)
+        state["open"] = True
+        self._save_activity_ref(message_info, tool_use_index, page["message"])
+        return 1
+
+    def _save_activity_ref(self, message_info: dict, tool_use_index: int, page_message):
+        """保存工具调用到活动卡片的引用（工具执行结果查询依赖该引用过滤频道类型）"""
+        self.message_queue.save_tool_use_message_ref(
+            message_info['id'],
+            tool_use_index,
+            page_message.id,
+            message_info['discord_channel_id'],
+            message_info['is_dm'],
+            channel_type='discord'
+        )
+
+    def _close_tool_activity_page(self, message_id: int):
+        """发送了其他内容：后续工具调用另起一张活动卡片，保持与文本的先后顺序"""
+        state = self.tool_activity.get(message_id)
+        if state is not None:
+            state["open"] = False
+
+    def _set_tool_activity_result(self, message_id: int, tool_use_index: int, success: bool) -> bool:
+        """
+        更新活动卡片中工具调用的状态
+
+        Returns:
+            该工具调用是否属于活动卡片
+        """
+        state = self.tool_activity.get(message_id)
+        if state is None or tool_use_index not in state["entries"]:
+            return False
+        line = state["entries"][tool_use_index]
+        state["entries"][tool_use_index] = line.replace('🔄', '✅' if success else '❌', 1)
+        state["dirty"] = True
+        return True
+
+    def _finish_tool_activity(self, message_id: int):
+        """消息结束：等最后的工具执行结果处理完、刷新活动卡片后释放状态"""
+        state = self.tool_activity.get(message_id)
+        if state is not None:
+            state["finished"] = True
+
+    def _drop_tool_activity(self, message_id: int):
+        """消息发送失败：频道已不可用，直接释放状态（不再刷新活动卡片）"""
+        self.tool_activity.pop(message_id, None)
+
+    async def check_tool_activity(self):
+        """按节流间隔编辑有变化的活动卡片"""
+        await self.wait_until_ready()
+
+        log.log("🧰 工具活动卡片任务已启动")
+
+        while not self.is_closed():
+            try:
+                now = time.monotonic()
+                for message_id, state in list(self.tool_activity.items()):
+                    # 其他进程分片负责的目的地（分片迁移后）不再编辑
+                    if not await self._owns_destination(state["destination"]):
+                        del self.tool_activity[message_id]
+                        continue
+                    due = now - state["last_update"] >= self.config.tool_use_compact_update_interval
+                    if state["dirty"] and (due or state["finished"]):
+                        await self._flush_tool_activity(state)
+                    # 消息结束后仍可能有未处理的工具执行结果（结果轮询间隔内结束的消息），处理完后再释放
+                    if (state["finished"] and not state["dirty"]
+                            and not self.message_queue.has_pending_tool_use_results(message_id, 'discord')):
+                        del self.tool_activity[message_id]
+
+                await asyncio.sleep(0.5)
+
+            except Exception as e:
+                log.log(f"❌ 更新工具活动卡片时出错: {e}")
+                traceback.print_exc()
+                await asyncio.sleep(5)
+
+    async def _flush_tool_activity(self, state: dict):
+        """编辑内容有变化的活动卡片页"""
+        state["dirty"] = False
+        state["last_update"] = time.monotonic()
+        channel = state["channel"]
+        rate_limiter = getattr(self, "rate_limiter", None)
+
+        for page in state["pages"]:
+            rendered = self._render_activity_page(state, page)
+            if rendered.description == page["rendered"]:
+                continue
+            try:
+                if rate_limiter:
+                    await rate_limiter.acquire(channel.id)
+                page["message"] = await page["message"].edit(embed=rendered) or page["message"]
+                page["rendered"] = rendered.description
+                if rate_limiter:
+                    rate_limiter.record(channel.id)
+            except discord.NotFound:
+                # 卡片已被删除，不再更新
+                page["rendered"] = rendered.description
+            except Exception as e:
+                log.log(f"⚠️ 编辑工具活动卡片失败: {e}")
+                if not state["finished"]:
+                    state["dirty"] = True
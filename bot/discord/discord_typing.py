@@ -0,0 +1,101 @@
+"""
+Discord Bot - typing indicator 多路复用模块
+同一目的地（频道/私聊）只维持一个 typing 循环，按活跃消息引用计数
+"""
+import asyncio
+from typing import Dict, Set
+
+from shared.logger import get_logger
+
+log = get_logger("DiscordBot", "discord")
+
+
+class DiscordTypingMultiplexer:
+    """typing indicator 多路复用器
+
+    - 每个目的地一个 typing 循环，多条待处理消息共享
+    - 引用计数：最后一条消息完成时立即停止该目的地的循环
+    - 出错时按目的地指数退避，连续失败达到上限后停止（有新消息时重新开始）
+    """
+
+    # Discord typing indicator 默认持续 10 秒，每 8 秒刷新一次
+    REFRESH_INTERVAL = 8
+    # 退避等待上限（秒）
+    MAX_BACKOFF = 60
+
+    def __init__(self, max_retries: int = 3, retry_delay: float = 5):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.refs: Dict[int, Set[int]] = {}  # {channel_id: {message_id}}
+        self.channels = {}  # {channel_id: channel}
+        self.tasks: Dict[int, asyncio.Task] = {}  # {channel_id: typing 循环任务}
+        self.message_channels: Dict[int, int] = {}  # {message_id: channel_id}
+
+    def acquire(self, message_id: int, channel):
+        """消息开始等待回复：引用目的地的 typing 循环（不存在时启动）"""
+        channel_id = channel.id
+        self.message_channels[message_id] = channel_id
+        self.refs.setdefault(channel_id, set()).add(message_id)
+        self.channels[channel_id] = channel
+
+        task = self.tasks.get(channel_id)
+        if task is None or task.done():
+            self.tasks[channel_id] = asyncio.create_task(self._typing_loop(channel_id))
+
+    def release(self, message_id: int) -> bool:
+        """
+        消息完成：释放引用，目的地没有活跃消息时立即停止 typing 循环
+
+        Returns:
+            该消息是否持有引用
+        """
+        channel_id = self.message_channels.pop(message_id, None)
+        if channel_id is None:
+            return False
+
+        refs = self.refs.get(channel_id)
+        if refs is not None:
+            refs.discard(message_id)
+            if not refs:
+                del self.refs[channel_id]
+                self.channels.pop(channel_id, None)
+                task = self.tasks.pop(channel_id, None)
+                if task and not task.done():
+                    task.cancel()
+        return True
+
+    def stop_all(self):
+        """停止所有 typing 循环（Bot 关闭时调用）"""
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+        self.refs.clear()
+        self.channels.clear()
+        self.message_channels.clear()
+
+    async def _typing_loop(self, channel_id: int):
+        """单个目的地的 typing 循环"""
+        failures = 0
+        try:
+            while self.refs.get(channel_id):
+                channel = self.channels[channel_id]
+                try:
+                    await channel.typing()
+                    failures = 0
+                    await asyncio.sleep(self.REFRESH_INTERVAL)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failures += 1
+                    log.log(f"⚠️ 维持 typing indicator 时出错 [频道 {channel_id}] (第{failures}次): {e}")
+                    if failures >= self.max_retries:
+                        log.log(f"❌ 维持 typing indicator 失败，已达最大重试次数 ({self.max_retries})，停止尝试")
+                        break
+                    delay = min(self.retry_delay * (2 ** (failures - 1)), self.MAX_BACKOFF)
+                    log.log(f"🔄 {delay}秒后重试...")
+                    await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if self.tasks.get(channel_id) is asyncio.current_task():
+                del self.tasks[channel_id]
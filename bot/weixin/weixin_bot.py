@@ -3,7 +3,11 @@
 接收微信消息并转发给 Claude Code
 """
 import asyncio
+import functools
 import sys
+import time
+import zlib
+from collections import deque
 from pathlib import Path
 from typing import Dict, List, Any
 
@@ -14,9 +18,16 @@ from shared.config import Config
 from shared.logger import get_logger
 from shared.message_queue import MessageQueue, ChannelType
 from shared.context_token_storage import ContextTokenStorage
+from shared.attachment_store import AttachmentStore
 from bot.weixin.weixin_client import WeixinClient, WeixinAccount
 from bot.weixin.weixin_qr_login import WeixinAccountManager
 from bot.weixin.weixin_media import WeixinMediaHandler, WeixinFileMapping
+from bot.weixin.weixin_http import WeixinHttpPool
+from bot.weixin.weixin_upload_cache import WeixinUploadCache
+from bot.weixin.weixin_sync_state import WeixinSyncState
+from bot.weixin.weixin_routing import WeixinRoutingIndex
+from bot.weixin.weixin_rate_limiter import WeixinRateLimiter
+from bot.weixin.weixin_typing_tickets import WeixinTypingTicketCache
 from bot.weixin.weixin_message_handlers import WeixinMessageHandlersMixin
 from bot.weixin.weixin_commands import WeixinCommandsMixin
 from bot.weixin.weixin_sequence_sender import WeixinSequenceSenderMixin
@@ -33,6 +44,11 @@ class WeixinBot(
 ):
     """微信 Bot 类"""
 
+    # 接收队列统计日志的输出间隔（秒）
+    INGEST_STATS_INTERVAL = 300
+    # 停止时等待接收队列处理完毕的最长时间（秒），超时后丢弃剩余消息
+    INGEST_SHUTDOWN_TIMEOUT = 10
+
     def __init__(self, config: Config, message_queue: MessageQueue):
         """初始化 Bot"""
         self.config = config
@@ -63,11 +79,27 @@ class WeixinBot(
         # 停止命令确认缓存（用户_id -> 第一次请求的时间戳）
         self.stop_requests: Dict[str, float] = {}
 
-        # Typing indicator 追踪（消息ID -> typing_task）
+        # Typing indicator 追踪（消息ID -> typing 状态）
         self.pending_messages: Dict[int, Dict[str, Any]] = {}
 
-        # Typing ticket 缓存（用户 -> typing_ticket）
-        self.typing_tickets: Dict[str, str] = {}
+        # 按接收者共享的 typing 循环（(bot_id, 用户) -> {"refs": 消息ID集合, "stop_event", "task"}）
+        self.typing_loops: Dict[tuple, Dict[str, Any]] = {}
+
+        # Typing ticket 缓存（用户 -> typing_ticket，带有效期，过期前后台刷新）
+        self.typing_tickets = WeixinTypingTicketCache(
+            config.weixin_typing_ticket_ttl,
+            config.weixin_typing_ticket_refresh_ahead
+        )
+
+        # 按接收者的发送队列和发送任务（接收者 -> {消息ID: 消息信息} / asyncio.Task）
+        self.recipient_queues: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self.recipient_senders: Dict[str, asyncio.Task] = {}
+
+        # 发送速率控制（每个账号一个令牌桶）
+        self.rate_limiter = WeixinRateLimiter(config.weixin_send_rate, config.weixin_send_burst)
+
+        # 消息路由索引（用户名 -> 账号、客户端、wxid、最新 context_token）
+        self.routing = WeixinRoutingIndex(self.clients, self.context_tokens)
 
         # 账号管理
         self.account_manager = WeixinAccountManager(config.weixin_accounts_file)
@@ -78,14 +110,31 @@ class WeixinBot(
         self._load_users()
 
         # 文件下载和处理（使用 config 中的文件下载路径）
-        self.media_handler = WeixinMediaHandler(config.default_download_directory)
+        self.media_handler = WeixinMediaHandler(
+            config.default_download_directory,
+            http_pool=WeixinHttpPool(config.weixin_cdn_max_connections)  # 按 CDN 主机复用连接
+        )
 
         # 文件映射表（使用微信专用的映射表路径，不与 Discord 共享）
         self.file_mapping = WeixinFileMapping(config.weixin_file_mapping_path)
 
+        # 内容寻址附件存储（与 Discord 共用，按 SHA-256 去重）
+        self.attachment_store = AttachmentStore(
+            config.database_path,
+            config.default_download_directory,
+            config.attachment_store_budget
+        ) if config.attachment_store_enabled else None
+
+        # CDN 上传结果缓存（相同内容再次发送时不重新上传）
+        self.upload_cache = WeixinUploadCache(
+            config.database_path,
+            config.weixin_upload_cache_ttl
+        ) if config.weixin_upload_cache_enabled else None
+
     def _load_accounts(self):
         """加载已保存的账号"""
         self.accounts = self.account_manager.load_accounts()
+        self.routing.rebuild(self.accounts)
         log.log(f"Loaded {len(self.accounts)} accounts")
 
     def _load_users(self):
@@ -224,13 +273,26 @@ class WeixinBot(
         if hasattr(self, 'tool_result_check_task') and self.tool_result_check_task:
             self.tool_result_check_task.cancel()
 
+        # 取消各接收者的发送任务
+        recipient_senders = list(self.recipient_senders.values())
+        for task in recipient_senders:
+            task.cancel()
+
         # 等待任务取消完成
         await asyncio.gather(
             *self.polling_tasks,
             self.sequence_check_task if hasattr(self, 'sequence_check_task') else None,
             self.tool_result_check_task if hasattr(self, 'tool_result_check_task') else None,
+            *recipient_senders,
             return_exceptions=True
         )
+
+        # 关闭 CDN 下载连接池
+        await self.media_handler.close()
+
+        # 写入待保存的 context token 和文件映射
+        self.context_tokens.flush()
+        self.file_mapping.flush()
         log.log("微信 Bot 已停止")
 
     async def _polling_loop(self, account: WeixinAccount):
@@ -252,23 +314,136 @@ class WeixinBot(
 
             log.log(f"✅ 账号 {account.bot_id} 连接成功")
 
-            while self.running:
-                try:
-                    # 长轮询获取消息
-                    data = await client.get_updates(timeout_ms=35000)
-
-                    # 处理消息
-                    msgs = data.get("msgs", [])
-                    if msgs:
-                        for msg in msgs:
-                            await self._handle_message(msg, account.bot_id)
-
-                except asyncio.TimeoutError:
-                    # 长轮询超时是正常的
-                    continue
-                except Exception as e:
-                    log.log(f"❌ 账号 {account.bot_id} 轮询错误: {e}")
-                    await asyncio.sleep(5)
+            # 恢复上次的长轮询游标（重启后从中断的位置继续接收）
+            sync_state = WeixinSyncState(self.config.database_path, account.bot_id)
+            try:
+                client.get_updates_buf = sync_state.load()
+            except Exception as e:
+                log.log(f"⚠️ 账号 {account.bot_id} 恢复长轮询游标失败: {e}")
+
+            # 接收与处理解耦：轮询只负责把消息放入队列，由处理任务池按用户分片处理
+            # （同一用户的消息固定进入同一处理任务，保证顺序；不同用户互不阻塞）
+            worker_count = max(1, self.config.weixin_ingest_workers)
+            queues = [asyncio.Queue(maxsize=max(1, self.config.weixin_ingest_queue_size)) for _ in range(worker_count)]
+            stats = {"received": 0, "blocked": 0, "blocked_seconds": 0.0, "max_depth": 0}
+            # 已接收的批次（按接收顺序）：批次内的消息全部处理完成后才提交游标，
+            # 中途崩溃或停止时未处理的消息会在重启后重新接收
+            batches = deque()
+            on_done = functools.partial(self._finish_ingest_item, sync_state, batches)
+            workers = [
+                asyncio.create_task(self._ingest_worker(account.bot_id, queue, on_done))
+                for queue in queues
+            ]
+            last_stats_log = time.monotonic()
+
+            try:
+                while self.running:
+                    try:
+                        # 长轮询获取消息
+                        data = await client.get_updates(timeout_ms=35000)
+
+                        # 放入处理队列（队列满时等待，形成背压），跳过已接收过的消息
+                        batch = {
+                            "get_updates_buf": client.get_updates_buf,
+                            "message_ids": [],
+                            "pending": 0,
+                            "sealed": False,  # 整批放入队列后才允许提交
+                        }
+                        batches.append(batch)
+                        for msg in data.get("msgs", []):
+                            message_id = msg.get("message_id")
+                            if sync_state.is_duplicate(message_id):
+                                log.log(f"⏭️ 账号 {account.bot_id} 跳过重复消息: {message_id}")
+                                continue
+                            sync_state.add_pending(message_id)
+                            batch["message_ids"].append(message_id)
+                            batch["pending"] += 1
+                            queue = queues[zlib.crc32(str(msg.get("from_user_id", "")).encode("utf-8")) % worker_count]
+                            await self._enqueue_ingest(queue, (msg, batch), stats)
+
+                        # 整批处理完成（且之前的批次都已提交）后保存游标
+                        batch["sealed"] = True
+                        self._commit_ingest_batches(sync_state, batches)
+
+                    except asyncio.TimeoutError:
+                        # 长轮询超时是正常的
+                        continue
+                    except Exception as e:
+                        log.log(f"❌ 账号 {account.bot_id} 轮询错误: {e}")
+                        await asyncio.sleep(5)
+                    finally:
+                        now = time.monotonic()
+                        if now - last_stats_log >= self.INGEST_STATS_INTERVAL and stats["received"]:
+                            last_stats_log = now
+                            self._log_ingest_stats(account.bot_id, queues, stats)
+            finally:
+                await self._drain_ingest_queues(account.bot_id, queues)
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _drain_ingest_queues(self, account_id: str, queues: list):
+        """停止前等待处理任务处理完队列中已接收的消息（最多 INGEST_SHUTDOWN_TIMEOUT 秒）"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in queues)),
+                timeout=self.INGEST_SHUTDOWN_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            dropped = sum(queue.qsize() for queue in queues)
+            log.log(f"⚠️ 账号 {account_id} 停止时接收队列未处理完，丢弃 {dropped} 条消息")
+
+    async def _enqueue_ingest(self, queue: asyncio.Queue, item: tuple, stats: dict):
+        """将消息放入处理队列，队列满时等待并记录背压"""
+        stats["received"] += 1
+        if queue.full():
+            stats["blocked"] += 1
+            start = time.monotonic()
+            await queue.put(item)
+            stats["blocked_seconds"] += time.monotonic() - start
+        else:
+            queue.put_nowait(item)
+        stats["max_depth"] = max(stats["max_depth"], queue.qsize())
+
+    async def _ingest_worker(self, account_id: str, queue: asyncio.Queue, on_done):
+        """消息处理任务：按顺序处理分配到该队列的消息，处理完成后通知所属批次"""
+        while True:
+            msg, batch = await queue.get()
+            try:
+                await self._handle_message(msg, account_id)
+            except Exception as e:
+                log.log(f"❌ 账号 {account_id} 处理消息出错: {e}")
+            finally:
+                on_done(batch)
+                queue.task_done()
+
+    def _finish_ingest_item(self, sync_state: WeixinSyncState, batches: deque, batch: dict):
+        """一条消息处理完成：批次计数减一，并尝试提交已完成的批次"""
+        batch["pending"] -= 1
+        self._commit_ingest_batches(sync_state, batches)
+
+    def _commit_ingest_batches(self, sync_state: WeixinSyncState, batches: deque):
+        """按接收顺序提交已全部处理完成的批次（之前的批次未完成时，后面的批次等待）"""
+        get_updates_buf = None
+        message_ids = []
+        while batches and batches[0]["sealed"] and batches[0]["pending"] == 0:
+            batch = batches.popleft()
+            get_updates_buf = batch["get_updates_buf"]
+            message_ids.extend(batch["message_ids"])
+        if get_updates_buf is None:
+            return
+        try:
+            sync_state.commit(get_updates_buf, message_ids)
+        except Exception as e:
+            log.log(f"⚠️ 账号 {sync_state.bot_id} 保存长轮询游标失败: {e}")
+
+    def _log_ingest_stats(self, account_id: str, queues: list, stats: dict):
+        """输出接收队列的背压统计"""
+        depths = [queue.qsize() for queue in queues]
+        log.log(
+            f"📊 账号 {account_id} 接收队列: 已接收 {stats['received']} 条，当前积压 {sum(depths)} 条 {depths}，"
+            f"最大深度 {stats['max_depth']}，背压等待 {stats['blocked']} 次 / {stats['blocked_seconds']:.1f} 秒"
+        )
 
 
 async def main():
@@ -17,6 +17,7 @@ from dataclasses import dataclass, field
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from shared.logger import get_logger
+from bot.weixin.weixin_crypto import encrypt_file_chunks
 
 log = get_logger("WeixinClient", "weixin")
 
@@ -387,31 +388,22 @@ class WeixinClient:
         Returns:
             下载加密参数（从响应头 x-encrypted-param 获取）
         """
-        from Crypto.Cipher import AES
-        from Crypto.Util.Padding import pad
         from urllib.parse import quote
 
         if not self.session:
             raise RuntimeError("Client session not initialized. Use async context manager.")
 
-        # 读取文件
-        with open(file_path, 'rb') as f:
-            plaintext = f.read()
-
-        # AES-128-ECB 加密
-        cipher = AES.new(aeskey, AES.MODE_ECB)
-        ciphertext = cipher.encrypt(pad(plaintext, AES.block_size))
-
         # 构建 CDN 上传 URL（参考 openclaw-weixin 的实现）
         # 使用账号配置中的 cdn_base_url
         cdn_url = f"{self.account.cdn_base_url}/upload?encrypted_query_param={quote(upload_param)}&filekey={quote(filekey)}"
 
         log.log(f"CDN upload URL: {cdn_url}")
-        log.log(f"Ciphertext size: {len(ciphertext)} bytes")
+        log.log(f"Ciphertext size: {filesize} bytes")
 
-        # 构建请求头
+        # 构建请求头（密文大小已知，显式指定 Content-Length，不使用分块传输编码）
         headers = {
             "Content-Type": "application/octet-stream",
+            "Content-Length": str(filesize),
         }
 
         # 上传到 CDN（直接发送二进制数据），添加重试机制
@@ -420,9 +412,10 @@ class WeixinClient:
 
         for attempt in range(1, max_retries + 1):
             try:
+                # AES-128-ECB 按块加密，边读边加密边上传（每次重试重新读取文件）
                 async with self.session.post(
                     cdn_url,
-                    data=ciphertext,
+                    data=encrypt_file_chunks(file_path, aeskey),
                     headers=headers,
                     timeout=aiohttp.ClientTimeout(total=60)
                 ) as resp:
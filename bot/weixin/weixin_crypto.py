@@ -0,0 +1,99 @@
+"""
+微信 CDN 文件加解密模块
+AES-128-ECB + PKCS7 填充，按块流式处理：
+- 内存占用只和块大小有关，与文件大小无关
+- 读文件、加解密、计算 MD5 等 CPU/IO 工作在线程池中执行，不阻塞事件循环
+"""
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Tuple
+
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad, unpad
+
+# 每次处理的数据块大小（AES 块大小的整数倍）
+CHUNK_SIZE = 1024 * 1024
+
+
+def padded_size(raw_size: int) -> int:
+    """计算 PKCS7 填充后的密文大小（明文为块大小整数倍时也会补一整块）"""
+    return (raw_size // AES.block_size + 1) * AES.block_size
+
+
+def _file_md5(file_path: str) -> str:
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def describe_file(file_path: str) -> Tuple[int, str, int]:
+    """
+    获取上传所需的文件信息（MD5 在线程池中分块计算）
+
+    Returns:
+        (明文大小, 明文 MD5, 密文大小)
+    """
+    raw_size = os.path.getsize(file_path)
+    rawfilemd5 = await asyncio.get_running_loop().run_in_executor(None, _file_md5, file_path)
+    return raw_size, rawfilemd5, padded_size(raw_size)
+
+
+async def encrypt_file_chunks(file_path: str, aeskey: bytes, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    按块读取并加密文件，逐块产出密文（可直接作为 aiohttp 请求体流式上传）
+
+    Args:
+        file_path: 本地文件路径
+        aeskey: AES 密钥
+        chunk_size: 块大小（必须是 AES 块大小的整数倍）
+    """
+    loop = asyncio.get_running_loop()
+    cipher = AES.new(aeskey, AES.MODE_ECB)
+
+    def read_and_encrypt(f):
+        chunk = f.read(chunk_size)
+        if len(chunk) < chunk_size:
+            # 最后一块：补齐 PKCS7 填充
+            return cipher.encrypt(pad(chunk, AES.block_size)), True
+        return cipher.encrypt(chunk), False
+
+    f = await loop.run_in_executor(None, open, file_path, 'rb')
+    try:
+        while True:
+            ciphertext, last = await loop.run_in_executor(None, read_and_encrypt, f)
+            yield ciphertext
+            if last:
+                break
+    finally:
+        f.close()
+
+
+class StreamDecryptor:
+    """流式解密器
+
+    逐段输入密文（长度任意），按块对齐解密后输出明文；始终保留最后一个块，
+    在 finalize() 时去除 PKCS7 填充
+    """
+
+    def __init__(self, aeskey: bytes):
+        self._cipher = AES.new(aeskey, AES.MODE_ECB)
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> bytes:
+        """输入一段密文，返回可以输出的明文"""
+        self._buffer += data
+        # 保留至少一个完整块，留给 finalize 去填充
+        ready = (len(self._buffer) - 1) // AES.block_size * AES.block_size
+        if ready <= 0:
+            return b""
+        chunk, self._buffer = self._buffer[:ready], self._buffer[ready:]
+        return self._cipher.decrypt(chunk)
+
+    def finalize(self) -> bytes:
+        """解密剩余数据并去除填充"""
+        if len(self._buffer) != AES.block_size:
+            raise ValueError(f"密文长度不是 AES 块大小的整数倍（剩余 {len(self._buffer)} 字节）")
+        return unpad(self._cipher.decrypt(self._buffer), AES.block_size)
@@ -0,0 +1,85 @@
+"""
+微信 HTTP 连接池模块
+按主机复用 keep-alive 连接（CDN 下载、扫码登录），避免每个请求都重新建立 TCP/TLS 连接
+"""
+import sys
+from pathlib import Path
+from typing import Dict
+from urllib.parse import urlparse
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from shared.logger import get_logger
+
+log = get_logger("WeixinHttp", "weixin")
+
+
+class WeixinHttpPool:
+    """按主机划分的 HTTP 会话池
+
+    - 每个主机（scheme + host）一个 aiohttp 会话，连接器开启 keep-alive 和 DNS 缓存
+    - 同一主机的并发连接数受 max_connections_per_host 限制
+    - 通过 aiohttp TraceConfig 统计新建连接数和复用连接数
+    """
+
+    # 空闲连接的保持时间（秒）
+    KEEPALIVE_TIMEOUT = 60
+    # DNS 解析结果缓存时间（秒）
+    DNS_CACHE_TTL = 300
+
+    def __init__(self, max_connections_per_host: int = 8):
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}  # {host: {"created": 新建连接数, "reused": 复用连接数}}
+
+    def _trace_config(self, host: str) -> aiohttp.TraceConfig:
+        """创建统计连接建立/复用次数的 TraceConfig"""
+        stats = self.stats.setdefault(host, {"created": 0, "reused": 0})
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, context, params):
+            stats["created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            stats["reused"] += 1
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def session_for(self, url: str) -> aiohttp.ClientSession:
+        """获取 URL 所属主机的共享会话（首次使用时创建）"""
+        parsed = urlparse(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=self.DNS_CACHE_TTL
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[self._trace_config(host)]
+            )
+            self._sessions[host] = session
+        return session
+
+    def format_stats(self) -> str:
+        """格式化连接复用统计"""
+        parts = []
+        for host, stats in self.stats.items():
+            total = stats["created"] + stats["reused"]
+            ratio = stats["reused"] / total * 100 if total else 0
+            parts.append(f"{urlparse(host).netloc}: 新建 {stats['created']} / 复用 {stats['reused']} ({ratio:.0f}%)")
+        return ", ".join(parts)
+
+    async def close(self):
+        """关闭所有会话"""
+        if self.stats:
+            log.log(f"📊 HTTP 连接统计: {self.format_stats()}")
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
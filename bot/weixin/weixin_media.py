@@ -2,6 +2,7 @@
 微信媒体文件下载和处理模块
 支持从微信 CDN 下载并解密文件
 """
+import asyncio
 import os
 import sys
 import aiohttp
@@ -11,11 +12,12 @@ import json
 import re
 from typing import Optional, Dict, Any
 from pathlib import Path
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from shared.logger import get_logger
+from shared.debounced_writer import DebouncedJsonWriter
+from bot.weixin.weixin_http import WeixinHttpPool
+from bot.weixin.weixin_crypto import CHUNK_SIZE, StreamDecryptor
 
 log = get_logger("WeixinMedia", "weixin")
 
@@ -33,27 +35,36 @@ class WeixinMediaDownloader:
     """微信媒体文件下载器"""
 
     DEFAULT_CDN_BASE_URL = "https://novac2c.cdn.weixin.qq.com/c2c"
+    # 每下载多少个文件输出一次连接复用统计
+    STATS_LOG_INTERVAL = 50
 
-    def __init__(self, cdn_base_url: str = None):
+    def __init__(self, cdn_base_url: str = None, http_pool: WeixinHttpPool = None):
         self.cdn_base_url = cdn_base_url or self.DEFAULT_CDN_BASE_URL
+        self.http_pool = http_pool or WeixinHttpPool()  # 按 CDN 主机复用连接
+        self.download_count = 0
 
     async def download_and_decrypt(
         self,
         encrypt_query_param: str,
         aes_key: str,
+        filepath: Path,
         filekey: Optional[str] = None,
         timeout: int = 60
-    ) -> bytes:
-        """从 CDN 下载并解密文件
+    ) -> int:
+        """从 CDN 流式下载并解密文件到本地
+
+        密文按块读取、在线程池中解密并写入临时文件，完成后重命名为目标文件，
+        内存占用与文件大小无关
 
         Args:
             encrypt_query_param: 加密查询参数
             aes_key: AES 密钥（base64 或 hex 格式）
+            filepath: 保存路径
             filekey: 文件标识（可选）
             timeout: 超时时间（秒）
 
         Returns:
-            解密后的文件内容
+            解密后的文件大小（字节）
         """
         from urllib.parse import quote
 
@@ -64,28 +75,53 @@ class WeixinMediaDownloader:
 
         log.log(f"📥 正在下载: {url[:80]}...")
 
-        # 下载加密数据
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url,
-                timeout=aiohttp.ClientTimeout(total=timeout)
-            ) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    raise Exception(f"CDN 下载失败: HTTP {resp.status} - {error_text}")
-
-                ciphertext = await resp.read()
-                log.log(f"📥 下载了 {len(ciphertext)} 字节加密数据")
-
         # 解析 AES key
-        aes_key_bytes = self._parse_aes_key(aes_key)
-
-        # AES-128-ECB 解密
-        cipher = AES.new(aes_key_bytes, AES.MODE_ECB)
-        plaintext = unpad(cipher.decrypt(ciphertext), AES.block_size)
-
-        log.log(f"📥 解密后 {len(plaintext)} 字节")
-        return plaintext
+        decryptor = StreamDecryptor(self._parse_aes_key(aes_key))
+        loop = asyncio.get_running_loop()
+        temp_path = Path(filepath).with_name(Path(filepath).name + ".part")
+        ciphertext_size = 0
+        plaintext_size = 0
+
+        def decrypt_and_write(f, data: bytes) -> int:
+            plaintext = decryptor.feed(data)
+            f.write(plaintext)
+            return len(plaintext)
+
+        def finalize_and_write(f) -> int:
+            plaintext = decryptor.finalize()
+            f.write(plaintext)
+            f.close()
+            return len(plaintext)
+
+        # 下载加密数据（复用 CDN 主机的 keep-alive 连接），边下载边解密
+        session = self.http_pool.session_for(url)
+        async with session.get(
+            url,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as resp:
+            if resp.status != 200:
+                error_text = await resp.text()
+                raise Exception(f"CDN 下载失败: HTTP {resp.status} - {error_text}")
+
+            f = await loop.run_in_executor(None, open, temp_path, "wb")
+            try:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    ciphertext_size += len(chunk)
+                    plaintext_size += await loop.run_in_executor(None, decrypt_and_write, f, chunk)
+                plaintext_size += await loop.run_in_executor(None, finalize_and_write, f)
+                os.replace(temp_path, filepath)
+            except BaseException:
+                f.close()
+                if temp_path.exists():
+                    temp_path.unlink()
+                raise
+
+        log.log(f"📥 下载了 {ciphertext_size} 字节加密数据，解密后 {plaintext_size} 字节")
+
+        self.download_count += 1
+        if self.download_count % self.STATS_LOG_INTERVAL == 0:
+            log.log(f"📊 CDN 连接统计（已下载 {self.download_count} 个文件）: {self.http_pool.format_stats()}")
+        return plaintext_size
 
     def _parse_aes_key(self, aes_key: str) -> bytes:
         """解析 AES 密钥（支持 base64 和 hex 格式）"""
@@ -107,10 +143,14 @@ class WeixinMediaDownloader:
 class WeixinMediaHandler:
     """微信媒体文件处理器"""
 
-    def __init__(self, save_dir: str, cdn_base_url: str = None):
+    def __init__(self, save_dir: str, cdn_base_url: str = None, http_pool: WeixinHttpPool = None):
         self.save_dir = Path(save_dir)
         self.save_dir.mkdir(parents=True, exist_ok=True)
-        self.downloader = WeixinMediaDownloader(cdn_base_url)
+        self.downloader = WeixinMediaDownloader(cdn_base_url, http_pool)
+
+    async def close(self):
+        """关闭 CDN 下载连接池"""
+        await self.downloader.http_pool.close()
 
     async def download_media_item(
         self,
@@ -163,14 +203,11 @@ class WeixinMediaHandler:
                 pass
 
         try:
-            content = await self.downloader.download_and_decrypt(encrypt_param, aes_key)
-
             # 保存文件
             filename = f"weixin_image_{os.urandom(4).hex()}.png"
             filepath = self.save_dir / filename
 
-            with open(filepath, "wb") as f:
-                f.write(content)
+            await self.downloader.download_and_decrypt(encrypt_param, aes_key, filepath)
 
             log.log(f"✅ [{label}] 图片已保存: {filepath}")
             return str(filepath)
@@ -192,8 +229,6 @@ class WeixinMediaHandler:
             return None
 
         try:
-            content = await self.downloader.download_and_decrypt(encrypt_param, aes_key)
-
             # 保存文件（使用安全的文件名）
             safe_filename = self._sanitize_filename(filename)
             filepath = self.save_dir / safe_filename
@@ -205,8 +240,7 @@ class WeixinMediaHandler:
                 filepath = self.save_dir / f"{name}_{counter}{ext}"
                 counter += 1
 
-            with open(filepath, "wb") as f:
-                f.write(content)
+            await self.downloader.download_and_decrypt(encrypt_param, aes_key, filepath)
 
             log.log(f"✅ [{label}] 文件已保存: {filepath}")
             return str(filepath)
@@ -227,14 +261,11 @@ class WeixinMediaHandler:
             return None
 
         try:
-            content = await self.downloader.download_and_decrypt(encrypt_param, aes_key)
-
             # 保存为 SILK 格式
             filename = f"weixin_voice_{os.urandom(4).hex()}.silk"
             filepath = self.save_dir / filename
 
-            with open(filepath, "wb") as f:
-                f.write(content)
+            await self.downloader.download_and_decrypt(encrypt_param, aes_key, filepath)
 
             log.log(f"✅ [{label}] 语音已保存: {filepath}")
             return str(filepath)
@@ -255,14 +286,11 @@ class WeixinMediaHandler:
             return None
 
         try:
-            content = await self.downloader.download_and_decrypt(encrypt_param, aes_key)
-
             # 保存视频
             filename = f"weixin_video_{os.urandom(4).hex()}.mp4"
             filepath = self.save_dir / filename
 
-            with open(filepath, "wb") as f:
-                f.write(content)
+            await self.downloader.download_and_decrypt(encrypt_param, aes_key, filepath)
 
             log.log(f"✅ [{label}] 视频已保存: {filepath}")
             return str(filepath)
@@ -294,6 +322,7 @@ class WeixinFileMapping:
         self.mapping_file = Path(mapping_file)
         self.mapping_file.parent.mkdir(parents=True, exist_ok=True)
         self.mapping: Dict[int, str] = {}  # file_size → filename
+        self._writer = DebouncedJsonWriter(self.mapping_file, lambda: self.mapping)
 
         self._load()
 
@@ -335,12 +364,12 @@ class WeixinFileMapping:
                 self.mapping = {}
 
     def _save(self):
-        """保存映射表到文件"""
-        try:
-            with open(self.mapping_file, 'w', encoding='utf-8') as f:
-                json.dump(self.mapping, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            log.log(f"⚠️ 保存文件映射失败: {e}")
+        """标记映射表需要保存（防抖合并写盘）"""
+        self._writer.mark_dirty()
+
+    def flush(self):
+        """立即将待保存的映射表写入磁盘（退出前调用）"""
+        self._writer.flush()
 
     def add_file(self, filename: str, file_size: int) -> None:
         """添加文件映射
@@ -102,42 +102,8 @@ class WeixinMessageHandlersMixin:
             message_id = self.message_queue.add_message(queue_msg)
             queue_msg.id = message_id
 
-            # 获取 typing ticket（如果还没有的话）
-            if from_user_id not in self.typing_tickets:
-                client = self.clients.get(account_id)
-                if client:
-                    try:
-                        # 获取用户的原始 wxid
-                        wxid = self.username_to_wxid.get(from_user_id, from_user_id)
-                        config_result = await client.get_config(
-                            ilink_user_id=wxid,
-                            context_token=context_token or ""
-                        )
-                        typing_ticket = config_result.get("typing_ticket", "")
-                        if typing_ticket:
-                            self.typing_tickets[from_user_id] = typing_ticket
-                    except Exception as e:
-                        pass
-
-            # 启动 typing indicator（确保 typing_ticket 存在）
-            if from_user_id not in self.typing_tickets:
-                client = self.clients.get(account_id)
-                if client:
-                    try:
-                        wxid = self.username_to_wxid.get(from_user_id, from_user_id)
-                        config_result = await client.get_config(
-                            ilink_user_id=wxid,
-                            context_token=context_token or ""
-                        )
-                        typing_ticket = config_result.get("typing_ticket", "")
-                        if typing_ticket:
-                            self.typing_tickets[from_user_id] = typing_ticket
-                    except Exception as e:
-                        pass
-
-            # 尝试启动 typing indicator
-            if from_user_id in self.typing_tickets:
-                self.start_typing_indicator(message_id, from_user_id, account_id)
+            # 启动 typing indicator（typing ticket 由 typing 循环从缓存获取，缺失时自动调用 getconfig）
+            self.start_typing_indicator(message_id, from_user_id, account_id, context_token or "")
 
         except Exception as e:
             log.log(f"❌ 处理消息失败: {e}")
@@ -187,6 +153,7 @@ class WeixinMessageHandlersMixin:
                         mid_size = image_item.get("mid_size")
                         if mid_size:
                             self.file_mapping.add_file(filename, mid_size)
+                        await self._store_attachment(filepath, mid_size)
                         log.log(f"📎 图片已下载: {filename} (mid_size={mid_size})")
                     # 图片消息不返回内容，不发送给 AI
 
@@ -207,6 +174,7 @@ class WeixinMessageHandlersMixin:
                         file_size = os.path.getsize(filepath)
                         # 保存文件映射：file_size → filename
                         self.file_mapping.add_file(filename, file_size)
+                        await self._store_attachment(filepath, file_size)
                         log.log(f"📎 文件已下载: {filename} ({file_size} bytes)")
                     # 文件消息不返回内容，不发送给 AI
 
@@ -223,6 +191,7 @@ class WeixinMessageHandlersMixin:
                         file_size = os.path.getsize(filepath)
                         # 保存文件映射：file_size → filename
                         self.file_mapping.add_file(filename, file_size)
+                        await self._store_attachment(filepath, file_size)
                         log.log(f"📎 视频已下载: {filename} ({file_size} bytes)")
                     # 视频消息不返回内容，不发送给 AI
 
@@ -236,6 +205,25 @@ class WeixinMessageHandlersMixin:
             log.log(f"❌ 解析消息内容失败: {e}")
             return None, []
 
+    async def _store_attachment(self, filepath: str, size_key: int = None):
+        """将下载的媒体文件纳入内容寻址存储（相同内容只保存一份）"""
+        if not self.attachment_store:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.attachment_store.ingest, filepath, 'weixin', size_key)
+        except Exception as e:
+            log.log(f"⚠️ 媒体文件存入存储失败: {filepath} - {e}")
+
+    def _lookup_filename_by_size(self, file_size: int):
+        """根据文件大小查找本地文件名（优先使用附件存储中仍存在的文件）"""
+        if self.attachment_store:
+            path = self.attachment_store.find_name('weixin', file_size)
+            if path:
+                self.attachment_store.touch(path)
+                return Path(path).name
+        return self.file_mapping.get_filename_by_size(file_size)
+
     def _parse_ref_message_and_lookup(self, ref_msg: dict, from_user_id: str) -> tuple[str, list[dict]]:
         """解析引用消息并从映射表中查找文件
 
@@ -268,7 +256,7 @@ class WeixinMessageHandlersMixin:
                 # 使用文件大小匹配文件
                 file_size = file_item.get("filesize")
                 if file_size:
-                    local_filename = self.file_mapping.get_filename_by_size(file_size)
+                    local_filename = self._lookup_filename_by_size(file_size)
                     if local_filename:
                         # 构造完整文件路径
                         file_path = str(self.media_handler.save_dir / local_filename)
@@ -284,7 +272,7 @@ class WeixinMessageHandlersMixin:
                 image_item = ref_item.get("image_item", {})
                 file_size = image_item.get("mid_size")
                 if file_size:
-                    local_filename = self.file_mapping.get_filename_by_size(file_size)
+                    local_filename = self._lookup_filename_by_size(file_size)
                     if local_filename:
                         # 构造完整文件路径
                         file_path = str(self.media_handler.save_dir / local_filename)
@@ -300,7 +288,7 @@ class WeixinMessageHandlersMixin:
                 video_item = ref_item.get("video_item", {})
                 file_size = video_item.get("video_size")
                 if file_size:
-                    local_filename = self.file_mapping.get_filename_by_size(file_size)
+                    local_filename = self._lookup_filename_by_size(file_size)
                     if local_filename:
                         # 构造完整文件路径
                         file_path = str(self.media_handler.save_dir / local_filename)
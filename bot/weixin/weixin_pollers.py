@@ -16,6 +16,9 @@ log = get_logger("WeixinBot", "weixin")
 class WeixinPollersMixin:
     """轮询任务 Mixin"""
 
+    # typing indicator 出错重试的退避等待上限（秒）
+    TYPING_MAX_BACKOFF = 60
+
     async def check_tool_use_results(self):
         """定期检查工具执行结果并发送工具调用通知"""
         while self.running:
@@ -26,8 +29,8 @@ class WeixinPollersMixin:
                     await asyncio.sleep(5)
                     continue
 
-                # 获取待处理的工具执行结果（只处理微信频道的）
-                pending_results = self.message_queue.get_pending_tool_use_results(channel_type='weixin')
+                # 获取待处理的工具执行结果（只处理微信频道的，同一次查询带上消息字段）
+                pending_results = self.message_queue.get_pending_tool_use_results_with_messages('weixin')
 
                 for result in pending_results:
                     message_id = result['message_id']
@@ -35,76 +38,26 @@ class WeixinPollersMixin:
                     success = result['success']
 
                     try:
-                        # 从数据库获取消息信息
-                        import sqlite3
-                        conn = sqlite3.connect(self.config.database_path)
-                        cursor = conn.cursor()
-                        cursor.execute("""
-                                       SELECT username, discord_channel_id, context_token
-                                       FROM messages
-                                       WHERE id = ?
-                                       """, (message_id,))
-                        row = cursor.fetchone()
-                        conn.close()
-
-                        if not row:
+                        username = result['username']
+                        if not username:
                             # 找不到消息信息，标记为已处理
                             self.message_queue.mark_tool_use_result_processed(message_id, tool_use_index)
                             continue
 
-                        username, channel_id, msg_context_token = row
-
-                        # 根据用户名选择正确的账号
                         if not self.accounts:
                             continue
 
-                        # 检查 username 是配置的用户名还是原始 wxid
-                        target_account = None
-                        to_user_id = username  # 默认使用原始 username
-
-                        if username in self.username_to_wxid:
-                            # username 是配置的用户名（如 "用户名"）
-                            # 从用户名获取对应的 wxid
-                            target_wxid = self.username_to_wxid.get(username)
-                            # 找到包含该 wxid 的账号
-                            for account in self.accounts:
-                                if account.wxid == target_wxid:
-                                    target_account = account
-                                    break
-                            # 使用配置的用户名（send_message 会自动转换为 wxid）
-                            to_user_id = username
-                        elif len(self.accounts) == 1:
-                            # 只有一个账号，直接使用它
-                            target_account = self.accounts[0]
-                            # username 是原始 wxid（外部联系人），直接使用
-                            to_user_id = username
-                        else:
-                            # 多个账号，无法确定使用哪个
-                            # 检查是否有 context_token，如果有则使用第一个有 token 的账号
-                            if self.context_tokens.get(username) is not None:
-                                # 有 context_token，使用第一个账号
-                                target_account = self.accounts[0]
-                                to_user_id = username
-                            else:
-                                # 没有 context_token，跳过这条消息
-                                # 标记为已处理，避免重复处理
-                                self.message_queue.mark_tool_use_result_processed(message_id, tool_use_index)
-                                continue
-
-                        if not target_account:
-                            # 标记为已处理
-                            self.message_queue.mark_tool_use_result_processed(message_id, tool_use_index)
-                            continue
-
-                        client = self.clients.get(target_account.bot_id)
-                        if not client:
-                            # 标记为已处理
+                        # 从路由索引解析目标账号、客户端和 context_token
+                        # （多个账号且无法确定时跳过这条消息，标记为已处理避免重复处理）
+                        route = self.routing.resolve(username, msg_context_token=result['context_token'])
+                        if not route or not route["client"]:
                             self.message_queue.mark_tool_use_result_processed(message_id, tool_use_index)
                             continue
 
-                        # 获取 context_token
-                        # 优先从缓存获取，如果没有则使用消息保存的 context_token
-                        context_token = self.context_tokens.get(username) or msg_context_token or ""
+                        client = route["client"]
+                        # username 可能是配置的用户名或原始 wxid（send_message 会自动转换为 wxid）
+                        to_user_id = username
+                        context_token = route["context_token"]
 
                         if not context_token:
                             # 标记为已处理，避免重复处理
@@ -112,13 +65,12 @@ class WeixinPollersMixin:
                             continue
 
                         # 获取工具调用信息
-                        tool_uses = self.message_queue.get_tool_uses(message_id)
-                        if tool_use_index >= len(tool_uses):
+                        tool_use = result['tool_use']
+                        if tool_use is None:
                             # 标记为已处理
                             self.message_queue.mark_tool_use_result_processed(message_id, tool_use_index)
                             continue
 
-                        tool_use = tool_uses[tool_use_index]
                         tool_name = tool_use.get('name', '')
                         tool_input = tool_use.get('input', {})
 
@@ -200,22 +152,9 @@ class WeixinPollersMixin:
                         if tool_desc and tool_desc != "无参数":
                             notification_text += f"\n{tool_desc}"
 
-                        # 确保 typing_ticket 存在（如果不存在，自动获取）
-                        if username not in self.typing_tickets:
-                            try:
-                                wxid = self.username_to_wxid.get(username, username)
-                                config_result = await client.get_config(
-                                    ilink_user_id=wxid,
-                                    context_token=context_token or ""
-                                )
-                                typing_ticket = config_result.get("typing_ticket", "")
-                                if typing_ticket:
-                                    self.typing_tickets[username] = typing_ticket
-                            except Exception as e:
-                                pass
-
-                        # 发送通知到微信
+                        # 发送通知到微信（和消息序列共用账号的令牌桶）
                         try:
+                            await self.rate_limiter.acquire(route["account"].bot_id)
                             await client.send_message(
                                 to_user_id=to_user_id,
                                 text=notification_text,
@@ -241,25 +180,38 @@ class WeixinPollersMixin:
                 log.log(f"❌ 检查工具执行结果时出错: {e}")
                 await asyncio.sleep(5)
 
-    async def _maintain_typing_indicator(self, client: "WeixinClient", ilink_user_id: str, typing_ticket: str, stop_event: asyncio.Event):
+    async def _maintain_typing_indicator(self, client: "WeixinClient", ilink_user_id: str, context_token: str, typing_key: tuple):
         """
         维持 typing indicator（正在输入状态）
 
-        使用持续刷新模式，每 8 秒刷新一次（微信 typing ticket 默认持续 10 秒）
+        每个接收者只运行一个循环，由该接收者的所有待处理消息共享（引用计数见 typing_loops），
+        使用持续刷新模式，每 8 秒刷新一次（微信 typing indicator 默认持续 10 秒）；
+        typing ticket 从缓存获取（缺失或即将过期时自动刷新，发送失败时丢弃缓存重新获取）；
+        出错时按接收者指数退避，连续失败达到上限后停止
 
         Args:
             client: 微信客户端
             ilink_user_id: 用户 ID（原始 wxid）
-            typing_ticket: typing 票据
-            stop_event: 停止事件
+            context_token: 上下文 token（获取 typing ticket 时使用）
+            typing_key: 接收者标识 (account_bot_id, from_user_id)
         """
+        from_user_id = typing_key[1]
+        loop_state = self.typing_loops[typing_key]
+        stop_event = loop_state["stop_event"]
         retry_count = 0
-        max_retries = 3
-        retry_delay = 5
+        max_retries = self.config.typing_indicator_max_retries
+        retry_delay = self.config.typing_indicator_retry_delay
 
         try:
             while self.running and not stop_event.is_set():
                 try:
+                    typing_ticket = await self.typing_tickets.ensure(
+                        client, from_user_id, ilink_user_id,
+                        self.context_tokens.get(from_user_id) or context_token
+                    )
+                    if not typing_ticket:
+                        raise Exception("无法获取 typing ticket")
+
                     # 微信 typing indicator 默认持续 10 秒
                     # 我们每 8 秒刷新一次，确保有足够余量避免中断
                     await client.send_typing(
@@ -267,89 +219,88 @@ class WeixinPollersMixin:
                         typing_ticket=typing_ticket,
                         status=1  # 1 = 正在输入
                     )
-                    # 使用 wait_for 来响应停止事件，最多等待 8 秒
-                    try:
-                        await asyncio.wait_for(stop_event.wait(), timeout=8)
-                        # stop_event 被设置，退出循环
-                        break
-                    except asyncio.TimeoutError:
-                        # 8 秒超时，继续下一轮循环
-                        pass
-
-                    # 成功完成一次循环，重置重试计数
+                    # 成功完成一次刷新，重置重试计数
                     retry_count = 0
-
+                    delay = 8
                 except asyncio.CancelledError:
                     # 任务被取消，正常退出
                     break
                 except Exception as e:
+                    # ticket 可能已失效：丢弃缓存，下一轮重新获取
+                    self.typing_tickets.invalidate(from_user_id)
                     retry_count += 1
-
                     if retry_count >= max_retries:
+                        log.log(f"❌ 维持 typing indicator 失败，已达最大重试次数 ({max_retries}): {from_user_id} - {e}")
                         break
-                    # 使用 wait_for 来响应停止事件
-                    try:
-                        await asyncio.wait_for(stop_event.wait(), timeout=retry_delay)
-                        break
-                    except asyncio.TimeoutError:
-                        pass
+                    delay = min(retry_delay * (2 ** (retry_count - 1)), self.TYPING_MAX_BACKOFF)
+
+                # 使用 wait_for 来响应停止事件（最后一条消息完成时立即退出）
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
 
         except asyncio.CancelledError:
             # 任务被取消，正常退出
             pass
+        finally:
+            if self.typing_loops.get(typing_key) is loop_state:
+                del self.typing_loops[typing_key]
 
-    def start_typing_indicator(self, message_id: int, from_user_id: str, account_bot_id: str):
+    def start_typing_indicator(self, message_id: int, from_user_id: str, account_bot_id: str, context_token: str = "") -> bool:
         """
-        启动指定消息对应的 typing indicator 任务
+        启动指定消息对应的 typing indicator
+
+        同一接收者已有 typing 循环时只增加引用，不重复启动；
+        typing ticket 由循环从缓存获取，调用方无需预先获取
 
         Args:
             message_id: 消息记录在数据库中的唯一 ID
             from_user_id: 用户名（如"用户名"）
             account_bot_id: 微信账号 bot_id
+            context_token: 上下文 token（缓存中没有该用户的 context_token 时用于获取 typing ticket）
+
+        Returns:
+            是否已启动（缺少客户端时返回 False）
         """
         client = self.clients.get(account_bot_id)
         if not client:
-            return
+            return False
 
         # 获取用户的原始 wxid
-        wxid = self.username_to_wxid.get(from_user_id)
-        if not wxid:
-            return
-
-        # 检查是否已经有 typing ticket
-        typing_ticket = self.typing_tickets.get(from_user_id)
-        if not typing_ticket:
-            return
-
-        # 创建停止事件
-        stop_event = asyncio.Event()
-
-        # 创建 typing indicator 任务
-        typing_task = asyncio.create_task(
-            self._maintain_typing_indicator(client, wxid, typing_ticket, stop_event)
-        )
+        wxid = self.username_to_wxid.get(from_user_id, from_user_id)
+
+        typing_key = (account_bot_id, from_user_id)
+        loop_state = self.typing_loops.get(typing_key)
+        if loop_state is None or loop_state["task"].done():
+            # 该接收者还没有 typing 循环：创建
+            loop_state = {"refs": set(), "stop_event": asyncio.Event(), "task": None}
+            self.typing_loops[typing_key] = loop_state
+            loop_state["task"] = asyncio.create_task(
+                self._maintain_typing_indicator(client, wxid, context_token, typing_key)
+            )
+        loop_state["refs"].add(message_id)
 
         # 保存到 pending_messages
         self.pending_messages[message_id] = {
-            "typing_task": typing_task,
-            "typing_stop_event": stop_event,
             "typing_active": True,
             "from_user_id": from_user_id,
             "account_bot_id": account_bot_id
         }
+        return True
 
     async def stop_typing_indicator(self, message_id: int):
         """
-        停止指定消息对应的 typing indicator 任务
+        停止指定消息对应的 typing indicator
+
+        释放该消息对接收者 typing 循环的引用，最后一条消息完成时立即停止循环并取消输入状态
 
         Args:
             message_id: 消息记录在数据库中的唯一 ID
         """
-        # 从 pending_messages 字典中找到这个消息记录并取消它的 typing_task
         if message_id in self.pending_messages:
             msg_info = self.pending_messages[message_id]
-            task = msg_info.get("typing_task")
-            stop_event = msg_info.get("typing_stop_event")
             from_user_id = msg_info.get("from_user_id")
             account_bot_id = msg_info.get("account_bot_id")
 
@@ -358,9 +309,21 @@ class WeixinPollersMixin:
                 # 已经停止，静默返回
                 return
 
+            # 更新状态为已停止
+            msg_info["typing_active"] = False
+
+            typing_key = (account_bot_id, from_user_id)
+            loop_state = self.typing_loops.get(typing_key)
+            if loop_state is None:
+                return
+            loop_state["refs"].discard(message_id)
+            if loop_state["refs"]:
+                # 同一接收者还有其他待处理消息，继续维持
+                return
+
             # 首先设置停止事件，这会立即停止 _maintain_typing_indicator 循环
-            if stop_event:
-                stop_event.set()
+            del self.typing_loops[typing_key]
+            loop_state["stop_event"].set()
 
             # 然后发送取消状态给微信 API
             if from_user_id and account_bot_id:
@@ -368,7 +331,7 @@ class WeixinPollersMixin:
                 typing_ticket = self.typing_tickets.get(from_user_id)
                 if client and typing_ticket:
                     try:
-                        wxid = self.username_to_wxid.get(from_user_id)
+                        wxid = self.username_to_wxid.get(from_user_id, from_user_id)
                         if wxid:
                             await client.send_typing(
                                 ilink_user_id=wxid,
@@ -379,16 +342,13 @@ class WeixinPollersMixin:
                         pass
 
             # 取消任务（如果还在运行）
+            task = loop_state["task"]
             if task and not task.done():
                 task.cancel()  # 这会触发 _maintain_typing_indicator 中的 CancelledError
                 try:
                     await task  # 等待任务完全停止
                 except asyncio.CancelledError:
                     pass
-
-            # 更新状态为已停止
-            msg_info["typing_active"] = False
-            msg_info["typing_task"] = None
         else:
             # 消息不在缓存中，可能已经被清理，静默返回
             pass
\ No newline at end of file
@@ -14,6 +14,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from shared.logger import get_logger
+from bot.weixin.weixin_http import WeixinHttpPool
 
 log = get_logger("WeixinQRLogin", "weixin")
 
@@ -60,6 +61,14 @@ class WeixinQRLogin:
     QR_TIMEOUT_MS = 35000
     MAX_REFRESH = 3  # 最大二维码刷新次数
 
+    # 获取二维码和轮询扫码状态共用的连接池（复用到登录服务器的 keep-alive 连接）
+    http_pool = WeixinHttpPool(max_connections_per_host=2)
+
+    @staticmethod
+    async def close():
+        """关闭登录使用的连接池"""
+        await WeixinQRLogin.http_pool.close()
+
     @staticmethod
     async def get_qrcode(
         base_url: str = DEFAULT_BASE_URL,
@@ -81,79 +90,79 @@ class WeixinQRLogin:
         url = f"{base_url}/ilink/bot/get_bot_qrcode"
         params = {"bot_type": bot_type}
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    log.log(f"getQRcode HTTP {resp.status}: {error_text}")
-                    raise Exception(f"HTTP {resp.status}: {error_text}")
+        session = WeixinQRLogin.http_pool.session_for(url)
+        async with session.get(url, params=params) as resp:
+            if resp.status != 200:
+                error_text = await resp.text()
+                log.log(f"getQRcode HTTP {resp.status}: {error_text}")
+                raise Exception(f"HTTP {resp.status}: {error_text}")
 
-                # 微信 API 可能返回 JSON 或 octet-stream
-                content_type = resp.headers.get('Content-Type', '')
+            # 微信 API 可能返回 JSON 或 octet-stream
+            content_type = resp.headers.get('Content-Type', '')
 
-                if 'application/json' in content_type:
-                    # JSON 格式响应
-                    data = await resp.json()
-                    qrcode = data.get("qrcode")
-                    qrcode_img = data.get("qrcode_img_content")
+            if 'application/json' in content_type:
+                # JSON 格式响应
+                data = await resp.json()
+                qrcode = data.get("qrcode")
+                qrcode_img = data.get("qrcode_img_content")
 
-                    if not qrcode:
-                        error = data.get("error", "未知错误")
-                        log.log(f"getQRcode failed: {error}")
-                        raise Exception(f"获取二维码失败: {error}")
+                if not qrcode:
+                    error = data.get("error", "未知错误")
+                    log.log(f"getQRcode failed: {error}")
+                    raise Exception(f"获取二维码失败: {error}")
 
-                    log.log(f"QRcode obtained: {qrcode[:16]}...")
-                    return qrcode, qrcode_img
+                log.log(f"QRcode obtained: {qrcode[:16]}...")
+                return qrcode, qrcode_img
 
-                elif 'application/octet-stream' in content_type or 'image/png' in content_type:
-                    # 可能是图片数据，也可能是 JSON（微信 API 的 Content-Type 不准确）
-                    raw_data = await resp.read()
+            elif 'application/octet-stream' in content_type or 'image/png' in content_type:
+                # 可能是图片数据，也可能是 JSON（微信 API 的 Content-Type 不准确）
+                raw_data = await resp.read()
 
-                    # 先尝试解析为 JSON
-                    try:
-                        data = json.loads(raw_data.decode('utf-8'))
-                        qrcode = data.get("qrcode")
-                        qrcode_img = data.get("qrcode_img_content")
+                # 先尝试解析为 JSON
+                try:
+                    data = json.loads(raw_data.decode('utf-8'))
+                    qrcode = data.get("qrcode")
+                    qrcode_img = data.get("qrcode_img_content")
 
-                        if qrcode and qrcode_img:
-                            log.log(f"QRcode obtained (JSON in octet-stream): {qrcode[:16]}...")
-                            log.log(f"QRcode image URL: {qrcode_img[:100] if qrcode_img else 'N/A'}")
-                            return qrcode, qrcode_img
-                    except (json.JSONDecodeError, UnicodeDecodeError):
-                        pass
+                    if qrcode and qrcode_img:
+                        log.log(f"QRcode obtained (JSON in octet-stream): {qrcode[:16]}...")
+                        log.log(f"QRcode image URL: {qrcode_img[:100] if qrcode_img else 'N/A'}")
+                        return qrcode, qrcode_img
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    pass
 
-                    # 如果不是 JSON，当作图片数据处理
-                    import uuid
-                    qrcode = str(uuid.uuid4())
+                # 如果不是 JSON，当作图片数据处理
+                import uuid
+                qrcode = str(uuid.uuid4())
 
-                    # 转换为 base64 data URL
-                    import base64
-                    qrcode_img = f"data:image/png;base64,{base64.b64encode(raw_data).decode()}"
+                # 转换为 base64 data URL
+                import base64
+                qrcode_img = f"data:image/png;base64,{base64.b64encode(raw_data).decode()}"
 
-                    log.log(f"QRcode obtained (image): {qrcode[:16]}...")
-                    return qrcode, qrcode_img
+                log.log(f"QRcode obtained (image): {qrcode[:16]}...")
+                return qrcode, qrcode_img
 
-                else:
-                    # 未知格式，尝试作为文本解析（可能是 JSON 但 Content-Type 错误）
-                    try:
-                        text = await resp.text()
-                        data = json.loads(text)
+            else:
+                # 未知格式，尝试作为文本解析（可能是 JSON 但 Content-Type 错误）
+                try:
+                    text = await resp.text()
+                    data = json.loads(text)
 
-                        qrcode = data.get("qrcode")
-                        qrcode_img = data.get("qrcode_img_content")
+                    qrcode = data.get("qrcode")
+                    qrcode_img = data.get("qrcode_img_content")
 
-                        if not qrcode:
-                            error = data.get("error", "未知错误")
-                            log.log(f"getQRcode failed: {error}")
-                            raise Exception(f"获取二维码失败: {error}")
+                    if not qrcode:
+                        error = data.get("error", "未知错误")
+                        log.log(f"getQRcode failed: {error}")
+                        raise Exception(f"获取二维码失败: {error}")
 
-                        log.log(f"QRcode obtained: {qrcode[:16]}...")
-                        log.log(f"QRcode image URL: {qrcode_img[:100] if qrcode_img else 'N/A'}")
-                        return qrcode, qrcode_img
-                    except json.JSONDecodeError:
-                        # 真的不是 JSON，返回原始数据
-                        log.log(f"Unexpected response: {text[:200]}")
-                        raise Exception(f"无法解析响应: Content-Type={content_type}")
+                    log.log(f"QRcode obtained: {qrcode[:16]}...")
+                    log.log(f"QRcode image URL: {qrcode_img[:100] if qrcode_img else 'N/A'}")
+                    return qrcode, qrcode_img
+                except json.JSONDecodeError:
+                    # 真的不是 JSON，返回原始数据
+                    log.log(f"Unexpected response: {text[:200]}")
+                    raise Exception(f"无法解析响应: Content-Type={content_type}")
 
     @staticmethod
     async def wait_for_scan(
@@ -181,123 +190,123 @@ class WeixinQRLogin:
         start_time = asyncio.get_event_loop().time()
         refresh_count = 0
 
-        async with aiohttp.ClientSession() as session:
-            while True:
-                # 检查超时
-                elapsed = asyncio.get_event_loop().time() - start_time
-                if elapsed > timeout:
-                    log.log(f"QRcode login timeout after {timeout}s")
-                    return LoginResult(
-                        success=False,
-                        error=f"扫码超时（{timeout}秒）"
-                    )
-
-                try:
-                    async with session.get(
-                        url,
-                        params=params,
-                        headers=headers,
-                        timeout=aiohttp.ClientTimeout(total=WeixinQRLogin.QR_TIMEOUT_MS / 1000 + 5)
-                    ) as resp:
-                        if resp.status != 200:
-                            error_text = await resp.text()
-                            log.log(f"getQRcodeStatus HTTP {resp.status}: {error_text}")
-                            await asyncio.sleep(3)
-                            continue
-
-                        # 微信 API 返回 octet-stream 但内容是 JSON
-                        raw_data = await resp.read()
-                        try:
-                            data = json.loads(raw_data.decode('utf-8'))
-                        except json.JSONDecodeError:
-                            log.log(f"Failed to decode response: {raw_data[:200]}")
-                            await asyncio.sleep(3)
-                            continue
-
-                        status = data.get("status")
-                        log.log(f"QRcode status: {status}")
+        session = WeixinQRLogin.http_pool.session_for(url)
+        while True:
+            # 检查超时
+            elapsed = asyncio.get_event_loop().time() - start_time
+            if elapsed > timeout:
+                log.log(f"QRcode login timeout after {timeout}s")
+                return LoginResult(
+                    success=False,
+                    error=f"扫码超时（{timeout}秒）"
+                )
+
+            try:
+                async with session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=WeixinQRLogin.QR_TIMEOUT_MS / 1000 + 5)
+                ) as resp:
+                    if resp.status != 200:
+                        error_text = await resp.text()
+                        log.log(f"getQRcodeStatus HTTP {resp.status}: {error_text}")
+                        await asyncio.sleep(3)
+                        continue
+
+                    # 微信 API 返回 octet-stream 但内容是 JSON
+                    raw_data = await resp.read()
+                    try:
+                        data = json.loads(raw_data.decode('utf-8'))
+                    except json.JSONDecodeError:
+                        log.log(f"Failed to decode response: {raw_data[:200]}")
+                        await asyncio.sleep(3)
+                        continue
+
+                    status = data.get("status")
+                    log.log(f"QRcode status: {status}")
+
+                    # 回调状态变化
+                    if on_status_change:
+                        await on_status_change(status, data)
+
+                    if status == "wait":
+                        # 等待扫码
+                        await asyncio.sleep(3)
+                        continue
+
+                    elif status == "scaned":
+                        # 已扫码，等待确认
+                        log.log("QRcode scanned, waiting for confirmation...")
+                        await asyncio.sleep(2)
+                        continue
+
+                    elif status == "confirmed":
+                        # 已确认，提取登录信息
+                        bot_token = data.get("bot_token")
+                        bot_id = data.get("ilink_bot_id")
+                        base_url_resp = data.get("baseurl", base_url)
+                        user_id = data.get("ilink_user_id")
+
+                        if not bot_token or not bot_id:
+                            log.log("Missing bot_token or bot_id in response")
+                            return LoginResult(
+                                success=False,
+                                error="登录信息不完整"
+                            )
 
-                        # 回调状态变化
-                        if on_status_change:
-                            await on_status_change(status, data)
+                        log.log(f"Login success: bot_id={bot_id}, user_id={user_id}")
+                        return LoginResult(
+                            success=True,
+                            bot_token=bot_token,
+                            bot_id=bot_id,
+                            base_url=base_url_resp,
+                            user_id=user_id
+                        )
+
+                    elif status == "expired":
+                        # 二维码过期
+                        refresh_count += 1
+                        if refresh_count > WeixinQRLogin.MAX_REFRESH:
+                            log.log("QRcode expired too many times")
+                            return LoginResult(
+                                success=False,
+                                error="二维码过期次数过多"
+                            )
 
-                        if status == "wait":
-                            # 等待扫码
-                            await asyncio.sleep(3)
-                            continue
+                        log.log(f"QRcode expired, refreshing ({refresh_count}/{WeixinQRLogin.MAX_REFRESH})...")
 
-                        elif status == "scaned":
-                            # 已扫码，等待确认
-                            log.log("QRcode scanned, waiting for confirmation...")
-                            await asyncio.sleep(2)
+                        # 重新获取二维码
+                        try:
+                            new_qrcode, _ = await WeixinQRLogin.get_qrcode(base_url)
+                            params["qrcode"] = new_qrcode
+                            log.log(f"QRcode refreshed: {new_qrcode[:16]}...")
                             continue
-
-                        elif status == "confirmed":
-                            # 已确认，提取登录信息
-                            bot_token = data.get("bot_token")
-                            bot_id = data.get("ilink_bot_id")
-                            base_url_resp = data.get("baseurl", base_url)
-                            user_id = data.get("ilink_user_id")
-
-                            if not bot_token or not bot_id:
-                                log.log("Missing bot_token or bot_id in response")
-                                return LoginResult(
-                                    success=False,
-                                    error="登录信息不完整"
-                                )
-
-                            log.log(f"Login success: bot_id={bot_id}, user_id={user_id}")
+                        except Exception as e:
+                            log.log(f"Failed to refresh QRcode: {e}")
                             return LoginResult(
-                                success=True,
-                                bot_token=bot_token,
-                                bot_id=bot_id,
-                                base_url=base_url_resp,
-                                user_id=user_id
+                                success=False,
+                                error=f"刷新二维码失败: {e}"
                             )
 
-                        elif status == "expired":
-                            # 二维码过期
-                            refresh_count += 1
-                            if refresh_count > WeixinQRLogin.MAX_REFRESH:
-                                log.log("QRcode expired too many times")
-                                return LoginResult(
-                                    success=False,
-                                    error="二维码过期次数过多"
-                                )
-
-                            log.log(f"QRcode expired, refreshing ({refresh_count}/{WeixinQRLogin.MAX_REFRESH})...")
-
-                            # 重新获取二维码
-                            try:
-                                new_qrcode, _ = await WeixinQRLogin.get_qrcode(base_url)
-                                params["qrcode"] = new_qrcode
-                                log.log(f"QRcode refreshed: {new_qrcode[:16]}...")
-                                continue
-                            except Exception as e:
-                                log.log(f"Failed to refresh QRcode: {e}")
-                                return LoginResult(
-                                    success=False,
-                                    error=f"刷新二维码失败: {e}"
-                                )
-
-                        else:
-                            # 未知状态
-                            log.log(f"Unknown status: {status}")
-                            await asyncio.sleep(3)
-                            continue
-
-                except asyncio.TimeoutError:
-                    # 长轮询超时，继续
-                    log.log("QRcode polling timeout (normal)")
-                    continue
-                except aiohttp.ClientError as e:
-                    log.log(f"QRcode polling error: {e}")
-                    await asyncio.sleep(3)
-                    continue
-                except Exception as e:
-                    log.log(f"QRcode polling unexpected error: {e}")
-                    await asyncio.sleep(3)
-                    continue
+                    else:
+                        # 未知状态
+                        log.log(f"Unknown status: {status}")
+                        await asyncio.sleep(3)
+                        continue
+
+            except asyncio.TimeoutError:
+                # 长轮询超时，继续
+                log.log("QRcode polling timeout (normal)")
+                continue
+            except aiohttp.ClientError as e:
+                log.log(f"QRcode polling error: {e}")
+                await asyncio.sleep(3)
+                continue
+            except Exception as e:
+                log.log(f"QRcode polling unexpected error: {e}")
+                await asyncio.sleep(3)
+                continue
 
 
 class WeixinAccountManager:
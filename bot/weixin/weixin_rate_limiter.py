@@ -0,0 +1,61 @@
+"""
+微信 Bot - 发送速率控制模块
+按账号维护令牌桶，控制 iLink sendmessage 的发送速率
+"""
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """单个账号的令牌桶（按固定速率补充令牌，最多累积 burst 个）"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class WeixinRateLimiter:
+    """微信发送速率控制器
+
+    - 每个账号（bot_id）一个令牌桶：短时间内最多连发 burst 条，之后按 rate 条/秒发送
+    - 不同账号的桶互相独立，一个账号限流不会拖慢其他账号
+    - 桶"过热"（剩余令牌不足一条）时，发送方可合并相邻文本减少请求数
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(0.01, rate)
+        self.burst = max(1, burst)
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, bot_id: str) -> TokenBucket:
+        bucket = self.buckets.get(bot_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self.buckets[bot_id] = bucket
+        return bucket
+
+    def is_hot(self, bot_id: str) -> bool:
+        """账号的令牌桶是否过热（已没有可立即使用的令牌）"""
+        bucket = self._bucket(bot_id)
+        bucket._refill(time.monotonic())
+        return bucket.tokens < 1
+
+    async def acquire(self, bot_id: str, count: int = 1):
+        """等待并取走 count 个令牌（同一账号的等待者按到达顺序排队）"""
+        bucket = self._bucket(bot_id)
+        async with bucket.lock:
+            for _ in range(count):
+                bucket._refill(time.monotonic())
+                if bucket.tokens < 1:
+                    await asyncio.sleep((1 - bucket.tokens) / bucket.rate)
+                    bucket._refill(time.monotonic())
+                bucket.tokens -= 1
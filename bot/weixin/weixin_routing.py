@@ -0,0 +1,81 @@
+"""
+微信消息路由索引模块
+预先建立 用户名/wxid/user_id → 账号 的映射，发送工具通知和消息序列时 O(1) 查出目标账号、
+客户端、wxid 和最新的 context_token，不再逐条线性扫描账号列表
+"""
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from shared.context_token_storage import ContextTokenStorage
+from bot.weixin.weixin_client import WeixinClient, WeixinAccount
+
+
+class WeixinRoutingIndex:
+    """微信消息路由索引
+
+    - 账号映射在加载账号时建立，账号变化后调用 rebuild() 重建
+    - 客户端和 context_token 直接引用 Bot 的 clients 字典和 ContextTokenStorage，
+      连接建立、token 更新后无需额外维护即可查到最新值
+    """
+
+    def __init__(self, clients: Dict[str, WeixinClient], context_tokens: ContextTokenStorage):
+        self.clients = clients
+        self.context_tokens = context_tokens
+        self.accounts: List[WeixinAccount] = []
+        self._by_username: Dict[str, WeixinAccount] = {}
+        self._by_wxid: Dict[str, WeixinAccount] = {}
+        self._by_user_id: Dict[int, WeixinAccount] = {}
+
+    def rebuild(self, accounts: List[WeixinAccount]):
+        """根据账号列表重建索引"""
+        self.accounts = list(accounts)
+        by_wxid = {}
+        for account in self.accounts:
+            # 同一 wxid 绑定了多个账号时，和原先线性扫描一样取第一个
+            by_wxid.setdefault(account.wxid, account)
+        self._by_wxid = by_wxid
+        self._by_username = {account.username: by_wxid[account.wxid] for account in self.accounts}
+        self._by_user_id = {account.user_id: account for account in self.accounts}
+
+    def resolve(self, username: str, user_id: Optional[int] = None, msg_context_token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        解析消息的发送目标
+
+        解析顺序：配置的用户名 → 唯一账号 → 有 context_token 时使用第一个账号 → 按 user_id 查找
+
+        Args:
+            username: 消息记录中的用户名（配置的用户名或外部联系人的原始 wxid）
+            user_id: 消息记录中的用户 ID（可选，用于最后的兜底查找）
+            msg_context_token: 消息记录中保存的 context_token（缓存中没有时使用）
+
+        Returns:
+            {"account", "client", "username", "wxid", "context_token"}，无法确定账号时返回 None
+        """
+        if not self.accounts:
+            return None
+
+        account = None
+        if username in self._by_username:
+            account = self._by_username[username]
+        elif len(self.accounts) == 1:
+            account = self.accounts[0]
+        elif self.context_tokens.get(username) is not None:
+            account = self.accounts[0]
+        elif user_id and user_id in self._by_user_id:
+            owner = self._by_user_id[user_id]
+            account = self._by_wxid[owner.wxid]
+            # 修正 username，确保后续 context_token 等查找正确
+            username = owner.username
+
+        if account is None:
+            return None
+
+        return {
+            "account": account,
+            "client": self.clients.get(account.bot_id),
+            "username": username,
+            "wxid": account.wxid if username in self._by_username else username,
+            "context_token": self.context_tokens.get(username) or msg_context_token or "",
+        }
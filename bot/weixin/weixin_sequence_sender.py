@@ -1,17 +1,23 @@
 """
 微信 Bot 消息序列发送模块
 处理消息序列的发送
+
+发送模型：
+- 调度循环（check_message_sequences）扫描有待发送序列的消息，按接收者分组
+- 每个接收者一个独立的发送任务，接收者内严格按消息 ID、序列顺序发送
+- 不同接收者之间并发发送，发送速率由每个账号的令牌桶控制（不同账号互不影响）
 """
 import asyncio
 import os
 import sys
+import time
 from pathlib import Path
-from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from shared.message_queue import MessageStatus
 from shared.logger import get_logger
+from bot.weixin.weixin_crypto import describe_file
 
 log = get_logger("WeixinBot", "weixin")
 
@@ -19,379 +25,393 @@ log = get_logger("WeixinBot", "weixin")
 class WeixinSequenceSenderMixin:
     """消息序列发送 Mixin"""
 
-    async def check_message_sequences(self):
-        """检查并发送消息序列（统一的发送任务）"""
-        from datetime import datetime
+    # 合并文本的最大长度
+    COALESCE_MAX_LENGTH = 4000
+    # 单次合并最多查看的待发送序列项数
+    COALESCE_LOOKAHEAD = 20
 
-        # 追踪每个消息的发送状态
-        message_states = {}
+    # 接收者发送任务空闲（都在等待 AI 输出）时的轮询间隔：从最小值开始指数退避到最大值（秒）
+    SENDER_IDLE_MIN_DELAY = 0.1
+    SENDER_IDLE_MAX_DELAY = 0.5
 
+    async def check_message_sequences(self):
+        """检查消息序列并分发到各接收者的发送任务（统一的发送调度）"""
         while self.running:
             try:
-                # 获取有待发送序列的消息
-                messages = self.message_queue.get_messages_with_pending_sequences('weixin', limit=1)
+                # 获取有待发送序列的消息（按消息 ID 升序）
+                messages = self.message_queue.get_messages_with_pending_sequences('weixin', limit=100)
+
+                for message_info in messages:
+                    recipient = message_info['username']
+                    queue = self.recipient_queues.setdefault(recipient, {})
+                    if message_info['id'] not in queue:
+                        queue[message_info['id']] = message_info
+
+                    sender = self.recipient_senders.get(recipient)
+                    if sender is None or sender.done():
+                        self.recipient_senders[recipient] = asyncio.create_task(
+                            self._recipient_sender_loop(recipient)
+                        )
 
                 if not messages:
-                    # 没有待发送的序列，检查 pending_messages 中的消息是否完成
+                    # 没有待发送的序列，检查不在任何接收者队列中的 pending_messages 是否完成
+                    queued_ids = {mid for queue in self.recipient_queues.values() for mid in queue}
                     for message_id in list(self.pending_messages.keys()):
-                        stats = self.message_queue.get_message_sequences_stats(message_id)
-
-                        # 检查 AI 响应是否已完成，且所有序列都已发送（和 Discord bot 完全一样的逻辑）
-                        if stats["total"] > 0 and stats["pending"] == 0 and self.message_queue.is_ai_response_complete(message_id):
-                            # 1. 停止正在输入状态
-                            await self.stop_typing_indicator(message_id)
-                            # 2. 清理数据库相关序列
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            # 3. 更新消息状态为 COMPLETED
-                            self.message_queue.update_status(message_id, MessageStatus.COMPLETED)
-                            # 4. 清理内存缓存
-                            if message_id in message_states:
-                                del message_states[message_id]
-                            if message_id in self.pending_messages:
-                                del self.pending_messages[message_id]
-
-                    await asyncio.sleep(0.5)
-                    continue
+                        if message_id not in queued_ids:
+                            await self._finish_message_if_complete(message_id)
 
-                message_info = messages[0]
-                message_id = message_info['id']
-                channel_id = message_info['discord_channel_id']
-                user_id = message_info['discord_user_id']
-                is_dm = message_info['is_dm']
-                channel_type = message_info['channel_type']
-                username = message_info['username']
-                msg_context_token = message_info['context_token']
+                await asyncio.sleep(0.2 if messages else 0.5)
 
-                try:
+            except Exception as e:
+                log.log(f"❌ 检查消息序列时出错: {e}")
+                await asyncio.sleep(5)
 
-                    # 根据用户名选择正确的账号（提前解析，和 Discord bot 一致：发现消息就启动 typing）
-                    target_account = None
-                    to_user_id = username  # 默认使用原始 username
-
-                    if self.accounts and username in self.username_to_wxid:
-                        target_wxid = self.username_to_wxid.get(username)
-                        for account in self.accounts:
-                            if account.wxid == target_wxid:
-                                target_account = account
-                                break
-                        to_user_id = username
-                    elif self.accounts and len(self.accounts) == 1:
-                        target_account = self.accounts[0]
-                        to_user_id = username
-                    elif self.accounts and self.context_tokens.get(username) is not None:
-                        target_account = self.accounts[0]
-                        to_user_id = username
-                    elif self.accounts and user_id and user_id in self.userid_to_user:
-                        user_info = self.userid_to_user[user_id]
-                        resolved_username = user_info['username']
-                        target_wxid = user_info['wxid']
-                        for account in self.accounts:
-                            if account.wxid == target_wxid:
-                                target_account = account
-                                to_user_id = resolved_username
-                                username = resolved_username  # 修正 username，确保后续 context_token 等查找正确
-                                break
-
-                    # 发现外部消息：立即占位 + 尝试启动 typing indicator（和 Discord bot 一致的逻辑）
-                    if message_id not in self.pending_messages:
-                        log.log(f"📨 [消息 #{message_id}] 已加载外部消息: {username}")
-
-                        # 尝试立即启动 typing indicator
-                        typing_task = None
-                        typing_stop_event = None
-                        typing_active = False
-                        account_bot_id = None
-
-                        if target_account:
-                            client = self.clients.get(target_account.bot_id)
-                            wxid = self.username_to_wxid.get(username, username)
-                            typing_ticket = self.typing_tickets.get(username)
-                            # 优先从持久化缓存取 context_token（和发送序列时的逻辑一致）
-                            effective_context_token = self.context_tokens.get(username) or msg_context_token or ""
-                            if not typing_ticket and client and effective_context_token:
-                                # 尝试通过 get_config 获取 typing_ticket
-                                try:
-                                    config_result = await client.get_config(
-                                        ilink_user_id=wxid,
-                                        context_token=effective_context_token
-                                    )
-                                    typing_ticket = config_result.get("typing_ticket", "")
-                                    if typing_ticket:
-                                        self.typing_tickets[username] = typing_ticket
-                                except Exception:
-                                    pass
-                            if typing_ticket and client:
-                                typing_stop_event = asyncio.Event()
-                                typing_task = asyncio.create_task(
-                                    self._maintain_typing_indicator(client, wxid, typing_ticket, typing_stop_event)
-                                )
-                                typing_active = True
-                                account_bot_id = target_account.bot_id
-
-                        self.pending_messages[message_id] = {
-                            "typing_task": typing_task,
-                            "typing_stop_event": typing_stop_event,
-                            "typing_active": typing_active,
-                            "from_user_id": username,
-                            "account_bot_id": account_bot_id
-                        }
-
-                    # 初始化消息状态
-                    if message_id not in message_states:
-                        message_states[message_id] = {"pending": []}
-
-                    # 获取待发送的序列项（每次只取一条，确保严格按顺序发送）
+    async def _finish_message_if_complete(self, message_id: int) -> bool:
+        """
+        检查消息是否已全部发送完成，完成时执行收尾清理
+
+        Returns:
+            消息是否已完成
+        """
+        stats = self.message_queue.get_message_sequences_stats(message_id)
+
+        # 检查 AI 响应是否已完成，且所有序列都已发送（和 Discord bot 相同的逻辑）
+        # 但需要额外检查是否还有未处理的工具结果
+        if not (stats["total"] > 0 and stats["pending"] == 0 and self.message_queue.is_ai_response_complete(message_id)):
+            return False
+        if self.message_queue.has_pending_tool_use_results(message_id, 'weixin'):
+            return False
+
+        # 1. 停止正在输入状态
+        await self.stop_typing_indicator(message_id)
+        # 2. 清理数据库相关序列
+        self.message_queue.cleanup_message_sequences(message_id)
+        # 3. 更新消息状态为 COMPLETED
+        self.message_queue.update_status(message_id, MessageStatus.COMPLETED)
+        # 4. 清理 pending_messages
+        if message_id in self.pending_messages:
+            del self.pending_messages[message_id]
+        return True
+
+    async def _recipient_sender_loop(self, recipient: str):
+        """
+        单个接收者的发送任务
+
+        接收者内按消息 ID 顺序处理：优先发送 ID 最小且有待发送序列项的消息，
+        每次只发送一条序列项（或一批合并的文本），确保严格按顺序发送。接收者队列清空后任务退出。
+        """
+        idle_delay = self.SENDER_IDLE_MIN_DELAY
+
+        try:
+            while self.running:
+                queue = self.recipient_queues.get(recipient)
+                if not queue:
+                    break
+
+                target = None
+                for message_id in sorted(queue):
                     pending_sequences = self.message_queue.get_pending_message_sequences(message_id, limit=1)
+                    if pending_sequences:
+                        target = (message_id, pending_sequences[0])
+                        break
+                    # 没有待发送的序列，检查是否完成
+                    if await self._finish_message_if_complete(message_id):
+                        log.log(f"✅ [消息 #{message_id}] 所有序列已发送，AI 响应已完成")
+                        queue.pop(message_id, None)
+
+                if target is None:
+                    # 队列中的消息都在等待 AI 继续输出：逐步拉长检查间隔，减少数据库查询
+                    await asyncio.sleep(idle_delay)
+                    idle_delay = min(idle_delay * 2, self.SENDER_IDLE_MAX_DELAY)
+                    continue
+                idle_delay = self.SENDER_IDLE_MIN_DELAY
 
-                    if not pending_sequences:
-                        # 没有待发送的序列，检查是否完成
-                        stats = self.message_queue.get_message_sequences_stats(message_id)
-
-                        # 检查 AI 响应是否已完成，且所有序列都已发送
-                        # 使用和 Discord bot 相同的逻辑：pending == 0 且 AI 响应完成
-                        # 但需要额外检查是否还有未处理的工具结果
-                        pending_tool_results = self.message_queue.get_pending_tool_use_results()
-                        pending_for_this_msg = [r for r in pending_tool_results if r["message_id"] == message_id]
-                        if pending_for_this_msg:
-                            await asyncio.sleep(0.1)
-                            continue
+                message_id, seq = target
+                message_info = queue[message_id]
 
-                        if stats["total"] > 0 and stats["pending"] == 0 and self.message_queue.is_ai_response_complete(message_id):
-                            log.log(f"✅ [消息 #{message_id}] 所有序列已发送，AI 响应已完成")
-                            # 1. 停止正在输入状态
-                            await self.stop_typing_indicator(message_id)
-                            # 2. 清理数据库相关序列
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            # 3. 更新消息状态为 COMPLETED
-                            self.message_queue.update_status(message_id, MessageStatus.COMPLETED)
-                            # 4. 清理内存缓存
-                            if message_id in message_states:
-                                del message_states[message_id]
-                            # 5. 清理 pending_messages
-                            if message_id in self.pending_messages:
-                                del self.pending_messages[message_id]
-                        else:
-                            #还未完成，等待下一轮
-                            await asyncio.sleep(0.1)
-                        continue
+                try:
+                    # 根据用户名选择正确的账号（和 Discord bot 一致：发现消息就启动 typing）
+                    route = self.routing.resolve(
+                        message_info['username'],
+                        message_info['discord_user_id'],
+                        message_info['context_token']
+                    )
+
+                    # 发现外部消息：立即占位 + 尝试启动 typing indicator
+                    if message_id not in self.pending_messages:
+                        await self._track_untracked_message(message_info, route)
 
-                    # 确保有可用的账号（提前解析可能失败时的兜底逻辑）
-                    if not target_account:
+                    # 确保有可用的账号
+                    if not route:
                         if not self.accounts:
+                            await asyncio.sleep(1)
                             continue
-                        if username in self.username_to_wxid:
-                            target_wxid = self.username_to_wxid.get(username)
-                            for account in self.accounts:
-                                if account.wxid == target_wxid:
-                                    target_account = account
-                                    break
-                            if target_account:
-                                to_user_id = username
-                        if not target_account and len(self.accounts) == 1:
-                            target_account = self.accounts[0]
-                            to_user_id = username
-                        if not target_account and self.context_tokens.get(username) is not None:
-                            target_account = self.accounts[0]
-                            to_user_id = username
-                        if not target_account and user_id and user_id in self.userid_to_user:
-                            user_info = self.userid_to_user[user_id]
-                            resolved_username = user_info['username']
-                            target_wxid = user_info['wxid']
-                            for account in self.accounts:
-                                if account.wxid == target_wxid:
-                                    target_account = account
-                                    to_user_id = resolved_username
-                                    username = resolved_username  # 修正 username，确保后续 context_token 等查找正确
-                                    break
-                        if not target_account:
-                            log.log(f"⚠️ [消息 #{message_id}] 无法解析目标账号: username={username}, user_id={user_id}，消息序列已清理")
-                            self.message_queue.cleanup_message_sequences(message_id)
-                            continue
-
-                    if not target_account:
-                        continue
-
-                    client = self.clients.get(target_account.bot_id)
-                    if not client:
+                        log.log(f"⚠️ [消息 #{message_id}] 无法解析目标账号: username={message_info['username']}, user_id={message_info['discord_user_id']}，消息序列已清理")
+                        self.message_queue.cleanup_message_sequences(message_id)
+                        queue.pop(message_id, None)
                         continue
 
-                    # 获取 context_token
-                    # 优先从缓存获取，如果没有则使用消息保存的 context_token
-                    context_token = self.context_tokens.get(username) or msg_context_token or ""
-
-                    if not context_token:
+                    # 账号尚未连接或没有 context_token 时稍后重试
+                    if not route["client"] or not route["context_token"]:
+                        await asyncio.sleep(1)
                         continue
 
-                    # 发送序列项（只有一条）
-                    seq = pending_sequences[0]
-                    seq_id = seq["id"]
-                    seq_index = seq["sequence_index"]
-                    item_type = seq["item_type"]
-                    item_data = seq["item_data"]
-                    tool_use_index = seq.get("tool_use_index")  # 获取工具调用索引
+                    # 相邻文本合并发送（关闭消息分割时始终合并；否则仅在账号接近限速时合并）
+                    batch = self._collect_coalescible_texts(message_id, seq, route["account"].bot_id)
 
                     try:
-                        if item_type == "text":
-                            # 发送文本消息
-                            text = item_data.get("text", "")
-                            if text and text.strip():
-                                # 确保 typing_ticket 存在（如果不存在，自动获取）
-                                if username not in self.typing_tickets:
-                                    try:
-                                        wxid = self.username_to_wxid.get(username, username)
-                                        config_result = await client.get_config(
-                                            ilink_user_id=wxid,
-                                            context_token=context_token or ""
-                                        )
-                                        typing_ticket = config_result.get("typing_ticket", "")
-                                        if typing_ticket:
-                                            self.typing_tickets[username] = typing_ticket
-                                    except Exception as e:
-                                        pass
-
-                                # 确保 typing indicator 已启动（后备：如果前面因为缺少 typing_ticket 没启动）
-                                pending_info = self.pending_messages.get(message_id)
-                                if pending_info and not pending_info.get("typing_active"):
-                                    typing_ticket = self.typing_tickets.get(username)
-                                    if typing_ticket:
-                                        wxid = self.username_to_wxid.get(username, username)
-                                        stop_event = asyncio.Event()
-                                        typing_task = asyncio.create_task(
-                                            self._maintain_typing_indicator(client, wxid, typing_ticket, stop_event)
-                                        )
-                                        self.pending_messages[message_id] = {
-                                            "typing_task": typing_task,
-                                            "typing_stop_event": stop_event,
-                                            "typing_active": True,
-                                            "from_user_id": username,
-                                            "account_bot_id": target_account.bot_id
-                                        }
-
-                                # 调试日志
-
-                                try:
-                                    # 直接发送文本
-                                    await client.send_message(
-                                        to_user_id=to_user_id,
-                                        text=text.strip(),
-                                        context_token=context_token
-                                    )
-                                    log.log(f"✅ [消息 #{message_id}] 已发送: {text[:30]}...")
-                                except Exception as send_error:
-                                    # 发送失败
-                                    log.log(f"❌ [消息 #{message_id}] 发送失败: {send_error}")
-                                    # 标记序列为已发送，避免无限重试
-                                    self.message_queue.mark_sequence_sent(seq_id)
-                                    # 继续下一条消息
-                                    continue
-
-                        elif item_type == "sticker":
-                            # 表情包：从 item_data 获取文件路径，发送为图片
-                            sticker_path = item_data.get("file_path", "") if item_data else ""
-                            if sticker_path:
-                                try:
-                                    await self._send_sticker_image(client, to_user_id, sticker_path, context_token)
-                                    log.log(f"✅ [消息 #{message_id}] 已发送表情包: {os.path.basename(sticker_path)}")
-                                except Exception as e:
-                                    log.log(f"❌ [消息 #{message_id}] 表情包发送失败: {sticker_path} - {e}")
-                            else:
-                                log.log(f"⚠️ [消息 #{message_id}] 表情包文件路径为空")
-
-                        elif item_type == "tool_use":
-                            # 对于工具调用，由于微信不支持编辑消息
-                            # 我们需要等待工具执行完成后再发送通知
-                            # 这里先标记序列为已发送，但实际通知在 check_tool_use_results 中发送
-                            # 不发送任何消息，等待工具执行完成
-
-                            # 保存工具调用引用（用于后续查询工具执行结果）
-                            # 微信没有真实的消息 ID，使用 0 作为占位符
-                            if tool_use_index is not None:
-                                self.message_queue.save_tool_use_message_ref(
-                                    message_id,
-                                    tool_use_index,
-                                    0,  # 微信没有真实的消息 ID，使用 0 作为占位符
-                                    channel_id,
-                                    is_dm,
-                                    'weixin'
-                                )
-
-                        elif item_type == "file":
-                            # 文件发送：从 item_data 获取文件路径列表
-                            file_paths = item_data.get("file_paths", []) if item_data else []
-                            sent_count = 0
-                            for fp in file_paths:
-                                if fp and os.path.exists(fp):
-                                    try:
-                                        await self._send_file_to_weixin(client, to_user_id, fp, context_token, user_id)
-                                        sent_count += 1
-                                        log.log(f"✅ [消息 #{message_id}] 已发送文件: {os.path.basename(fp)}")
-                                    except Exception as e:
-                                        log.log(f"❌ [消息 #{message_id}] 文件发送失败: {fp} - {e}")
-                            if sent_count == 0:
-                                log.log(f"⚠️ [消息 #{message_id}] 没有有效的文件可发送")
-
-                        # 标记为已发送
-                        self.message_queue.mark_sequence_sent(seq_id)
-
-                        # 控制发送速率
-                        await asyncio.sleep(self.config.queue_send_interval)
-
+                        if len(batch) > 1:
+                            merged = "\n\n".join(item["item_data"].get("text", "").strip() for item in batch)
+                            await self._send_text(message_id, route, merged)
+                            log.log(f"🧩 [消息 #{message_id}] 已合并 {len(batch)} 条文本发送")
+                        else:
+                            await self._send_sequence_item(message_info, route, seq)
                     except Exception as e:
-                        log.log(f"❌ 发送序列项失败: 消息#{message_id}, 序列#{seq_index}, 错误: {e}")
-                        # 标记为已发送，避免无限重试
-                        self.message_queue.mark_sequence_sent(seq_id)
+                        log.log(f"❌ 发送序列项失败: 消息#{message_id}, 序列#{seq['sequence_index']}, 错误: {e}")
+
+                    # 标记为已发送（发送失败也标记，避免无限重试）
+                    for item in batch:
+                        self.message_queue.mark_sequence_sent(item["id"])
 
                 except Exception as e:
                     log.log(f"❌ 处理消息序列失败: 消息#{message_id}, 错误: {e}")
+                    await asyncio.sleep(1)
 
-                # 极小延迟，避免无消息时CPU空转
-                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            log.log(f"❌ 接收者发送任务出错 [{recipient}]: {e}")
+        finally:
+            if not self.recipient_queues.get(recipient):
+                self.recipient_queues.pop(recipient, None)
+            if self.recipient_senders.get(recipient) is asyncio.current_task():
+                del self.recipient_senders[recipient]
+
+    async def _track_untracked_message(self, message_info: dict, route: dict):
+        """发现未追踪的消息：立即占位 + 尝试启动 typing indicator（和 Discord bot 一致的兜底机制）"""
+        message_id = message_info['id']
+        username = route["username"] if route else message_info['username']
+        log.log(f"📨 [消息 #{message_id}] 已加载外部消息: {username}")
+
+        typing_started = False
+        if route:
+            typing_started = self.start_typing_indicator(message_id, username, route["account"].bot_id, route["context_token"])
+
+        if not typing_started:
+            self.pending_messages[message_id] = {
+                "typing_active": False,
+                "from_user_id": username,
+                "account_bot_id": None
+            }
+
+    def _collect_coalescible_texts(self, message_id: int, seq: dict, bot_id: str) -> list:
+        """
+        收集可合并发送的相邻文本序列项
 
-            except Exception as e:
-                log.log(f"❌ 检查消息序列时出错: {e}")
-                await asyncio.sleep(5)
+        关闭消息分割时（文本本就不要求分条发送）始终合并；启用分割时仅在启用合并且账号令牌桶过热时合并。
+        只合并从当前项开始连续的 text 项，遇到非文本项、代码块围栏不成对的文本或超过最大长度时停止。
 
-    async def _send_sticker_image(self, client, to_user_id: str, file_path: str, context_token: str):
-        """发送表情包图片到微信（轻量版，专用于表情包场景）
+        Returns:
+            需要一起发送的序列项列表（至少包含当前项）
+        """
+        if seq["item_type"] != "text":
+            return [seq]
+        if self.config.weixin_message_splitting_enabled:
+            if not self.config.queue_coalesce_text or not self.rate_limiter.is_hot(bot_id):
+                return [seq]
+
+        batch = []
+        total_length = 0
+        for item in self.message_queue.get_pending_message_sequences(message_id, limit=self.COALESCE_LOOKAHEAD):
+            if item["item_type"] != "text":
+                break
+            text = item["item_data"].get("text", "").strip()
+            if not text:
+                break
+            # 围栏不成对的文本（代码块被空行拆开）不参与合并
+            if text.count("```") % 2 != 0:
+                break
+            added_length = len(text) + (2 if batch else 0)
+            if batch and total_length + added_length > self.COALESCE_MAX_LENGTH:
+                break
+            batch.append(item)
+            total_length += added_length
+
+        # 兜底：当前项必须在批次开头（否则按单条发送）
+        if not batch or batch[0]["id"] != seq["id"]:
+            return [seq]
+        return batch
+
+    async def _send_text(self, message_id: int, route: dict, text: str):
+        """发送文本消息（等待账号令牌桶）"""
+        # 确保 typing indicator 已启动（后备：如果前面因为账号未连接没启动）
+        pending_info = self.pending_messages.get(message_id)
+        if pending_info and not pending_info.get("typing_active"):
+            self.start_typing_indicator(message_id, route["username"], route["account"].bot_id, route["context_token"])
+
+        await self.rate_limiter.acquire(route["account"].bot_id)
+        try:
+            await route["client"].send_message(
+                to_user_id=route["username"],
+                text=text,
+                context_token=route["context_token"]
+            )
+            log.log(f"✅ [消息 #{message_id}] 已发送: {text[:30]}...")
+        except Exception as send_error:
+            log.log(f"❌ [消息 #{message_id}] 发送失败: {send_error}")
+
+    async def _send_sequence_item(self, message_info: dict, route: dict, seq: dict):
+        """发送单条序列项（文本、表情包、工具调用、文件）"""
+        message_id = message_info['id']
+        item_type = seq["item_type"]
+        item_data = seq["item_data"]
+        tool_use_index = seq.get("tool_use_index")  # 获取工具调用索引
+
+        client = route["client"]
+        to_user_id = route["username"]
+        context_token = route["context_token"]
+        bot_id = route["account"].bot_id
+
+        if item_type == "text":
+            # 发送文本消息
+            text = item_data.get("text", "")
+            if text and text.strip():
+                await self._send_text(message_id, route, text.strip())
+
+        elif item_type == "sticker":
+            # 表情包：从 item_data 获取文件路径，发送为图片
+            sticker_path = item_data.get("file_path", "") if item_data else ""
+            if sticker_path:
+                try:
+                    await self.rate_limiter.acquire(bot_id)
+                    await self._send_sticker_image(client, to_user_id, sticker_path, context_token)
+                    log.log(f"✅ [消息 #{message_id}] 已发送表情包: {os.path.basename(sticker_path)}")
+                except Exception as e:
+                    log.log(f"❌ [消息 #{message_id}] 表情包发送失败: {sticker_path} - {e}")
+            else:
+                log.log(f"⚠️ [消息 #{message_id}] 表情包文件路径为空")
+
+        elif item_type == "tool_use":
+            # 对于工具调用，由于微信不支持编辑消息
+            # 我们需要等待工具执行完成后再发送通知
+            # 这里先标记序列为已发送，但实际通知在 check_tool_use_results 中发送
+            # 不发送任何消息，等待工具执行完成
+
+            # 保存工具调用引用（用于后续查询工具执行结果）
+            # 微信没有真实的消息 ID，使用 0 作为占位符
+            if tool_use_index is not None:
+                self.message_queue.save_tool_use_message_ref(
+                    message_id,
+                    tool_use_index,
+                    0,  # 微信没有真实的消息 ID，使用 0 作为占位符
+                    message_info['discord_channel_id'],
+                    message_info['is_dm'],
+                    'weixin'
+                )
+
+        elif item_type == "file":
+            # 文件发送：从 item_data 获取文件路径列表
+            file_paths = item_data.get("file_paths", []) if item_data else []
+            sent_count = await self._send_files_to_weixin(message_id, route, file_paths, message_info['discord_user_id'])
+            if sent_count == 0:
+                log.log(f"⚠️ [消息 #{message_id}] 没有有效的文件可发送")
+
+    async def _send_files_to_weixin(self, message_id: int, route: dict, file_paths: list, user_id: int) -> int:
+        """
+        发送一组文件：并发准备（获取上传 URL、加密、上传 CDN），再按原顺序逐个发送媒体消息
+
+        准备并发数受 weixin.file_send.upload_concurrency 限制；排在前面的文件准备好后立即发送，
+        不必等待整组文件全部上传完成
+
+        Returns:
+            成功发送的文件数
+        """
+        file_paths = [fp for fp in file_paths if fp and os.path.exists(fp)]
+        if not file_paths:
+            return 0
+
+        client = route["client"]
+        bot_id = route["account"].bot_id
+        total = len(file_paths)
+        semaphore = asyncio.Semaphore(max(1, self.config.weixin_file_upload_concurrency))
+        started_at = time.monotonic()
+        prepared_count = 0
+
+        async def prepare(fp: str) -> dict:
+            nonlocal prepared_count
+            async with semaphore:
+                prepare_start = time.monotonic()
+                prepared = await self._prepare_file_for_weixin(client, fp, user_id)
+                prepared_count += 1
+                log.log(f"📦 [消息 #{message_id}] 文件已上传 ({prepared_count}/{total}): {os.path.basename(fp)}，耗时 {time.monotonic() - prepare_start:.2f}s")
+                return prepared
+
+        tasks = [asyncio.create_task(prepare(fp)) for fp in file_paths]
+        sent_count = 0
+        try:
+            for index, (fp, task) in enumerate(zip(file_paths, tasks), start=1):
+                try:
+                    prepared = await task
+                    send_start = time.monotonic()
+                    await self.rate_limiter.acquire(bot_id)
+                    await self._deliver_file_to_weixin(client, prepared, route["context_token"])
+                    sent_count += 1
+                    log.log(f"✅ [消息 #{message_id}] 已发送文件 ({index}/{total}): {os.path.basename(fp)}，耗时 {time.monotonic() - send_start:.2f}s")
+                except Exception as e:
+                    log.log(f"❌ [消息 #{message_id}] 文件发送失败: {fp} - {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if total > 1:
+            log.log(f"📊 [消息 #{message_id}] 已发送 {sent_count}/{total} 个文件，总耗时 {time.monotonic() - started_at:.2f}s")
+        return sent_count
+
+    async def _send_uploaded_media(self, client: "WeixinClient", target_wxid: str, file_path: str, media_type: int, send_media):
+        """上传文件到 CDN 并发送媒体消息
 
         Args:
-            client: WeixinClient 实例
-            to_user_id: 接收者的 wxid 或 username
-            file_path: 表情包图片的本地路径
-            context_token: 上下文 token
+            client: 微信客户端
+            target_wxid: 接收者 wxid
+            file_path: 文件路径
+            media_type: 媒体类型 (1=图片, 2=视频, 3=文件)
+            send_media: 发送函数，参数为 media_info，返回协程
         """
-        import hashlib
-        import base64
-        from Crypto.Cipher import AES
-        from Crypto.Util.Padding import pad
+        prepared = await self._prepare_uploaded_media(client, target_wxid, file_path, media_type)
+        await self._deliver_uploaded_media(client, target_wxid, file_path, media_type, prepared, send_media)
 
-        # 将 username 转换为 wxid（get_upload_url 需要 wxid）
-        target_wxid = self.username_to_wxid.get(to_user_id, to_user_id)
+    async def _prepare_uploaded_media(self, client: "WeixinClient", target_wxid: str, file_path: str, media_type: int, use_cache: bool = True) -> dict:
+        """上传文件到 CDN，返回发送媒体消息所需的信息（不发送消息，可并发执行）
 
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"文件不存在: {file_path}")
+        同一账号近期上传过相同内容（按 MD5）时，直接复用缓存的下载参数和 AES 密钥，
+        省去 getUploadUrl、加密和上传
 
-        # 读取文件并计算 MD5
-        with open(file_path, 'rb') as f:
-            plaintext = f.read()
-        rawfilemd5 = hashlib.md5(plaintext).hexdigest()
+        Returns:
+            {"media_info", "rawfilemd5", "cached"}
+        """
+        # 计算文件大小、MD5 和加密后大小（分块读取，不阻塞事件循环）
+        rawsize, rawfilemd5, filesize = await describe_file(file_path)
+        bot_id = client.account.bot_id
+
+        cached = self.upload_cache.get(bot_id, rawfilemd5, media_type) if self.upload_cache and use_cache else None
+        if cached:
+            log.log(f"♻️ 复用 CDN 上传结果: {os.path.basename(file_path)}")
+            return {
+                "media_info": self._build_media_info(cached["download_param"], cached["aeskey"], cached["filesize"]),
+                "rawfilemd5": rawfilemd5,
+                "cached": True
+            }
 
         # 生成随机 AES key 和 filekey
         aeskey = os.urandom(16)
         filekey = os.urandom(16).hex()
 
-        # AES-128-ECB 加密文件
-        cipher = AES.new(aeskey, AES.MODE_ECB)
-        ciphertext = cipher.encrypt(pad(plaintext, AES.block_size))
-        filesize = len(ciphertext)
-
-        # 获取上传 URL（media_type=1 表示图片）
+        # 获取上传 URL
         upload_resp = await client.get_upload_url(
             filekey=filekey,
-            media_type=1,
+            media_type=media_type,
             to_user_id=target_wxid,
-            rawsize=len(plaintext),
+            rawsize=rawsize,
             rawfilemd5=rawfilemd5,
             filesize=filesize,
             aeskey=aeskey.hex(),
@@ -411,19 +431,63 @@ class WeixinSequenceSenderMixin:
             filesize=filesize
         )
 
-        # 构造媒体信息
-        media_info = {
+        if self.upload_cache:
+            self.upload_cache.put(bot_id, rawfilemd5, media_type, download_param, aeskey, filesize)
+
+        return {
+            "media_info": self._build_media_info(download_param, aeskey, filesize),
+            "rawfilemd5": rawfilemd5,
+            "cached": False
+        }
+
+    async def _deliver_uploaded_media(self, client: "WeixinClient", target_wxid: str, file_path: str, media_type: int, prepared: dict, send_media):
+        """发送已上传的媒体消息（复用缓存的上传结果发送失败时，删除缓存并重新上传后再发送）"""
+        if prepared["cached"]:
+            try:
+                await send_media(prepared["media_info"])
+                return
+            except Exception as e:
+                log.log(f"⚠️ 复用 CDN 上传结果发送失败，重新上传: {e}")
+                self.upload_cache.invalidate(client.account.bot_id, prepared["rawfilemd5"], media_type)
+                prepared = await self._prepare_uploaded_media(client, target_wxid, file_path, media_type, use_cache=False)
+
+        await send_media(prepared["media_info"])
+
+    @staticmethod
+    def _build_media_info(download_param: str, aeskey: bytes, filesize: int) -> dict:
+        """构造媒体消息的 media_info"""
+        import base64
+        return {
             "encrypt_query_param": download_param,
             "aes_key": base64.b64encode(aeskey.hex().encode('utf-8')).decode('utf-8'),
             "filesize_ciphertext": filesize
         }
 
-        # 发送图片消息
-        await client.send_media_message(
-            to_user_id=target_wxid,
-            media_type="image",
-            media_info=media_info,
-            context_token=context_token
+    async def _send_sticker_image(self, client, to_user_id: str, file_path: str, context_token: str):
+        """发送表情包图片到微信（轻量版，专用于表情包场景）
+
+        Args:
+            client: WeixinClient 实例
+            to_user_id: 接收者的 wxid 或 username
+            file_path: 表情包图片的本地路径
+            context_token: 上下文 token
+        """
+        # 将 username 转换为 wxid（get_upload_url 需要 wxid）
+        target_wxid = self.username_to_wxid.get(to_user_id, to_user_id)
+
+        # 检查文件是否存在
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+
+        # 上传（或复用缓存的上传结果）并发送图片消息（media_type=1 表示图片）
+        await self._send_uploaded_media(
+            client, target_wxid, file_path, 1,
+            lambda media_info: client.send_media_message(
+                to_user_id=target_wxid,
+                media_type="image",
+                media_info=media_info,
+                context_token=context_token
+            )
         )
 
     async def _send_file_to_weixin(self, client: "WeixinClient", to_user_id: str, file_path: str, context_token: str, user_id: int):
@@ -436,10 +500,21 @@ class WeixinSequenceSenderMixin:
             context_token: 上下文 token
             user_id: 用户整数 ID（用于查找 wxid）
         """
+        prepared = await self._prepare_file_for_weixin(client, file_path, user_id)
+        await self._deliver_file_to_weixin(client, prepared, context_token)
+
+    async def _prepare_file_for_weixin(self, client: "WeixinClient", file_path: str, user_id: int) -> dict:
+        """准备发送文件：确定接收者和媒体类型，并上传到 CDN（不发送消息，可并发执行）
+
+        Args:
+            client: 微信客户端
+            file_path: 文件路径
+            user_id: 用户整数 ID（用于查找 wxid）
+
+        Returns:
+            发送媒体消息所需的信息（交给 _deliver_file_to_weixin 发送）
+        """
         import mimetypes
-        import hashlib
-        from Crypto.Cipher import AES
-        from Crypto.Util.Padding import pad
         import os
 
         # 检查文件是否存在
@@ -474,20 +549,6 @@ class WeixinSequenceSenderMixin:
         if not target_wxid:
             raise Exception(f"未找到用户 wxid: user_id={user_id}")
 
-        # 读取文件并计算 MD5
-        with open(file_path, 'rb') as f:
-            plaintext = f.read()
-        rawfilemd5 = hashlib.md5(plaintext).hexdigest()
-
-        # 生成 AES 密钥和 filekey
-        aeskey = os.urandom(16)
-        filekey = os.urandom(16).hex()
-
-        # 计算加密后大小
-        cipher = AES.new(aeskey, AES.MODE_ECB)
-        ciphertext = cipher.encrypt(pad(plaintext, AES.block_size))
-        filesize = len(ciphertext)
-
         # 确定媒体类型
         if mime_type.startswith("video/"):
             media_type = 2
@@ -499,47 +560,30 @@ class WeixinSequenceSenderMixin:
             media_type = 3
             message_type = "file"
 
-        # 获取上传 URL
-        upload_resp = await client.get_upload_url(
-            filekey=filekey,
-            media_type=media_type,
-            to_user_id=target_wxid,
-            rawsize=file_size,
-            rawfilemd5=rawfilemd5,
-            filesize=filesize,
-            aeskey=aeskey.hex(),
-            no_need_thumb=True
-        )
-
-        upload_param = upload_resp.get("upload_param")
-        if not upload_param:
-            raise Exception("获取上传参数失败")
-
-        # 上传到 CDN
-        download_param = await client.upload_to_cdn(
-            file_path=file_path,
-            upload_param=upload_param,
-            filekey=filekey,
-            aeskey=aeskey,
-            filesize=filesize
-        )
-
-        # 构造媒体信息
-        import base64
-        media_info = {
-            "encrypt_query_param": download_param,
-            "aes_key": base64.b64encode(aeskey.hex().encode('utf-8')).decode('utf-8'),
-            "filesize_ciphertext": filesize
+        # 上传（或复用缓存的上传结果）
+        log.log(f"📤 [文件发送] to_user={target_wxid}, type={message_type}, file={file_name}, size={file_size}")
+        uploaded = await self._prepare_uploaded_media(client, target_wxid, file_path, media_type)
+        return {
+            "file_path": file_path,
+            "file_name": file_name,
+            "file_size": file_size,
+            "target_wxid": target_wxid,
+            "media_type": media_type,
+            "message_type": message_type,
+            "uploaded": uploaded
         }
 
-        # 发送媒体消息
-        log.log(f"📤 [文件发送] to_user={target_wxid}, type={message_type}, file={file_name}, size={file_size}")
-        result = await client.send_media_message(
-            to_user_id=target_wxid,
-            media_type=message_type,
-            media_info=media_info,
-            context_token=context_token,
-            file_name=file_name,
-            filesize=file_size
+    async def _deliver_file_to_weixin(self, client: "WeixinClient", prepared: dict, context_token: str):
+        """发送已准备好的文件媒体消息"""
+        await self._deliver_uploaded_media(
+            client, prepared["target_wxid"], prepared["file_path"], prepared["media_type"], prepared["uploaded"],
+            lambda media_info: client.send_media_message(
+                to_user_id=prepared["target_wxid"],
+                media_type=prepared["message_type"],
+                media_info=media_info,
+                context_token=context_token,
+                file_name=prepared["file_name"],
+                filesize=prepared["file_size"]
+            )
         )
-        log.log(f"✅ [文件发送] 成功: {file_name}")
\ No newline at end of file
+        log.log(f"✅ [文件发送] 成功: {prepared['file_name']}")
@@ -0,0 +1,104 @@
+"""
+微信长轮询同步状态模块
+按账号持久化 get_updates 游标和最近处理过的消息 ID，重启后从上次的位置继续接收，并跳过重复消息
+"""
+import json
+import sqlite3
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from shared.logger import get_logger
+
+log = get_logger("WeixinSyncState", "weixin")
+
+
+class WeixinSyncState:
+    """单个账号的同步状态（保存在 SQLite weixin_sync_state 表）
+
+    - 游标和最近消息 ID 在同一条记录中一次写入，不会出现只更新了一半的状态
+    - 最近消息 ID 只保留 RECENT_IDS_LIMIT 条，用于过滤重启前后重复下发的消息
+    - 已接收但尚未处理完的消息 ID 单独记录（不写入数据库），处理完成后随游标一起提交
+    """
+
+    # 用于去重的最近消息 ID 数量
+    RECENT_IDS_LIMIT = 500
+
+    def __init__(self, db_path: str, bot_id: str):
+        self.db_path = db_path
+        self.bot_id = bot_id
+        self.get_updates_buf = ""
+        self._recent_ids = deque(maxlen=self.RECENT_IDS_LIMIT)
+        self._recent_set = set()
+        self._pending_ids = set()
+
+    def _get_connection(self):
+        """获取数据库连接"""
+        return sqlite3.connect(self.db_path)
+
+    def load(self) -> str:
+        """
+        加载上次保存的同步状态
+
+        Returns:
+            get_updates 游标（没有记录时返回空字符串）
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT get_updates_buf, recent_message_ids FROM weixin_sync_state WHERE bot_id = ?
+            """, (self.bot_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+
+        if row:
+            self.get_updates_buf = row[0] or ""
+            try:
+                self._remember(json.loads(row[1] or "[]"))
+            except json.JSONDecodeError:
+                pass
+            log.log(f"✓ 账号 {self.bot_id} 已恢复长轮询游标（最近消息 {len(self._recent_ids)} 条）")
+        return self.get_updates_buf
+
+    def is_duplicate(self, message_id: Optional[str]) -> bool:
+        """消息是否已经接收过（包括已接收但尚未处理完的消息）"""
+        return bool(message_id) and (str(message_id) in self._recent_set or str(message_id) in self._pending_ids)
+
+    def add_pending(self, message_id: Optional[str]):
+        """记录已接收、尚未处理完的消息"""
+        if message_id:
+            self._pending_ids.add(str(message_id))
+
+    def _remember(self, message_ids: Iterable):
+        for message_id in message_ids:
+            message_id = str(message_id)
+            if message_id in self._recent_set:
+                continue
+            if len(self._recent_ids) == self._recent_ids.maxlen:
+                self._recent_set.discard(self._recent_ids[0])
+            self._recent_ids.append(message_id)
+            self._recent_set.add(message_id)
+
+    def commit(self, get_updates_buf: str, message_ids: Iterable):
+        """记录一批消息已处理完成，并保存新的游标"""
+        message_ids = [message_id for message_id in message_ids if message_id]
+        self._pending_ids.difference_update(str(message_id) for message_id in message_ids)
+        if get_updates_buf == self.get_updates_buf and not message_ids:
+            return
+        self.get_updates_buf = get_updates_buf
+        self._remember(message_ids)
+
+        conn = self._get_connection()
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO weixin_sync_state (bot_id, get_updates_buf, recent_message_ids, updated_at)
+                VALUES (?, ?, ?, ?)
+            """, (self.bot_id, get_updates_buf, json.dumps(list(self._recent_ids)), time.time()))
+            conn.commit()
+        finally:
+            conn.close()
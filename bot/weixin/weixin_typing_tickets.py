@@ -0,0 +1,95 @@
+"""
+微信 typing ticket 缓存模块
+按用户缓存 getconfig 返回的 typing_ticket，带有效期，过期前在后台提前刷新
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from shared.logger import get_logger
+from bot.weixin.weixin_client import WeixinClient
+
+log = get_logger("WeixinBot", "weixin")
+
+
+class WeixinTypingTicketCache:
+    """typing ticket 缓存（用户名 -> (ticket, 获取时间)）
+
+    - 有效期内直接返回缓存的 ticket，不再调用 getconfig
+    - 剩余有效期不足 refresh_ahead 秒时，先返回当前 ticket，同时在后台刷新
+    - 同一用户同时只有一个 getconfig 请求，并发的获取请求共享结果
+    """
+
+    def __init__(self, ttl: float, refresh_ahead: float):
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self._tickets: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def get(self, username: str) -> Optional[str]:
+        """获取未过期的 ticket（不发起请求）"""
+        entry = self._tickets.get(username)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def invalidate(self, username: str):
+        """删除用户的 ticket（ticket 失效时调用）"""
+        self._tickets.pop(username, None)
+
+    async def ensure(self, client: WeixinClient, username: str, wxid: str, context_token: str = "") -> Optional[str]:
+        """
+        获取用户的 typing ticket，缓存中没有或已过期时调用 getconfig 获取
+
+        Args:
+            client: 微信客户端
+            username: 用户名（缓存键）
+            wxid: 用户的原始 wxid
+            context_token: 上下文 token
+
+        Returns:
+            typing ticket，获取失败时返回 None
+        """
+        entry = self._tickets.get(username)
+        if entry:
+            age = time.monotonic() - entry[1]
+            if age < self.ttl - self.refresh_ahead:
+                return entry[0]
+            if age < self.ttl:
+                # 即将过期：后台刷新，先使用当前 ticket
+                self._start_fetch(client, username, wxid, context_token)
+                return entry[0]
+
+        try:
+            return await asyncio.shield(self._start_fetch(client, username, wxid, context_token))
+        except Exception:
+            return None
+
+    def _start_fetch(self, client: WeixinClient, username: str, wxid: str, context_token: str) -> asyncio.Task:
+        """发起（或复用进行中的）getconfig 请求"""
+        task = self._inflight.get(username)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch(client, username, wxid, context_token))
+            self._inflight[username] = task
+        return task
+
+    async def _fetch(self, client: WeixinClient, username: str, wxid: str, context_token: str) -> Optional[str]:
+        try:
+            config_result = await client.get_config(
+                ilink_user_id=wxid,
+                context_token=context_token or ""
+            )
+            typing_ticket = config_result.get("typing_ticket", "")
+            if typing_ticket:
+                self._tickets[username] = (typing_ticket, time.monotonic())
+                return typing_ticket
+            return self.get(username)
+        except Exception as e:
+            log.log(f"⚠️ 获取 typing ticket 失败: {username} - {e}")
+            return self.get(username)
+        finally:
+            if self._inflight.get(username) is asyncio.current_task():
+                del self._inflight[username]
@@ -0,0 +1,81 @@
+"""
+微信 CDN 上传结果缓存模块
+按文件内容哈希缓存 CDN 上传得到的下载参数和 AES 密钥，同一文件再次发送时直接复用，
+省去 getUploadUrl、加密和上传三步
+"""
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from shared.logger import get_logger
+
+log = get_logger("WeixinUploadCache", "weixin")
+
+
+class WeixinUploadCache:
+    """微信 CDN 上传结果缓存（保存在 SQLite weixin_upload_cache 表）
+
+    - 键：账号 bot_id + 明文 MD5 + 媒体类型
+    - 值：下载参数（encrypt_query_param）、AES 密钥、密文大小
+    - 超过 TTL 的记录视为失效；复用后发送失败时调用 invalidate 删除记录并重新上传
+    """
+
+    def __init__(self, db_path: str, ttl: int):
+        self.db_path = db_path
+        self.ttl = ttl
+
+    def _get_connection(self):
+        """获取数据库连接"""
+        return sqlite3.connect(self.db_path)
+
+    def get(self, bot_id: str, rawfilemd5: str, media_type: int) -> Optional[Dict[str, Any]]:
+        """
+        查找未过期的上传结果
+
+        Returns:
+            {"download_param", "aeskey", "filesize"}，没有可用记录时返回 None
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT download_param, aeskey, filesize FROM weixin_upload_cache
+                WHERE bot_id = ? AND rawfilemd5 = ? AND media_type = ? AND uploaded_at > ?
+            """, (bot_id, rawfilemd5, media_type, time.time() - self.ttl))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return {"download_param": row[0], "aeskey": bytes.fromhex(row[1]), "filesize": row[2]}
+        finally:
+            conn.close()
+
+    def put(self, bot_id: str, rawfilemd5: str, media_type: int, download_param: str, aeskey: bytes, filesize: int):
+        """记录上传结果（同时清理已过期的记录）"""
+        now = time.time()
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO weixin_upload_cache
+                    (bot_id, rawfilemd5, media_type, download_param, aeskey, filesize, uploaded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (bot_id, rawfilemd5, media_type, download_param, aeskey.hex(), filesize, now))
+            cursor.execute("DELETE FROM weixin_upload_cache WHERE uploaded_at <= ?", (now - self.ttl,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def invalidate(self, bot_id: str, rawfilemd5: str, media_type: int):
+        """删除上传结果（复用后发送失败时调用）"""
+        conn = self._get_connection()
+        try:
+            conn.execute("""
+                DELETE FROM weixin_upload_cache
+                WHERE bot_id = ? AND rawfilemd5 = ? AND media_type = ?
+            """, (bot_id, rawfilemd5, media_type))
+            conn.commit()
+        finally:
+            conn.close()
@@ -34,6 +34,11 @@ class ClaudeBridge:
         self.max_concurrent_sessions = config.max_concurrent_sessions
         self.worker_idle_timeout = config.worker_idle_timeout
 
+        # 🔥 会话预热：{session_key: {"expires_at": float, "created_worker": bool}}
+        self.warmups: Dict[str, dict] = {}
+        self.warmup_stats: Dict[str, float] = {}  # 预热统计（Worker 共享写入命中/节省时间）
+        self._last_warmup_snapshot = None
+
     async def cleanup_pending_messages(self):
         """清理上次崩溃时留下的 PENDING 消息（避免重启后重复处理）"""
         import sqlite3
@@ -83,6 +88,8 @@ class ClaudeBridge:
         log.log(f"⏱️  超时时间: {self.config.claude_timeout}秒")
         log.log(f"🔄 最大尝试次数: {self.config.max_attempts}次")
         log.log(f"⚡ 最大并发 session 数: {self.max_concurrent_sessions}")
+        if self.config.session_warmup_enabled:
+            log.log(f"🔥 会话预热已启用（有效期 {self.config.session_warmup_ttl} 秒）")
 
         # 启动时清理旧的 PENDING 消息
         await self.cleanup_pending_messages()
@@ -90,12 +97,15 @@ class ClaudeBridge:
         # 🔥 启动并发架构的任务
         scheduler_task = asyncio.create_task(self._scheduler_loop())
         worker_manager_task = asyncio.create_task(self._worker_manager_loop())
+        tasks = [scheduler_task, worker_manager_task]
+        if self.config.session_warmup_enabled:
+            tasks.append(asyncio.create_task(self._warmup_loop()))
 
         log.log("✅ 并发架构已启动")
 
         # 等待任务完成（或收到停止信号）
         try:
-            await asyncio.gather(scheduler_task, worker_manager_task)
+            await asyncio.gather(*tasks)
         except asyncio.CancelledError:
             log.log("⚠️  收到取消信号，正在停止...")
             self.running = False
@@ -181,7 +191,7 @@ class ClaudeBridge:
                 await self._wait_for_worker_slot()
 
         # 创建新 Worker
-        worker = SessionWorker(session_key, self.config, self.message_queue)
+        worker = SessionWorker(session_key, self.config, self.message_queue, warmup_stats=self.warmup_stats)
         await worker.start()
         self.session_workers[session_key] = worker
 
@@ -189,6 +199,102 @@ class ClaudeBridge:
 
         return worker
 
+    async def _warmup_loop(self):
+        """
+        会话预热循环
+
+        功能：
+        - 消费 Bot 写入的预热提示，提前创建 Worker 并启动 CLI 进程
+        - 释放超过有效期仍未收到消息的预热进程
+        """
+        log.log("🔥 会话预热循环已启动")
+
+        while self.running:
+            try:
+                for hint in self.message_queue.pop_warmup_hints():
+                    await self._handle_warmup_hint(hint)
+
+                await self._expire_warmups()
+
+                await asyncio.sleep(self.config.poll_interval / 1000)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                log.log(f"❌ 会话预热循环错误: {e}")
+                log.log(traceback.format_exc())
+                await asyncio.sleep(5)
+
+        log.log("✓ 会话预热循环已退出")
+
+    async def _handle_warmup_hint(self, hint: dict):
+        """处理单条预热提示"""
+        session_key = hint["session_key"]
+        self.warmup_stats["hints"] = self.warmup_stats.get("hints", 0) + 1
+
+        created_worker = session_key not in self.session_workers
+        if created_worker:
+            # 预热不占用等待：达到并发上限时直接放弃
+            if self.max_concurrent_sessions > 0 and len(self.session_workers) >= self.max_concurrent_sessions:
+                return
+            worker = await self._get_or_create_worker(session_key)
+        else:
+            worker = self.session_workers[session_key]
+
+        warmed = await worker.warm_up(
+            channel_id=hint["channel_id"],
+            user_id=hint["user_id"],
+            is_dm=hint["is_dm"]
+        )
+        if warmed:
+            self.warmup_stats["warmed"] = self.warmup_stats.get("warmed", 0) + 1
+            previous = self.warmups.get(session_key)
+            self.warmups[session_key] = {
+                "expires_at": time.time() + self.config.session_warmup_ttl,
+                "created_worker": created_worker or bool(previous and previous["created_worker"]),
+            }
+        elif session_key in self.warmups:
+            # 已有预热进程：用户仍在输入，延长有效期
+            self.warmups[session_key]["expires_at"] = time.time() + self.config.session_warmup_ttl
+
+    async def _expire_warmups(self):
+        """释放已过期的预热进程（仅为预热而创建的 Worker 一并清理）"""
+        now = time.time()
+        for session_key, warmup in list(self.warmups.items()):
+            worker = self.session_workers.get(session_key)
+
+            # 预热进程已被消息复用（或 Worker 已被清理）
+            if not worker or not worker.warm_process:
+                del self.warmups[session_key]
+                continue
+
+            if now < warmup["expires_at"]:
+                continue
+
+            del self.warmups[session_key]
+            if await worker.discard_warmup():
+                self.warmup_stats["expired"] = self.warmup_stats.get("expired", 0) + 1
+                log.log(f"⌛ 预热已过期: {session_key}")
+
+            if warmup["created_worker"] and worker.current_message_id is None and worker.queue.empty():
+                self.session_workers.pop(session_key, None)
+                await worker.stop()
+
+    def _log_warmup_stats(self):
+        """输出会话预热统计（命中率、节省的启动耗时）"""
+        stats = self.warmup_stats
+        warmed = stats.get("warmed", 0)
+        snapshot = (stats.get("hints", 0), warmed, stats.get("hits", 0), stats.get("expired", 0))
+        if not warmed or snapshot == self._last_warmup_snapshot:
+            return
+        self._last_warmup_snapshot = snapshot
+        hits = stats.get("hits", 0)
+        log.log(
+            f"🔥 预热统计: 提示 {stats.get('hints', 0)} 次, 预热 {warmed} 次, "
+            f"命中 {hits} 次 ({hits / warmed:.0%}), 过期 {stats.get('expired', 0)} 次, "
+            f"失配 {stats.get('mismatched', 0)} 次, 累计节省 {stats.get('saved_seconds', 0.0):.1f} 秒"
+        )
+
     async def _wait_for_worker_slot(self):
         """等待有空闲 Worker 槽位（当达到最大并发数时）"""
         # 等待一小段时间后重试
@@ -209,6 +315,10 @@ class ClaudeBridge:
                 # 定期清理空闲的 Worker
                 await self._cleanup_idle_workers()
 
+                # 输出预热统计
+                if self.config.session_warmup_enabled:
+                    self._log_warmup_stats()
+
                 # 每 60 秒检查一次
                 await asyncio.sleep(60)
 
@@ -14,7 +14,7 @@ from typing import Optional
 from pathlib import Path
 
 from shared.config import Config
-from shared.message_queue import MessageQueue, Message, MessageStatus, MessageTag
+from shared.message_queue import MessageQueue, Message, MessageStatus, MessageTag, DeliveryMode, AttachmentStatus
 from shared.logger import get_logger
 from datetime import datetime
 
@@ -22,7 +22,7 @@ from datetime import datetime
 class SessionWorker:
     """每个 session 的独立 worker"""
 
-    def __init__(self, session_key: str, config: Config, message_queue: MessageQueue):
+    def __init__(self, session_key: str, config: Config, message_queue: MessageQueue, warmup_stats: dict = None):
         """
         初始化 Session Worker
 
@@ -30,6 +30,7 @@ class SessionWorker:
             session_key: 会话标识（如 "global", "channel_123", "dm_456"）
             config: 配置对象
             message_queue: 消息队列对象
+            warmup_stats: 预热统计字典（由 ClaudeBridge 共享，可选）
         """
         self.session_key = session_key
         self.config = config
@@ -45,6 +46,10 @@ class SessionWorker:
         self.last_activity_time: float = time.time()  # 最后活动时间
         self._log = get_logger(f"Worker-{session_key}", "bridge")
 
+        # 会话预热：提前启动的 CLI 进程（等待通过 stdin 写入提示词）
+        self.warm_process: Optional[dict] = None  # {"process", "session_id", "session_created", "cwd", "spawned_at"}
+        self.warmup_stats = warmup_stats if warmup_stats is not None else {}
+
     async def start(self):
         """启动 worker 处理循环"""
         if not self.running:
@@ -55,6 +60,7 @@ class SessionWorker:
     async def stop(self):
         """停止 worker"""
         self.running = False
+        await self.discard_warmup()
 
         # 等待当前消息处理完成
         if self.task and not self.task.done():
@@ -127,6 +133,13 @@ class SessionWorker:
         """
         self.current_message_id = message.id
 
+        # ========== 提醒直接投递：不调用 CLI ==========
+        if message.tag == MessageTag.REMINDER.value and message.delivery == DeliveryMode.DIRECT.value:
+            try:
+                return self._deliver_direct(message)
+            finally:
+                self.current_message_id = None
+
         # ========== 检查消息标签，决定会话模式 ==========
         use_temp_session = False
         temp_session_key = None
@@ -160,6 +173,10 @@ class SessionWorker:
         self.message_queue.update_status(message.id, MessageStatus.PROCESSING)
 
         try:
+            # 附件仍在后台下载：构建提示词前等待（只等本条消息的附件）
+            if message.attachments and any(a.status == AttachmentStatus.PENDING.value for a in message.attachments):
+                message.attachments = await self._wait_for_attachments(message.id)
+
             # 调用 Claude Code CLI
             response = await self._call_claude_cli(
                 message.content,
@@ -247,6 +264,9 @@ class SessionWorker:
         retries = 0
         max_attempts = self.config.max_attempts
 
+        # Discord 实时编辑模式：需要文本增量来写入流式预览
+        live_preview = bool(message_id) and channel_type == 'discord' and self.config.live_edit_enabled
+
         # 使用传入的 working_dir
         cwd = working_dir or self.config.working_directory
 
@@ -270,6 +290,9 @@ class SessionWorker:
                 cmd_args.append('--verbose')
                 cmd_args.append('--output-format')
                 cmd_args.append('stream-json')
+                if live_preview:
+                    # 实时编辑模式：输出部分消息（文本增量），用于 Discord 流式预览
+                    cmd_args.append('--include-partial-messages')
 
                 # 会话处理逻辑
                 if session_key:
@@ -296,27 +319,25 @@ class SessionWorker:
                     else:
                         self._log.log(f"⚠️  警告：session_id 为空，将使用 Claude 默认会话")
 
-                cmd_args.append(prompt)
-
-                # 使用 claude 命令进行非交互式调用
-                # Windows 下使用 CREATE_NO_WINDOW 防止弹出窗口
-                if sys.platform == 'win32':
-                    process = await asyncio.create_subprocess_exec(
-                        self.config.claude_executable,
-                        *cmd_args,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE,
-                        cwd=cwd,
-                        creationflags=subprocess.CREATE_NO_WINDOW
-                    )
+                # 优先复用预热进程（仅第一次尝试，且会话参数必须一致）
+                warm = self._take_warm_process(session_id, current_session_created, cwd) if retries == 0 else None
+
+                if warm:
+                    process = warm["process"]
+                    payload = json.dumps(
+                        {"type": "user", "message": {"role": "user", "content": prompt}},
+                        ensure_ascii=False
+                    ) + "\n"
+                    process.stdin.write(payload.encode('utf-8'))
+                    await process.stdin.drain()
+                    process.stdin.close()
+                    self._log.log(f"🔥 [消息 #{message_id}] 复用预热进程（已预热 {time.time() - warm['spawned_at']:.1f} 秒）")
                 else:
-                    process = await asyncio.create_subprocess_exec(
-                        self.config.claude_executable,
-                        *cmd_args,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE,
-                        cwd=cwd
-                    )
+                    cmd_args.append(prompt)
+                    # 使用 claude 命令进行非交互式调用
+                    process = await self._spawn_cli(cmd_args, cwd)
+
+                spawn_time = time.time()
 
                 ai_started_notified = False
                 response_lines = []
@@ -324,6 +345,9 @@ class SessionWorker:
                 last_update_time = 0
                 sequence_index = 0
                 aborted = False
+                preview_block = 0
+                preview_text = ""
+                last_preview_time = 0
 
                 try:
                     # 按块读取
@@ -333,15 +357,31 @@ class SessionWorker:
                     def process_json_object(data: dict):
                         """处理流式输出的单个 JSON 对象（内层函数，直接捕获外层变量）"""
                         nonlocal ai_started_notified, response_lines, last_update_time, sequence_index
+                        nonlocal preview_block, preview_text, last_preview_time
 
                         if not ai_started_notified and data.get('type') == 'system' and data.get('subtype') == 'init':
                             self._log.log(f"🚀 [消息 #{message_id}] AI 开始工作")
+                            self._record_startup_latency(time.time() - spawn_time, warm is not None)
                             if message_id:
                                 self.message_queue.update_status(message_id, MessageStatus.AI_STARTED)
                             if not session_created and session_key:
                                 self.message_queue.mark_session_created(session_key)
                             ai_started_notified = True
 
+                        elif data.get('type') == 'stream_event' and live_preview and not data.get('parent_tool_use_id'):
+                            # 文本增量：累积当前文本块内容，节流写入流式预览
+                            event = data.get('event', {})
+                            event_type = event.get('type')
+                            if event_type == 'content_block_start' and event.get('content_block', {}).get('type') == 'text':
+                                preview_block += 1
+                                preview_text = ""
+                            elif event_type == 'content_block_delta' and event.get('delta', {}).get('type') == 'text_delta':
+                                preview_text += event['delta'].get('text', '')
+                                current = time.time()
+                                if current - last_preview_time > 0.3:
+                                    self.message_queue.update_stream_preview(message_id, preview_block, preview_text)
+                                    last_preview_time = current
+
                         elif data.get('type') == 'user' and message_id:
                             message_data = data.get('message', {})
                             if message_data.get('content'):
@@ -362,6 +402,10 @@ class SessionWorker:
                             message_data = data.get('message', {})
                             if message_data.get('content'):
                                 content_blocks = message_data['content']
+                                if live_preview and preview_text and not data.get('parent_tool_use_id'):
+                                    # 文本块已完成：清空预览，由 Discord Bot 换成正式序列内容
+                                    self.message_queue.update_stream_preview(message_id, preview_block, "")
+                                    preview_text = ""
                                 sequence_index = self.message_queue.get_max_sequence_index(message_id) + 1
                                 need_split = self.config.weixin_message_splitting_enabled if channel_type == 'weixin' else self.config.enable_message_splitting
 
@@ -569,6 +613,212 @@ class SessionWorker:
 
         return None
 
+    async def _spawn_cli(self, cmd_args: list, cwd: str, stdin_pipe: bool = False):
+        """启动 Claude Code CLI 子进程（Windows 下使用 CREATE_NO_WINDOW 防止弹出窗口）"""
+        kwargs = {
+            "stdout": asyncio.subprocess.PIPE,
+            "stderr": asyncio.subprocess.PIPE,
+            "cwd": cwd,
+        }
+        if stdin_pipe:
+            kwargs["stdin"] = asyncio.subprocess.PIPE
+        if sys.platform == 'win32':
+            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+
+        return await asyncio.create_subprocess_exec(
+            self.config.claude_executable,
+            *cmd_args,
+            **kwargs
+        )
+
+    async def warm_up(self, channel_id: int = None, user_id: int = None, is_dm: bool = False) -> bool:
+        """
+        预热会话：提前解析 session 并启动 CLI 进程
+
+        进程以 stream-json 输入模式启动，完成加载后阻塞在 stdin 上，
+        收到消息时由 _call_claude_cli 写入提示词并复用该进程。
+
+        Args:
+            channel_id: 频道 ID（频道消息使用）
+            user_id: 用户 ID（私聊消息使用）
+            is_dm: 是否为私聊
+
+        Returns:
+            是否启动了新的预热进程
+        """
+        # 正在处理消息或已有预热进程时无需预热
+        if self.current_message_id is not None or not self.queue.empty():
+            return False
+        if self.warm_process and self.warm_process["process"].returncode is None:
+            return False
+
+        _, session_id, session_created, working_dir = self.message_queue.get_or_create_session(
+            self.config.working_directory,
+            channel_id=channel_id,
+            user_id=user_id,
+            is_dm=is_dm,
+            use_temp_session=False,
+            temp_session_key=None
+        )
+        cwd = working_dir or self.config.working_directory
+
+        cmd_args = ['-p', '--verbose', '--output-format', 'stream-json', '--input-format', 'stream-json']
+        if self.config.live_edit_enabled:
+            # 预热只针对 Discord 会话，参数需与 _call_claude_cli 的实时编辑模式一致
+            cmd_args.append('--include-partial-messages')
+        if session_created:
+            cmd_args.extend(['-r', session_id])
+        else:
+            cmd_args.extend(['--session-id', session_id])
+
+        try:
+            process = await self._spawn_cli(cmd_args, cwd, stdin_pipe=True)
+        except FileNotFoundError:
+            self._log.log(f"⚠️  预热失败：找不到 Claude Code CLI '{self.config.claude_executable}'")
+            return False
+
+        self.warm_process = {
+            "process": process,
+            "session_id": session_id,
+            "session_created": session_created,
+            "cwd": cwd,
+            "spawned_at": time.time(),
+        }
+        self.last_activity_time = time.time()
+        self._log.log(f"🔥 会话已预热: {self.session_key}")
+        return True
+
+    def _take_warm_process(self, session_id: str, session_created: bool, cwd: str) -> Optional[dict]:
+        """
+        取出可复用的预热进程（会话参数不一致或进程已退出时丢弃）
+
+        Returns:
+            预热进程信息，没有可用进程时返回 None
+        """
+        warm = self.warm_process
+        if not warm:
+            return None
+        self.warm_process = None
+
+        process = warm["process"]
+        if (process.returncode is None
+                and warm["session_id"] == session_id
+                and warm["session_created"] == session_created
+                and warm["cwd"] == cwd):
+            self.warmup_stats["hits"] = self.warmup_stats.get("hits", 0) + 1
+            return warm
+
+        # 不可复用：后台终止
+        self.warmup_stats["mismatched"] = self.warmup_stats.get("mismatched", 0) + 1
+        asyncio.create_task(self._terminate_process(process))
+        return None
+
+    async def discard_warmup(self) -> bool:
+        """
+        释放未使用的预热进程（预热过期或 Worker 停止时调用）
+
+        Returns:
+            是否释放了预热进程
+        """
+        warm = self.warm_process
+        if not warm:
+            return False
+        self.warm_process = None
+        await self._terminate_process(warm["process"])
+        return True
+
+    async def _terminate_process(self, process):
+        """终止子进程（先 terminate，5 秒后仍未退出则 kill）"""
+        if process.returncode is not None:
+            return
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        except ProcessLookupError:
+            pass
+
+    def _record_startup_latency(self, elapsed: float, warm: bool):
+        """
+        记录 CLI 启动延迟（从写入提示词/启动进程到 system init）
+
+        冷启动样本用于估算预热节省的时间：节省 ≈ 平均冷启动耗时 - 预热命中后的耗时
+        """
+        stats = self.warmup_stats
+        if warm:
+            cold_count = stats.get("cold_count", 0)
+            if cold_count:
+                avg_cold = stats.get("cold_total", 0.0) / cold_count
+                stats["saved_seconds"] = stats.get("saved_seconds", 0.0) + max(0.0, avg_cold - elapsed)
+        else:
+            stats["cold_total"] = stats.get("cold_total", 0.0) + elapsed
+            stats["cold_count"] = stats.get("cold_count", 0) + 1
+
+    def _deliver_direct(self, message: Message) -> bool:
+        """
+        直接投递提醒内容（跳过 Claude Code CLI）
+
+        按与流式输出相同的规则（段落拆分 + 表情包解析）写入 message_sequence，
+        由对应平台的 Bot 发送，发送完成后由 Bot 统一清理序列。
+
+        Args:
+            message: 提醒消息（tag=reminder, delivery=direct）
+
+        Returns:
+            是否投递成功
+        """
+        text = (message.content or '').strip()
+        if not text:
+            self.message_queue.update_status(
+                message.id,
+                MessageStatus.COMPLETED,
+                response="(提醒内容为空)"
+            )
+            self._log.log(f"[消息 #{message.id}] 提醒内容为空，跳过投递")
+            return True
+
+        try:
+            need_split = self.config.weixin_message_splitting_enabled if message.channel_type == 'weixin' else self.config.enable_message_splitting
+            parts = [part.strip() for part in text.split('\n\n') if part.strip()] if need_split else [text]
+
+            self.message_queue.add_content_block(message.id, 0, 'text', {'text': text})
+            sequence_index = 0
+            for part in parts:
+                for segment in self._parse_sticker_segments(part):
+                    if segment["type"] == "text" and segment["content"].strip():
+                        self.message_queue.add_message_sequence(
+                            message.id, sequence_index, 0, 'text',
+                            {'text': segment["content"].strip()}
+                        )
+                        sequence_index += 1
+                    elif segment["type"] == "sticker":
+                        self.message_queue.add_message_sequence(
+                            message.id, sequence_index, 0, 'sticker',
+                            {'file_path': segment["file_path"]}
+                        )
+                        sequence_index += 1
+
+            # 外部消息：写入序列后直接标记完成，由 Bot 发送剩余序列
+            self.message_queue.update_status(
+                message.id,
+                MessageStatus.COMPLETED,
+                response=text
+            )
+            self._log.log(f"⚡ [消息 #{message.id}] 提醒已直接投递（{sequence_index} 个序列项，未调用 CLI）")
+            return True
+
+        except Exception as e:
+            error_msg = f"直接投递失败: {str(e)}"
+            self._log.log(f"❌ [消息 #{message.id}] {error_msg}")
+            self.message_queue.update_status(
+                message.id,
+                MessageStatus.FAILED,
+                error=error_msg
+            )
+            return False
+
     def _build_task_prompt(self, content: str, username: str, user_id: int, is_dm: bool, channel_id: int, channel_type: str = 'discord') -> str:
         """构建任务消息结构"""
         if is_dm:
@@ -619,6 +869,30 @@ class SessionWorker:
 1、仔细阅读并遵守 CLAUDE.md 中的要求，按要求完成会话启动流程；
 2、直接回复需要提醒的内容。"""
 
+    async def _wait_for_attachments(self, message_id: int) -> list:
+        """
+        等待消息附件的后台下载完成（超时后不再等待）
+
+        Returns:
+            已下载完成的附件列表（下载失败或超时的附件不传给 Claude）
+        """
+        timeout = self.config.file_download_prefetch_timeout
+        start = time.time()
+        attachments = self.message_queue.get_attachments(message_id)
+        while any(a.status == AttachmentStatus.PENDING.value for a in attachments):
+            if time.time() - start >= timeout:
+                self._log.log(f"⏱️ [消息 #{message_id}] 等待附件下载超时（{timeout} 秒）")
+                break
+            await asyncio.sleep(0.2)
+            attachments = self.message_queue.get_attachments(message_id)
+
+        ready = [a for a in attachments if a.status == AttachmentStatus.READY.value]
+        skipped = [a.filename for a in attachments if a.status != AttachmentStatus.READY.value]
+        if skipped:
+            self._log.log(f"⚠️ [消息 #{message_id}] 以下附件未就绪，已跳过: {'、'.join(skipped)}")
+        self._log.log(f"📎 [消息 #{message_id}] 附件就绪 {len(ready)} 个，等待 {time.time() - start:.2f} 秒")
+        return ready
+
     def _build_sender_info(self, username: str, user_id: int, is_dm: bool, channel_id: int, attachments: list = None, channel_type: str = 'discord') -> str:
         """构建发送者信息"""
         sender_base = f"{username}（{user_id}）"
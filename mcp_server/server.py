@@ -200,7 +200,9 @@ async def add_cron(
     tag: str = "task",
     channel_type: str = "discord",
     description: str = "",
-    repeat: bool = True
+    repeat: bool = True,
+    delivery: str = "claude",
+    template: str = ""
 ) -> str:
     """
     添加定时任务
@@ -217,6 +219,8 @@ async def add_cron(
         channel_type: 频道类型（可选），默认 "discord"，可选值："discord"、"weixin"
         description: 任务描述（可选），用于识别任务
         repeat: 是否重复执行（可选），默认 true，false 表示一次性任务（执行后自动禁用）
+        delivery: 投递模式（可选），默认 "claude"，可选值："claude"（调用 Claude 生成回复）、"direct"（仅 reminder，直接发送内容，不调用 Claude）
+        template: 内容模板（可选），使用 {content}、{username}、{description}、{date}、{time}、{weekday} 占位符
 
     Returns:
         JSON 格式的创建结果，包含任务 ID
@@ -255,6 +259,17 @@ async def add_cron(
             repeat=False
         )
 
+        # 每小时提醒喝水（直接投递，不调用 Claude）
+        add_cron(
+            cron_expr="0 * * * *",
+            content="该喝水了！",
+            username="用户名",
+            user_id="USER_DISCORD_ID",
+            tag="reminder",
+            delivery="direct",
+            template="⏰ {time} {content}"
+        )
+
     Note:
         - user_id 和 channel_id 必须指定其中一个
         - channel_type 指定发送到哪个频道：discord 或 weixin（默认 discord）
@@ -262,6 +277,7 @@ async def add_cron(
         - 支持 cron 标准语法：* 表示任意，*/N 表示每 N，N-M 表示范围
         - 任务会由 Discord Bot 读取并执行，确保 Bot 正在运行
         - repeat=false 的任务执行一次后会自动禁用
+        - delivery="direct" 仅支持 tag="reminder"，适合固定文案的提醒
         - 常用示例：
           * "0 9 * * *" - 每天早上 9 点
           * "*/30 * * * *" - 每 30 分钟
@@ -277,7 +293,9 @@ async def add_cron(
         tag=tag,
         channel_type=channel_type,
         description=description,
-        repeat=repeat
+        repeat=repeat,
+        delivery=delivery,
+        template=template
     )
 
 
@@ -382,7 +400,9 @@ async def update_cron(
     channel_type: Optional[str] = None,
     description: Optional[str] = None,
     repeat: Optional[bool] = None,
-    enabled: Optional[bool] = None
+    enabled: Optional[bool] = None,
+    delivery: Optional[str] = None,
+    template: Optional[str] = None
 ) -> str:
     """
     更新定时任务
@@ -401,6 +421,8 @@ async def update_cron(
         description: 任务描述（可选），用于识别任务
         repeat: 是否重复执行（可选），true 重复，false 一次性
         enabled: 是否启用（可选），true 启用，false 禁用
+        delivery: 投递模式（可选），"claude" 或 "direct"（仅 reminder）
+        template: 内容模板（可选），传空字符串表示清除模板
 
     Returns:
         JSON 格式的更新结果
@@ -447,6 +469,7 @@ async def update_cron(
         - 修改 cron_expr 会重新调度任务
         - 修改 enabled 会立即生效（需要 Bot 重新加载）
         - 修改 repeat 会影响任务执行后的行为
+        - delivery="direct" 仅支持 tag="reminder"
     """
     return await _update_cron_impl(
         job_id=job_id,
@@ -459,7 +482,9 @@ async def update_cron(
         channel_type=channel_type,
         description=description,
         repeat=repeat,
-        enabled=enabled
+        enabled=enabled,
+        delivery=delivery,
+        template=template
     )
 
 
@@ -38,6 +38,15 @@ def _save_tasks(tasks: dict):
         raise Exception(f"保存任务失败: {e}")
 
 
+def _validate_delivery(delivery: Optional[str], tag: Optional[str]) -> Optional[str]:
+    """校验投递模式，返回错误信息（合法时返回 None）"""
+    if delivery not in ("claude", "direct"):
+        return f"无效的 delivery: {delivery}，可选值：claude、direct"
+    if delivery == "direct" and tag != "reminder":
+        return "delivery=direct 仅支持 tag=reminder 的提醒任务"
+    return None
+
+
 async def add_cron(
     cron_expr: str,
     content: str,
@@ -47,7 +56,9 @@ async def add_cron(
     tag: str = "task",
     channel_type: str = "discord",  # 频道类型（discord/weixin）
     description: str = "",
-    repeat: bool = True
+    repeat: bool = True,
+    delivery: str = "claude",
+    template: str = ""
 ) -> str:
     """
     添加定时任务
@@ -65,6 +76,8 @@ async def add_cron(
         channel_type: 频道类型（可选），默认 "discord"，可选值："discord"、"weixin"
         description: 任务描述（可选），用于识别任务
         repeat: 是否重复执行（可选），默认 true，false 表示一次性任务（执行后自动禁用）
+        delivery: 投递模式（可选），默认 "claude"，可选值："claude"（调用 Claude 生成回复）、"direct"（仅 reminder，直接发送内容，不调用 Claude）
+        template: 内容模板（可选），使用 {content}、{username}、{description}、{date}、{time}、{weekday} 占位符
 
     Returns:
         JSON 格式的创建结果，包含任务 ID
@@ -114,6 +127,17 @@ async def add_cron(
             tag="reminder"
         )
 
+        # 每小时提醒喝水（直接投递，不调用 Claude）
+        add_cron(
+            cron_expr="0 * * * *",
+            content="该喝水了！",
+            username="用户名",
+            user_id="USER_DISCORD_ID",
+            tag="reminder",
+            delivery="direct",
+            template="⏰ {time} {content}"
+        )
+
     Note:
         - user_id 和 channel_id 必须指定其中一个，并且只能二选一，不能两个都填写
         - channel_type 指定发送到哪个频道：discord 或 weixin（默认 discord）
@@ -121,6 +145,7 @@ async def add_cron(
         - 支持 cron 标准语法：* 表示任意，*/N 表示每 N，N-M 表示范围
         - 任务会由 Discord Bot 读取并执行，确保 Bot 正在运行
         - repeat=false 的任务执行一次后会自动禁用
+        - delivery="direct" 仅支持 tag="reminder"，内容会原样（或按模板渲染后）直接发送
         - 常用示例：
           * "0 9 * * *" - 每天早上 9 点
           * "*/30 * * * *" - 每 30 分钟
@@ -128,6 +153,14 @@ async def add_cron(
           * "0 9 * * 1-5" - 周一到周五早上 9 点
     """
     try:
+        # 投递模式校验
+        delivery_error = _validate_delivery(delivery, tag)
+        if delivery_error:
+            return json.dumps({
+                "success": False,
+                "error": delivery_error
+            }, ensure_ascii=False)
+
         # 二选一互斥校验
         if bool(user_id) and bool(channel_id):
             return json.dumps({
@@ -160,6 +193,8 @@ async def add_cron(
             "description": description or content[:50],
             "enabled": True,
             "repeat": repeat,  # 是否重复执行
+            "delivery": delivery,  # 投递模式
+            "template": template or None,  # 内容模板
             "created_at": datetime.now().isoformat(),
             "last_run": None,
             "last_error": None
@@ -199,6 +234,8 @@ async def list_cron() -> str:
         - tag: 标签
         - description: 描述
         - enabled: 是否启用
+        - delivery: 投递模式
+        - template: 内容模板
         - created_at: 创建时间
         - last_run: 最后运行时间
         - last_error: 最后错误信息
@@ -374,7 +411,9 @@ async def update_cron(
     channel_type: Optional[str] = None,  # 频道类型
     description: Optional[str] = None,
     repeat: Optional[bool] = None,
-    enabled: Optional[bool] = None
+    enabled: Optional[bool] = None,
+    delivery: Optional[str] = None,
+    template: Optional[str] = None
 ) -> str:
     """
     更新定时任务
@@ -393,6 +432,8 @@ async def update_cron(
         description: 任务描述（可选），用于识别任务
         repeat: 是否重复执行（可选），true 重复，false 一次性
         enabled: 是否启用（可选），true 启用，false 禁用
+        delivery: 投递模式（可选），"claude" 或 "direct"（仅 reminder）
+        template: 内容模板（可选），传空字符串表示清除模板
 
     Returns:
         JSON 格式的更新结果
@@ -422,6 +463,9 @@ async def update_cron(
             enabled=False
         )
 
+        # 提醒改为直接投递
+        await update_cron(job_id="a1b2c3d4", delivery="direct")
+
         # 同时修改多个字段
         await update_cron(
             job_id="a1b2c3d4",
@@ -523,6 +567,22 @@ async def update_cron(
             job['enabled'] = enabled
             changed_fields.append('enabled')
 
+        if delivery is not None:
+            job['delivery'] = delivery
+            changed_fields.append('delivery')
+
+        if template is not None:
+            job['template'] = template or None
+            changed_fields.append('template')
+
+        # 投递模式校验（tag 或 delivery 任一变化都需要重新校验）
+        delivery_error = _validate_delivery(job.get('delivery') or "claude", job.get('tag'))
+        if delivery_error:
+            return json.dumps({
+                "success": False,
+                "error": delivery_error
+            }, ensure_ascii=False)
+
         # 检查是否有修改
         if not changed_fields:
             return json.dumps({
@@ -9,7 +9,7 @@ from pathlib import Path
 # 添加项目根目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from shared.message_queue import MessageQueue, Message, MessageDirection, MessageStatus, MessageTag, ChannelType
+from shared.message_queue import MessageQueue, Message, MessageDirection, MessageStatus, MessageTag, ChannelType, DeliveryMode
 
 
 def insert_external_message(
@@ -21,6 +21,7 @@ def insert_external_message(
     use_message_request: bool = False,  # 默认使用 messages（方式2）
     tag: str = MessageTag.DEFAULT.value,  # 消息标签
     channel_type: str = ChannelType.DISCORD.value,  # 频道类型（默认 Discord）
+    delivery: str = DeliveryMode.CLAUDE.value,  # 投递模式（默认调用 Claude）
     db_path: str = None
 ) -> int:
     """
@@ -34,6 +35,8 @@ def insert_external_message(
         is_dm: 是否为私聊消息
         use_message_request: 是否使用 message_requests 表（推荐：True）
         tag: 消息标签（默认：default）
+        channel_type: 频道类型（默认：discord）
+        delivery: 投递模式（默认：claude；direct 表示提醒内容直接投递，不调用 CLI）
         db_path: 数据库路径（默认使用项目中的数据库）
 
     Returns:
@@ -82,7 +85,8 @@ def insert_external_message(
             is_dm=is_dm,
             is_external=True,  # 标记为外部消息
             tag=tag,
-            channel_type=channel_type  # 频道类型
+            channel_type=channel_type,  # 频道类型
+            delivery=delivery  # 投递模式
         )
         message_id = queue.add_message(message)
         return message_id
@@ -144,6 +148,13 @@ def main():
         help=f"频道类型（默认：{ChannelType.DISCORD.value}）"
     )
 
+    parser.add_argument(
+        "--delivery", "-d",
+        default=DeliveryMode.CLAUDE.value,
+        choices=[mode.value for mode in DeliveryMode],
+        help=f"投递模式（默认：{DeliveryMode.CLAUDE.value}，direct 仅对 reminder 生效）"
+    )
+
     parser.add_argument(
         "--db-path",
         help="自定义数据库路径（默认：shared/messages.db）"
@@ -160,6 +171,7 @@ def main():
     print(f"   类型: {'私聊' if args.is_dm else '频道'}")
     print(f"   标签: {args.tag}")
     print(f"   频道类型: {args.channel_type}")
+    print(f"   投递模式: {args.delivery}")
     print(f"   方式: {'message_requests (直接发送)' if use_mr else 'messages (对话流程)'}")
     print()
 
@@ -173,6 +185,7 @@ def main():
             use_message_request=use_mr,
             tag=args.tag,
             channel_type=args.channel_type,
+            delivery=args.delivery,
             db_path=args.db_path
         )
 
@@ -163,8 +163,16 @@ async def main():
         print(f"\n❌ 登录过程出错: {e}")
 
 
+async def run():
+    """执行登录流程，结束后关闭连接池"""
+    try:
+        await main()
+    finally:
+        await WeixinQRLogin.close()
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(run())
     except KeyboardInterrupt:
         print("\n\n❌ 用户取消登录")
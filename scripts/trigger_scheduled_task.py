@@ -22,7 +22,8 @@ def trigger_scheduled_task(
     channel_id: int = None,
     is_dm: bool = False,
     tag: str = None,
-    channel_type: str = "discord"  # 频道类型（默认 discord）
+    channel_type: str = "discord",  # 频道类型（默认 discord）
+    delivery: str = "claude"  # 投递模式（默认 claude）
 ) -> int:
     """
     触发定时任务，向 Claude Bridge 发送定时消息
@@ -37,6 +38,9 @@ def trigger_scheduled_task(
         user_id: Discord 用户 ID（私聊模式必须提供）
         channel_id: Discord 频道 ID（频道模式必须提供）
         is_dm: 是否为私聊消息（默认：False）
+        tag: 消息标签（task 或 reminder）
+        channel_type: 频道类型（默认：discord）
+        delivery: 投递模式（默认：claude；direct 表示提醒内容直接投递，不调用 CLI）
 
     Returns:
         消息 ID
@@ -65,6 +69,7 @@ def trigger_scheduled_task(
         use_message_request=False,  # 固定使用 messages 表
         tag=tag,  # 传递标签
         channel_type=channel_type,  # 传递频道类型
+        delivery=delivery,  # 传递投递模式
         db_path=None              # 固定使用默认数据库路径
     )
     return message_id
@@ -125,6 +130,13 @@ def main():
         help="频道类型（默认：discord）"
     )
 
+    parser.add_argument(
+        "--delivery", "-d",
+        default="claude",
+        choices=["claude", "direct"],
+        help="投递模式（默认：claude，direct 表示提醒内容直接投递，不调用 CLI）"
+    )
+
     args = parser.parse_args()
 
     # 从配置文件读取所有参数
@@ -180,6 +192,7 @@ def main():
         channel_id_str = config.get('channel_id', '')
         tag = config.get('tag') or args.tag
         channel_type = config.get('channel_type') or args.channel_type
+        delivery = config.get('delivery') or args.delivery
 
         # 转换 ID 为整数（如果提供）
         user_id = int(user_id_str) if user_id_str.strip() else args.user_id
@@ -194,6 +207,7 @@ def main():
             print(f"   频道 ID: {channel_id}")
         print(f"   标签: {tag}")
         print(f"   频道类型: {channel_type}")
+        print(f"   投递模式: {delivery}")
         # 参数校验
         if not content:
             parser.error("配置文件中缺少 content 字段")
@@ -211,6 +225,7 @@ def main():
         channel_id = args.channel_id
         tag = args.tag
         channel_type = args.channel_type
+        delivery = args.delivery
 
         if not content:
             parser.error("必须提供 content 或 --config-file 参数")
@@ -248,7 +263,8 @@ def main():
             channel_id=target_channel_id,
             is_dm=is_dm_mode,
             tag=tag,  # 传递标签参数
-            channel_type=channel_type  # 传递频道类型
+            channel_type=channel_type,  # 传递频道类型
+            delivery=delivery  # 传递投递模式
         )
 
         print(f"✅ 定时任务已成功触发！")
@@ -0,0 +1,221 @@
+"""
+内容寻址附件存储
+
+Bot 下载目录中的附件按 SHA-256 存入该目录下的 .store 目录，用户可见的文件名以硬链接
+（不支持时用符号链接，再不行则复制）指向同一份内容：
+- 相同内容的文件（跨平台、跨用户、重复发送）只占用一份磁盘空间
+- 索引保存在 SQLite（attachment_blobs / attachment_names 表）
+- 总大小超过磁盘预算时，按最近使用时间（LRU）淘汰
+- 只管理 Bot 下载目录内的文件：用户指定保存到其他目录的文件不纳入存储，也不会被淘汰删除
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+from shared.logger import get_logger
+
+log = get_logger("AttachmentStore", "manager")
+
+
+class AttachmentStore:
+    """内容寻址附件存储"""
+
+    # 计算哈希时的读取块大小
+    HASH_CHUNK_SIZE = 1024 * 1024
+    # 最近使用过的内容在此时间内不会被淘汰（秒），避免删除正在处理的消息引用的文件
+    EVICT_GRACE_SECONDS = 600
+
+    def __init__(self, db_path: str, root_dir: str, budget_bytes: int):
+        self.db_path = db_path
+        self.root_dir = Path(root_dir)
+        self.store_dir = self.root_dir / ".store"
+        self.budget_bytes = budget_bytes
+
+    def _get_connection(self):
+        """获取数据库连接"""
+        return sqlite3.connect(self.db_path)
+
+    def is_managed(self, path) -> bool:
+        """文件是否位于存储管理的下载目录内（.store 目录本身除外）"""
+        path = Path(path).resolve()
+        root = self.root_dir.resolve()
+        return root in path.parents and self.store_dir.resolve() not in path.parents
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.store_dir / sha256[:2] / sha256
+
+    @classmethod
+    def hash_file(cls, path: str) -> str:
+        """计算文件的 SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(cls.HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _link(blob_path: Path, name_path: Path):
+        """让可读文件名指向内容文件（硬链接 → 符号链接 → 复制）"""
+        try:
+            os.link(blob_path, name_path)
+            return
+        except OSError:
+            pass
+        try:
+            os.symlink(blob_path, name_path)
+            return
+        except OSError:
+            pass
+        shutil.copy2(blob_path, name_path)
+
+    def ingest(self, path: str, source: str, source_key: str = None) -> Optional[str]:
+        """
+        将已写入磁盘的文件纳入存储（同步方法，包含哈希计算和文件操作，应在线程中调用）
+
+        内容已存在时，用链接替换该文件（去重）；否则将文件移入存储后再链接回原位置。
+        不在下载目录内的文件（如用户指定保存目录的下载）保持原样，不纳入存储。
+
+        Args:
+            path: 文件路径（保持不变，仍可按原路径访问）
+            source: 来源（discord/weixin）
+            source_key: 来源内的标识（Discord 附件 ID、微信文件大小等）
+
+        Returns:
+            文件内容的 SHA-256，文件不在下载目录内时返回 None
+        """
+        name_path = Path(path).resolve()
+        if not self.is_managed(name_path):
+            return None
+        size = name_path.stat().st_size
+        sha256 = self.hash_file(str(name_path))
+        blob_path = self._blob_path(sha256)
+        now = time.time()
+
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM attachment_blobs WHERE sha256 = ?", (sha256,))
+            known = cursor.fetchone() is not None and blob_path.exists()
+
+            if known:
+                if not (name_path.exists() and os.path.samefile(name_path, blob_path)):
+                    # 内容已存在：删除重复文件，改为链接
+                    name_path.unlink()
+                    self._link(blob_path, name_path)
+                    log.log(f"♻️ 附件内容重复，已去重: {name_path.name} ({size} bytes)")
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.replace(name_path, blob_path)
+                except OSError:
+                    shutil.copy2(name_path, blob_path)
+                    name_path.unlink()
+                self._link(blob_path, name_path)
+
+            cursor.execute("""
+                INSERT INTO attachment_blobs (sha256, size, created_at, last_used_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(sha256) DO UPDATE SET last_used_at = excluded.last_used_at
+            """, (sha256, size, now, now))
+            cursor.execute("""
+                INSERT OR REPLACE INTO attachment_names (path, sha256, source, source_key, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (str(name_path), sha256, source, str(source_key) if source_key is not None else None, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.evict()
+        return sha256
+
+    def touch(self, path: str) -> bool:
+        """
+        标记文件最近被使用（命中已下载的附件时调用）
+
+        Returns:
+            文件是否在存储中
+        """
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE attachment_blobs SET last_used_at = ?
+                WHERE sha256 = (SELECT sha256 FROM attachment_names WHERE path = ?)
+            """, (time.time(), str(Path(path).resolve())))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def find_name(self, source: str, source_key: str) -> Optional[str]:
+        """按来源标识查找最近纳入存储且仍存在的文件路径"""
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT path FROM attachment_names
+                WHERE source = ? AND source_key = ?
+                ORDER BY created_at DESC
+            """, (source, str(source_key)))
+            for (path,) in cursor.fetchall():
+                if os.path.exists(path):
+                    return path
+            return None
+        finally:
+            conn.close()
+
+    def evict(self):
+        """总大小超过预算时，按 LRU 淘汰内容及其所有文件名"""
+        if self.budget_bytes <= 0:
+            return
+
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COALESCE(SUM(size), 0) FROM attachment_blobs")
+            total = cursor.fetchone()[0]
+            if total <= self.budget_bytes:
+                return
+
+            cursor.execute("""
+                SELECT sha256, size FROM attachment_blobs
+                WHERE last_used_at < ?
+                ORDER BY last_used_at ASC
+            """, (time.time() - self.EVICT_GRACE_SECONDS,))
+            candidates = cursor.fetchall()
+
+            evicted = 0
+            freed = 0
+            for sha256, size in candidates:
+                if total <= self.budget_bytes:
+                    break
+                cursor.execute("SELECT path FROM attachment_names WHERE sha256 = ?", (sha256,))
+                for (path,) in cursor.fetchall():
+                    if not self.is_managed(path):
+                        # 下载目录以外的文件名（旧版本纳入的记录）只移除索引，不删除文件
+                        continue
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        log.log(f"⚠️ 删除附件文件失败: {path} - {e}")
+                try:
+                    self._blob_path(sha256).unlink()
+                except FileNotFoundError:
+                    pass
+                cursor.execute("DELETE FROM attachment_names WHERE sha256 = ?", (sha256,))
+                cursor.execute("DELETE FROM attachment_blobs WHERE sha256 = ?", (sha256,))
+                total -= size
+                freed += size
+                evicted += 1
+            conn.commit()
+
+            if evicted:
+                log.log(f"🧹 附件存储超出预算，已淘汰 {evicted} 个文件，释放 {freed / 1024 / 1024:.2f} MB")
+        finally:
+            conn.close()
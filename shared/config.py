@@ -4,7 +4,7 @@
 import yaml
 import os
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 
 
 class Config:
@@ -117,11 +117,58 @@ class Config:
             stickers_dir = project_root / stickers_dir
         return str(stickers_dir)
 
+    @property
+    def sticker_cache_enabled(self) -> bool:
+        """获取是否复用表情包首次上传的 CDN 地址（不再重复上传）"""
+        return self._config.get('discord', {}).get('sticker_cache', False)
+
     @property
     def mention_required(self) -> bool:
         """获取是否需要 @机器人 才能触发对话"""
         return self._config.get('discord', {}).get('mention_required', True)
 
+    @property
+    def discord_shard_count(self) -> Optional[int]:
+        """获取 Discord 分片总数（None 表示使用 Discord 推荐的分片数）"""
+        return self._config.get('discord', {}).get('sharding', {}).get('shard_count')
+
+    @property
+    def discord_shard_ids(self) -> Optional[List[int]]:
+        """获取本进程负责的分片 ID 列表（None 表示负责全部分片）"""
+        shard_ids = self._config.get('discord', {}).get('sharding', {}).get('shard_ids', [])
+        return shard_ids or None
+
+    @property
+    def discord_intent_members(self) -> bool:
+        """是否启用服务器成员 Intent（特权 Intent，启用后启动时会分块拉取成员列表）"""
+        return self._config.get('discord', {}).get('intents', {}).get('members', False)
+
+    @property
+    def discord_intent_presences(self) -> bool:
+        """是否启用在线状态 Intent（特权 Intent）"""
+        return self._config.get('discord', {}).get('intents', {}).get('presences', False)
+
+    @property
+    def discord_intent_typing(self) -> bool:
+        """是否接收"正在输入"事件（会话预热依赖该事件）"""
+        return self._config.get('discord', {}).get('intents', {}).get('typing', True)
+
+    @property
+    def discord_max_messages(self) -> Optional[int]:
+        """获取消息缓存条数上限（0 表示不缓存消息）"""
+        max_messages = self._config.get('discord', {}).get('cache', {}).get('max_messages', 1000)
+        return max_messages or None
+
+    @property
+    def discord_cache_members(self) -> bool:
+        """是否缓存服务器成员"""
+        return self._config.get('discord', {}).get('cache', {}).get('members', False)
+
+    @property
+    def discord_chunk_guilds_at_startup(self) -> bool:
+        """启动时是否分块拉取所有服务器的成员列表"""
+        return self._config.get('discord', {}).get('cache', {}).get('chunk_guilds_at_startup', False)
+
     @property
     def default_download_directory(self) -> str:
         """获取默认文件下载目录"""
@@ -132,6 +179,31 @@ class Config:
             download_dir = project_root / download_dir
         return str(download_dir)
 
+    @property
+    def file_download_max_concurrent(self) -> int:
+        """获取附件并发下载数"""
+        return self._config.get('file_download', {}).get('max_concurrent', 3)
+
+    @property
+    def file_download_prefetch_timeout(self) -> int:
+        """获取 Bridge 等待附件后台下载完成的超时时间（秒）"""
+        return self._config.get('file_download', {}).get('prefetch_timeout', 120)
+
+    @property
+    def attachment_store_enabled(self) -> bool:
+        """获取是否启用内容寻址附件存储（按 SHA-256 去重）"""
+        return self._config.get('file_download', {}).get('store_enabled', False)
+
+    @property
+    def attachment_store_budget(self) -> int:
+        """获取附件存储的磁盘预算（字节），超出后按 LRU 淘汰，0 表示不限制"""
+        return self._config.get('file_download', {}).get('store_budget_mb', 4096) * 1024 * 1024
+
+    @property
+    def file_download_chunk_size(self) -> int:
+        """获取附件下载分块大小（字节）"""
+        return self._config.get('file_download', {}).get('chunk_size_kb', 256) * 1024
+
     @property
     def auto_load_enabled(self) -> bool:
         """获取是否启用首次对话提示词注入"""
@@ -181,11 +253,38 @@ class Config:
         """获取 Worker 空闲超时时间（秒，0 = 永不清理）"""
         return self._config.get('claude', {}).get('worker_idle_timeout', 300)
 
+    # 会话预热配置
+
+    @property
+    def session_warmup_enabled(self) -> bool:
+        """获取是否启用会话预热（用户输入时提前启动 Claude Code CLI）"""
+        return self._config.get('session_warmup', {}).get('enabled', False)
+
+    @property
+    def session_warmup_ttl(self) -> int:
+        """获取预热有效期（秒，超时未收到消息则释放预热进程）"""
+        return self._config.get('session_warmup', {}).get('ttl', 30)
+
+    @property
+    def session_warmup_hint_interval(self) -> int:
+        """获取同一会话两次预热提示的最小间隔（秒）"""
+        return self._config.get('session_warmup', {}).get('hint_interval', 5)
+
     @property
     def tool_use_notification_enabled(self) -> bool:
         """获取是否启用工具调用通知"""
         return self._config.get('tool_use_notification', {}).get('enabled', False)
 
+    @property
+    def tool_use_notification_mode(self) -> str:
+        """获取 Discord 工具调用通知模式（card: 每个工具一张卡片；compact: 每轮一张活动卡片）"""
+        return self._config.get('tool_use_notification', {}).get('mode', 'card')
+
+    @property
+    def tool_use_compact_update_interval(self) -> float:
+        """获取 compact 模式下活动卡片两次编辑的最小间隔（秒）"""
+        return self._config.get('tool_use_notification', {}).get('compact_update_interval', 2.0)
+
     @property
     def tool_emoji_mapping(self) -> Dict[str, str]:
         """获取工具 emoji 映射配置"""
@@ -213,6 +312,28 @@ class Config:
         """获取消息队列的发送间隔（秒）"""
         return self._config.get('queue', {}).get('send_interval', 1.5)
 
+    @property
+    def queue_max_concurrent_sends(self) -> int:
+        """获取 Discord 序列发送的全局最大并发数（不同频道/私聊之间并发）"""
+        return self._config.get('queue', {}).get('max_concurrent_sends', 4)
+
+    @property
+    def queue_coalesce_text(self) -> bool:
+        """获取频道速率过热时是否合并相邻文本发送"""
+        return self._config.get('queue', {}).get('coalesce_text', True)
+
+    # 实时编辑配置
+
+    @property
+    def live_edit_enabled(self) -> bool:
+        """获取是否启用 Discord 实时编辑模式（流式预览）"""
+        return self._config.get('live_edit', {}).get('enabled', False)
+
+    @property
+    def live_edit_interval(self) -> float:
+        """获取实时编辑的最小间隔（秒）"""
+        return self._config.get('live_edit', {}).get('edit_interval', 1.2)
+
     # 消息分割配置
 
     @property
@@ -257,6 +378,56 @@ class Config:
         """获取微信是否启用工具调用通知"""
         return self._config.get('weixin', {}).get('tool_use_notification', {}).get('enabled', False)
 
+    @property
+    def weixin_cdn_max_connections(self) -> int:
+        """获取微信 CDN 下载每个主机的最大并发连接数"""
+        return self._config.get('weixin', {}).get('cdn_max_connections', 8)
+
+    @property
+    def weixin_upload_cache_enabled(self) -> bool:
+        """获取是否缓存微信 CDN 上传结果（相同内容再次发送时不重新上传）"""
+        return self._config.get('weixin', {}).get('upload_cache', {}).get('enabled', True)
+
+    @property
+    def weixin_upload_cache_ttl(self) -> int:
+        """获取微信 CDN 上传结果的复用有效期（秒）"""
+        return self._config.get('weixin', {}).get('upload_cache', {}).get('ttl', 43200)
+
+    @property
+    def weixin_ingest_workers(self) -> int:
+        """获取每个微信账号的消息处理任务数（同一用户的消息始终由同一任务按顺序处理）"""
+        return self._config.get('weixin', {}).get('ingest', {}).get('workers', 4)
+
+    @property
+    def weixin_ingest_queue_size(self) -> int:
+        """获取每个消息处理任务的队列容量（队列满时暂停长轮询）"""
+        return self._config.get('weixin', {}).get('ingest', {}).get('queue_size', 100)
+
+    @property
+    def weixin_send_rate(self) -> float:
+        """获取每个微信账号的持续发送速率（条/秒）"""
+        return self._config.get('weixin', {}).get('rate_limit', {}).get('messages_per_second', 1.0)
+
+    @property
+    def weixin_send_burst(self) -> int:
+        """获取每个微信账号允许连续发送的最大条数（令牌桶容量）"""
+        return self._config.get('weixin', {}).get('rate_limit', {}).get('burst', 3)
+
+    @property
+    def weixin_file_upload_concurrency(self) -> int:
+        """获取微信一次发送多个文件时的最大并发上传数"""
+        return self._config.get('weixin', {}).get('file_send', {}).get('upload_concurrency', 3)
+
+    @property
+    def weixin_typing_ticket_ttl(self) -> int:
+        """获取微信 typing ticket 的缓存有效期（秒）"""
+        return self._config.get('weixin', {}).get('typing_ticket', {}).get('ttl', 1800)
+
+    @property
+    def weixin_typing_ticket_refresh_ahead(self) -> int:
+        """获取微信 typing ticket 提前刷新的时间（剩余有效期不足此值时后台刷新，秒）"""
+        return self._config.get('weixin', {}).get('typing_ticket', {}).get('refresh_ahead', 300)
+
     @property
     def weixin_file_mapping_path(self) -> str:
         """获取微信文件映射表路径（独立于 Discord）"""
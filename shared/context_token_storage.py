@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import Optional
 
 from shared.logger import get_logger
+from shared.debounced_writer import DebouncedJsonWriter
 
 log = get_logger("ContextTokenStorage", "bridge")
 
@@ -24,6 +25,7 @@ class ContextTokenStorage:
         """
         self.storage_file = Path(storage_file)
         self._tokens: dict[str, str] = {}  # username -> token
+        self._writer = DebouncedJsonWriter(self.storage_file, self._build_accounts_data, indent=2)
         self._load()
 
     def _load(self):
@@ -45,30 +47,32 @@ class ContextTokenStorage:
             log.log(f"⚠️  加载 context token 失败: {e}")
             self._tokens = {}
 
+    def _build_accounts_data(self) -> list:
+        """生成写入磁盘的数据：读取当前文件（保留其他字段），更新每个账号对象的 context_token"""
+        data = []
+        # 如果文件已存在，先读取（保留其他字段）
+        if self.storage_file.exists():
+            with open(self.storage_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if not isinstance(data, list):
+                    # 如果不是数组格式，重置为空数组
+                    data = []
+
+        # 更新每个账号对象的 context_token
+        for account in data:
+            if isinstance(account, dict):
+                username = account.get('username')
+                if username and username in self._tokens:
+                    account['context_token'] = self._tokens[username]
+        return data
+
     def _save(self):
-        """保存 token 到磁盘"""
-        try:
-            data = []
-            # 如果文件已存在，先读取（保留其他字段）
-            if self.storage_file.exists():
-                with open(self.storage_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    if not isinstance(data, list):
-                        # 如果不是数组格式，重置为空数组
-                        data = []
-
-            # 更新每个账号对象的 context_token
-            for account in data:
-                if isinstance(account, dict):
-                    username = account.get('username')
-                    if username and username in self._tokens:
-                        account['context_token'] = self._tokens[username]
-
-            with open(self.storage_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            log.log(f"已保存 {len(self._tokens)} 个 context token 到 {self.storage_file.name}")
-        except Exception as e:
-            log.log(f"⚠️  保存 context token 失败: {e}")
+        """标记 token 需要保存（防抖合并写盘）"""
+        self._writer.mark_dirty()
+
+    def flush(self):
+        """立即将待保存的 token 写入磁盘（退出前调用）"""
+        self._writer.flush()
 
     def get(self, username: str) -> Optional[str]:
         """
@@ -84,7 +88,7 @@ class ContextTokenStorage:
 
     def set(self, username: str, token: str):
         """
-        设置用户的 context token（同时写内存和磁盘）
+        设置用户的 context token（立即写内存，磁盘防抖写入）
 
         Args:
             username: 用户名
@@ -92,6 +96,8 @@ class ContextTokenStorage:
         """
         if not username or not token:
             return
+        if self._tokens.get(username) == token:
+            return
         self._tokens[username] = token
         self._save()
 
@@ -21,6 +21,13 @@ from shared.logger import get_logger
 log = get_logger("CronScheduler", "manager")
 
 
+class _TemplateVars(dict):
+    """模板变量字典（未知占位符原样保留）"""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
 class BotCronScheduler:
     """Bot 定时任务调度器"""
 
@@ -127,12 +134,13 @@ class BotCronScheduler:
             # 准备配置内容
             config_content = f"""username={job.get('username') or ''}
 content<<<MARKER_START
-{job['content']}
+{self._render_content(job)}
 <<<MARKER_END
 user_id={job.get('user_id') or ''}
 channel_id={job.get('channel_id') or ''}
 tag={job.get('tag') or 'task'}
 channel_type={job.get('channel_type') or 'discord'}
+delivery={self._get_delivery(job)}
 """
 
             # 执行脚本
@@ -175,6 +183,38 @@ channel_type={job.get('channel_type') or 'discord'}
             job['last_error'] = error_msg
             self._save_tasks()
 
+    def _get_delivery(self, job: dict) -> str:
+        """获取任务的投递模式（direct 仅对 reminder 任务生效，其余一律走 Claude）"""
+        if job.get('delivery') == 'direct' and (job.get('tag') or 'task') == 'reminder':
+            return 'direct'
+        return 'claude'
+
+    def _render_content(self, job: dict) -> str:
+        """按任务模板渲染消息内容
+
+        模板使用 str.format 占位符，支持：
+        {content}、{username}、{description}、{date}、{time}、{weekday}
+        未知占位符原样保留；未配置模板时直接返回 content。
+        """
+        template = job.get('template')
+        if not template:
+            return job['content']
+
+        now = datetime.now()
+        variables = _TemplateVars(
+            content=job['content'],
+            username=job.get('username') or '',
+            description=job.get('description') or '',
+            date=now.strftime('%Y-%m-%d'),
+            time=now.strftime('%H:%M'),
+            weekday="一二三四五六日"[now.weekday()],
+        )
+        try:
+            return template.format_map(variables)
+        except (ValueError, IndexError) as e:
+            log.log(f"⚠️  任务模板渲染失败 {job.get('id')}: {e}，使用原始内容")
+            return job['content']
+
     def _save_tasks(self):
         """保存任务到文件"""
         try:
@@ -0,0 +1,70 @@
+"""
+JSON 文件防抖持久化模块
+数据读写都在内存中进行，写盘请求在防抖窗口内合并为一次，通过临时文件 + 重命名原子写入
+"""
+import asyncio
+import atexit
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from shared.logger import get_logger
+
+log = get_logger("DebouncedWriter", "bridge")
+
+
+class DebouncedJsonWriter:
+    """JSON 文件防抖写入器
+
+    - mark_dirty() 标记数据已变化：在事件循环中运行时延迟 delay 秒后统一写盘，
+      期间的多次变化只写一次；没有运行中的事件循环时立即写盘
+    - 写盘时调用 build_data() 生成要保存的数据，先写入同目录下的临时文件再重命名，
+      进程中途退出也不会留下写了一半的文件
+    - flush() 立即写入待保存的数据（退出前调用；进程正常退出时也会自动调用）
+    """
+
+    def __init__(self, path: Path, build_data: Callable[[], Any], delay: float = 1.0, indent: Optional[int] = None):
+        self.path = Path(path)
+        self.build_data = build_data
+        self.delay = delay
+        self.indent = indent
+        self._dirty = False
+        self._timer: Optional[asyncio.TimerHandle] = None
+        atexit.register(self.flush)
+
+    def mark_dirty(self):
+        """标记数据已变化，安排写盘"""
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._timer is None:
+            self._timer = loop.call_later(self.delay, self.flush)
+
+    def flush(self):
+        """立即写入待保存的数据"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._dirty:
+            return
+        self._dirty = False
+
+        try:
+            data = self.build_data()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=self.indent)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        except Exception as e:
+            log.log(f"⚠️ 保存 {self.path.name} 失败: {e}")
@@ -57,6 +57,19 @@ class MessageTag(Enum):
     REMINDER = "reminder"          # 提醒消息
 
 
+class DeliveryMode(Enum):
+    """消息投递模式枚举"""
+    CLAUDE = "claude"            # 调用 Claude Code CLI 生成回复（默认）
+    DIRECT = "direct"            # 直接投递内容（仅提醒消息，不调用 CLI）
+
+
+class AttachmentStatus(Enum):
+    """附件下载状态枚举"""
+    PENDING = "pending"          # 后台下载中
+    READY = "ready"              # 已下载到本地（默认）
+    FAILED = "failed"            # 下载失败
+
+
 class ChannelType(Enum):
     """频道类型枚举"""
     DISCORD = "discord"          # Discord 频道
@@ -72,6 +85,7 @@ class AttachmentInfo:
     url: str  # 文件 URL
     local_filename: Optional[str] = None  # 本地实际文件名
     description: Optional[str] = None  # 文件描述
+    status: str = AttachmentStatus.READY.value  # 下载状态（pending/ready/failed）
 
 
 @dataclass
@@ -94,6 +108,7 @@ class Message:
     context_token: Optional[str] = None  # 微信消息上下文 token（用于回复）
     attachments: Optional[List[AttachmentInfo]] = None  # 附件信息列表
     streaming_response: Optional[str] = None  # 流式响应内容
+    delivery: str = DeliveryMode.CLAUDE.value  # 投递模式（claude/direct）
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -200,7 +215,8 @@ class MessageQueue:
                     "local_filename": a.local_filename,
                     "size": a.size,
                     "url": a.url,
-                    "description": a.description
+                    "description": a.description,
+                    "status": a.status
                 }
                 for a in message.attachments
             ]
@@ -211,8 +227,8 @@ class MessageQueue:
                 direction, content, status,
                 discord_channel_id, discord_message_id,
                 discord_user_id, username,
-                response, error, is_dm, is_external, tag, channel_type, context_token, attachments, created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                response, error, is_dm, is_external, tag, channel_type, context_token, attachments, created_at, updated_at, delivery
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             message.direction,
             message.content,
@@ -230,7 +246,8 @@ class MessageQueue:
             message.context_token,
             attachments_json,
             message.created_at,
-            message.updated_at
+            message.updated_at,
+            message.delivery
         ))
 
         message_id = cursor.lastrowid
@@ -257,7 +274,7 @@ class MessageQueue:
             SELECT id, direction, content, status,
                    discord_channel_id, discord_message_id,
                    discord_user_id, username,
-                   response, error, is_dm, is_external, tag, channel_type, context_token, attachments, created_at, updated_at
+                   response, error, is_dm, is_external, tag, channel_type, context_token, attachments, created_at, updated_at, delivery
             FROM messages
             WHERE status = ? AND direction = ?
             ORDER BY created_at ASC
@@ -281,7 +298,8 @@ class MessageQueue:
                             local_filename=a.get("local_filename"),
                             size=a["size"],
                             url=a["url"],
-                            description=a.get("description")
+                            description=a.get("description"),
+                            status=a.get("status", AttachmentStatus.READY.value)
                         )
                         for a in attachments_data
                     ]
@@ -305,6 +323,7 @@ class MessageQueue:
                 channel_type=row[13] or ChannelType.DISCORD.value,
                 context_token=row[14],
                 attachments=attachments,
+                delivery=row[18] or DeliveryMode.CLAUDE.value,
                 created_at=row[16],
                 updated_at=row[17]
             )
@@ -389,6 +408,109 @@ class MessageQueue:
         conn.commit()
         conn.close()
 
+    def update_attachment_status(self, message_id: int, attachment_id: int, status: str,
+                                 local_filename: str = None, size: int = None):
+        """更新消息中单个附件的下载状态（后台预取完成/失败时调用）
+
+        Args:
+            message_id: 消息 ID
+            attachment_id: 附件 ID
+            status: 下载状态（AttachmentStatus）
+            local_filename: 本地文件名（可选）
+            size: 实际文件大小（可选）
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        # 读-改-写附件 JSON，加写锁避免同一消息的多个附件并发更新时互相覆盖
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT attachments FROM messages WHERE id = ?", (message_id,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            attachments_list = json.loads(row[0])
+            for a in attachments_list:
+                if a["id"] == attachment_id:
+                    a["status"] = status
+                    if local_filename is not None:
+                        a["local_filename"] = local_filename
+                    if size is not None:
+                        a["size"] = size
+            cursor.execute(
+                "UPDATE messages SET attachments = ? WHERE id = ?",
+                (json.dumps(attachments_list), message_id)
+            )
+        conn.commit()
+        conn.close()
+
+    def get_attachments(self, message_id: int) -> List[AttachmentInfo]:
+        """获取消息的附件列表（含最新下载状态）"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT attachments FROM messages WHERE id = ?", (message_id,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row or not row[0]:
+            return []
+        try:
+            return [AttachmentInfo(**a) for a in json.loads(row[0])]
+        except (json.JSONDecodeError, TypeError):
+            return []
+
+    def update_stream_preview(self, message_id: int, block: int, text: str):
+        """更新流式预览（当前正在输出的文本块的部分内容）
+
+        Args:
+            message_id: 消息 ID
+            block: 文本块序号（每个新文本块递增，用于区分预览属于哪个块）
+            text: 当前文本块已输出的内容（空字符串表示该块已完成）
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE messages
+            SET stream_preview = ?, stream_preview_block = ?
+            WHERE id = ?
+        """, (text, block, message_id))
+        conn.commit()
+        conn.close()
+
+    def get_stream_previews(self, channel_type: str, limit: int = 50) -> List[dict]:
+        """批量获取有流式预览内容的消息
+
+        Args:
+            channel_type: 频道类型（discord/weixin）
+            limit: 返回数量限制
+
+        Returns:
+            消息列表，每条包含 id, discord_channel_id, discord_user_id, is_dm, block, text
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, discord_channel_id, discord_user_id, is_dm, stream_preview_block, stream_preview
+            FROM messages
+            WHERE status IN (?, ?)
+              AND channel_type = ?
+              AND stream_preview IS NOT NULL
+              AND stream_preview != ''
+            ORDER BY id ASC
+            LIMIT ?
+        """, (MessageStatus.PROCESSING.value, MessageStatus.AI_STARTED.value, channel_type, limit))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [
+            {
+                "id": row[0],
+                "discord_channel_id": row[1],
+                "discord_user_id": row[2],
+                "is_dm": bool(row[3]),
+                "block": row[4] or 0,
+                "text": row[5]
+            }
+            for row in rows
+        ]
+
     def add_tool_use(self, message_id: int, tool_name: str, tool_input: dict, tool_use_id: str = None) -> int:
         """添加工具调用信息（代理到 ToolUseTracker）"""
         return self._tool_uses.add_tool_use(message_id, tool_name, tool_input, tool_use_id)
@@ -421,6 +543,14 @@ class MessageQueue:
         """获取待处理的工具执行结果（代理到 ToolUseTracker）"""
         return self._tool_uses.get_pending_tool_use_results(channel_type)
 
+    def has_pending_tool_use_results(self, message_id: int, channel_type: str = None) -> bool:
+        """消息是否还有未处理的工具执行结果（代理到 ToolUseTracker）"""
+        return self._tool_uses.has_pending_tool_use_results(message_id, channel_type)
+
+    def get_pending_tool_use_results_with_messages(self, channel_type: str) -> List[dict]:
+        """获取待处理的工具执行结果及对应的消息字段（代理到 ToolUseTracker）"""
+        return self._tool_uses.get_pending_tool_use_results_with_messages(channel_type)
+
     def mark_tool_use_result_processed(self, message_id: int, tool_use_index: int):
         """标记工具执行结果为已处理（代理到 ToolUseTracker）"""
         self._tool_uses.mark_tool_use_result_processed(message_id, tool_use_index)
@@ -480,6 +610,61 @@ class MessageQueue:
                 return None
         return None
 
+    def get_message_statuses(self, message_ids: List[int]) -> Dict[int, str]:
+        """批量获取消息状态（用于对账已知消息的状态变化）
+
+        Args:
+            message_ids: 消息 ID 列表
+
+        Returns:
+            {message_id: status}，不存在的消息不包含在结果中
+        """
+        if not message_ids:
+            return {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(message_ids))
+        cursor.execute(f"SELECT id, status FROM messages WHERE id IN ({placeholders})", list(message_ids))
+        rows = cursor.fetchall()
+        conn.close()
+        return {row[0]: row[1] for row in rows}
+
+    def get_external_messages_after(self, channel_type: str, after_id: int, limit: int = 200) -> List[dict]:
+        """增量获取外部插入的消息（ID 大于高水位线，按主键范围查询）
+
+        Args:
+            channel_type: 频道类型（discord/weixin）
+            after_id: 高水位线（上次看到的最大消息 ID）
+            limit: 返回数量限制
+
+        Returns:
+            消息列表（按 ID 升序），每条包含 id, discord_user_id, discord_channel_id, username, content, is_dm, status
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, discord_user_id, discord_channel_id, username, content, is_dm, status
+            FROM messages
+            WHERE id > ? AND direction = ? AND is_external = 1 AND channel_type = ?
+            ORDER BY id ASC
+            LIMIT ?
+        """, (after_id, MessageDirection.TO_CLAUDE.value, channel_type, limit))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [
+            {
+                "id": row[0],
+                "discord_user_id": row[1],
+                "discord_channel_id": row[2],
+                "username": row[3],
+                "content": row[4],
+                "is_dm": bool(row[5]),
+                "status": row[6]
+            }
+            for row in rows
+        ]
+
     def get_streaming_messages(self, channel_type: str = None, limit: int = 100) -> List[dict]:
         """批量获取有待发送流式响应的消息
 
@@ -667,7 +852,8 @@ class MessageQueue:
                             local_filename=a.get("local_filename"),
                             size=a["size"],
                             url=a["url"],
-                            description=a.get("description")
+                            description=a.get("description"),
+                            status=a.get("status", AttachmentStatus.READY.value)
                         )
                         for a in attachments_data
                     ]
@@ -794,6 +980,15 @@ class MessageQueue:
             base_working_dir, channel_id, user_id, is_dm, use_temp_session, temp_session_key
         )
 
+    def add_warmup_hint(self, session_key: str, channel_id: int = None, user_id: int = None,
+                        is_dm: bool = False, channel_type: str = 'discord'):
+        """写入会话预热提示（代理到 SessionManager）"""
+        self._sessions.add_warmup_hint(session_key, channel_id, user_id, is_dm, channel_type)
+
+    def pop_warmup_hints(self) -> list:
+        """取出并删除所有会话预热提示（代理到 SessionManager）"""
+        return self._sessions.pop_warmup_hints()
+
     def get_claude_session_path(self, working_dir: str) -> str:
         """获取 Claude Code 会话文件路径（代理到 SessionManager）"""
         return self._sessions.get_claude_session_path(working_dir)
@@ -855,6 +1050,11 @@ class MessageQueue:
 
     def get_next_file_download_request(self) -> Optional[FileDownloadRequest]:
         """获取下一个待处理的文件下载请求"""
+        requests = self.get_pending_file_download_requests(limit=1)
+        return requests[0] if requests else None
+
+    def get_pending_file_download_requests(self, limit: int = 20) -> List[FileDownloadRequest]:
+        """按创建时间顺序获取待处理的文件下载请求（多进程分片时由各进程挑选自己负责的请求）"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
@@ -864,14 +1064,14 @@ class MessageQueue:
             FROM file_download_requests
             WHERE status = ?
             ORDER BY created_at ASC
-            LIMIT 1
-        """, (FileDownloadRequestStatus.PENDING.value,))
+            LIMIT ?
+        """, (FileDownloadRequestStatus.PENDING.value, limit))
 
-        row = cursor.fetchone()
+        rows = cursor.fetchall()
         conn.close()
 
-        if row:
-            return FileDownloadRequest(
+        return [
+            FileDownloadRequest(
                 id=row[0],
                 discord_message_id=row[1],
                 discord_channel_id=row[2],
@@ -882,7 +1082,8 @@ class MessageQueue:
                 created_at=row[7],
                 updated_at=row[8]
             )
-        return None
+            for row in rows
+        ]
 
     def update_file_download_request_status(self, request_id: int, status: FileDownloadRequestStatus,
                                            downloaded_files: Optional[str] = None, error: Optional[str] = None):
@@ -1056,6 +1257,11 @@ class MessageQueue:
 
     def get_next_message_request(self) -> Optional[MessageRequest]:
         """获取下一个待处理的消息发送请求"""
+        requests = self.get_pending_message_requests(limit=1)
+        return requests[0] if requests else None
+
+    def get_pending_message_requests(self, limit: int = 20) -> List[MessageRequest]:
+        """按创建时间顺序获取待处理的消息发送请求（多进程分片时由各进程挑选自己负责的请求）"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
@@ -1065,14 +1271,14 @@ class MessageQueue:
             FROM message_requests
             WHERE status = ?
             ORDER BY created_at ASC
-            LIMIT 1
-        """, (MessageRequestStatus.PENDING.value,))
+            LIMIT ?
+        """, (MessageRequestStatus.PENDING.value, limit))
 
-        row = cursor.fetchone()
+        rows = cursor.fetchall()
         conn.close()
 
-        if row:
-            return MessageRequest(
+        return [
+            MessageRequest(
                 id=row[0],
                 content=row[1],
                 user_id=row[2],
@@ -1087,7 +1293,8 @@ class MessageQueue:
                 created_at=row[11],
                 updated_at=row[12]
             )
-        return None
+            for row in rows
+        ]
 
     def update_message_request_status(self, request_id: int, status: MessageRequestStatus,
                                    result: Optional[str] = None, error: Optional[str] = None):
@@ -75,6 +75,69 @@ TABLES: Dict[str, str] = {
         )
     """,
 
+    "session_warmup_hints": """
+        CREATE TABLE IF NOT EXISTS session_warmup_hints (
+            session_key TEXT PRIMARY KEY,
+            channel_id INTEGER,
+            user_id INTEGER,
+            is_dm BOOLEAN DEFAULT 0,
+            channel_type TEXT DEFAULT 'discord',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+
+    "attachment_blobs": """
+        CREATE TABLE IF NOT EXISTS attachment_blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+    """,
+
+    "attachment_names": """
+        CREATE TABLE IF NOT EXISTS attachment_names (
+            path TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            source TEXT NOT NULL,
+            source_key TEXT,
+            created_at REAL NOT NULL
+        )
+    """,
+
+    "sticker_uploads": """
+        CREATE TABLE IF NOT EXISTS sticker_uploads (
+            sha256 TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            url TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            uploaded_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )
+    """,
+
+    "weixin_upload_cache": """
+        CREATE TABLE IF NOT EXISTS weixin_upload_cache (
+            bot_id TEXT NOT NULL,
+            rawfilemd5 TEXT NOT NULL,
+            media_type INTEGER NOT NULL,
+            download_param TEXT NOT NULL,
+            aeskey TEXT NOT NULL,
+            filesize INTEGER NOT NULL,
+            uploaded_at REAL NOT NULL,
+            PRIMARY KEY (bot_id, rawfilemd5, media_type)
+        )
+    """,
+
+    "weixin_sync_state": """
+        CREATE TABLE IF NOT EXISTS weixin_sync_state (
+            bot_id TEXT PRIMARY KEY,
+            get_updates_buf TEXT NOT NULL,
+            recent_message_ids TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """,
+
     "channel_settings": """
         CREATE TABLE IF NOT EXISTS channel_settings (
             channel_id TEXT PRIMARY KEY,
@@ -156,6 +219,16 @@ INDEXES: Dict[str, List[str]] = {
         "CREATE INDEX IF NOT EXISTS idx_message_requests_status ON message_requests(status)",
         "CREATE INDEX IF NOT EXISTS idx_message_requests_created_at ON message_requests(created_at)",
     ],
+    "attachment_blobs": [
+        "CREATE INDEX IF NOT EXISTS idx_attachment_blobs_last_used_at ON attachment_blobs(last_used_at)",
+    ],
+    "attachment_names": [
+        "CREATE INDEX IF NOT EXISTS idx_attachment_names_sha256 ON attachment_names(sha256)",
+        "CREATE INDEX IF NOT EXISTS idx_attachment_names_source ON attachment_names(source, source_key)",
+    ],
+    "weixin_upload_cache": [
+        "CREATE INDEX IF NOT EXISTS idx_weixin_upload_cache_uploaded_at ON weixin_upload_cache(uploaded_at)",
+    ],
     "message_sequence": [
         "CREATE INDEX IF NOT EXISTS idx_message_sequence_message_id ON message_sequence(message_id)",
         "CREATE INDEX IF NOT EXISTS idx_message_sequence_status ON message_sequence(status)",
@@ -213,6 +286,23 @@ MIGRATIONS: List[Dict] = [
             "ALTER TABLE message_sequence ADD COLUMN tool_use_index INTEGER",
         ]
     },
+
+    # Version 6: messages 表投递模式（提醒直接投递）
+    {
+        "version": 6,
+        "alterations": [
+            "ALTER TABLE messages ADD COLUMN delivery TEXT DEFAULT 'claude'",
+        ]
+    },
+
+    # Version 7: messages 表流式预览（Discord 实时编辑模式）
+    {
+        "version": 7,
+        "alterations": [
+            "ALTER TABLE messages ADD COLUMN stream_preview TEXT",
+            "ALTER TABLE messages ADD COLUMN stream_preview_block INTEGER DEFAULT 0",
+        ]
+    },
 ]
 
 
@@ -117,16 +117,19 @@ class MessageSequenceManager:
             limit: 最多返回多少条消息，默认 1
 
         Returns:
-            消息列表，每条消息包含：id, discord_channel_id, discord_user_id, is_dm, channel_type, username, context_token
+            消息列表，每条消息包含：id, discord_channel_id, discord_user_id, is_dm, channel_type, username, context_token,
+            pending_count（待发送序列项数）
         """
         conn = self._get_connection()
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT DISTINCT m.id, m.discord_channel_id, m.discord_user_id, m.is_dm, m.channel_type, m.username, m.context_token
+            SELECT m.id, m.discord_channel_id, m.discord_user_id, m.is_dm, m.channel_type, m.username, m.context_token,
+                   COUNT(ms.id)
             FROM message_sequence ms
             INNER JOIN messages m ON ms.message_id = m.id
             WHERE ms.status = 'pending' AND m.channel_type = ?
+            GROUP BY m.id
             ORDER BY m.id ASC
             LIMIT ?
         """, (channel_type, limit))
@@ -143,7 +146,8 @@ class MessageSequenceManager:
                 "is_dm": bool(row[3]),
                 "channel_type": row[4],
                 "username": row[5],
-                "context_token": row[6]
+                "context_token": row[6],
+                "pending_count": row[7]
             })
 
         return messages
@@ -103,6 +103,68 @@ class SessionManager:
 
         return session_key, session_id, session_created, working_dir
 
+    def add_warmup_hint(self, session_key: str, channel_id: int = None, user_id: int = None,
+                        is_dm: bool = False, channel_type: str = 'discord'):
+        """
+        写入会话预热提示（Bot 检测到用户可能即将发消息时调用）
+
+        同一 session_key 只保留最新的一条提示。
+
+        Args:
+            session_key: 会话标识
+            channel_id: 频道 ID（频道消息使用）
+            user_id: 用户 ID（私聊消息使用）
+            is_dm: 是否为私聊
+            channel_type: 频道类型（discord/weixin）
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            INSERT OR REPLACE INTO session_warmup_hints
+            (session_key, channel_id, user_id, is_dm, channel_type, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (session_key, channel_id, user_id, 1 if is_dm else 0, channel_type, datetime.now().isoformat()))
+
+        conn.commit()
+        conn.close()
+
+    def pop_warmup_hints(self) -> list:
+        """
+        取出并删除所有会话预热提示
+
+        Returns:
+            提示列表，每条包含 session_key, channel_id, user_id, is_dm, channel_type, created_at
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT session_key, channel_id, user_id, is_dm, channel_type, created_at
+            FROM session_warmup_hints
+        """)
+        rows = cursor.fetchall()
+
+        if rows:
+            cursor.executemany(
+                "DELETE FROM session_warmup_hints WHERE session_key = ? AND created_at = ?",
+                [(row[0], row[5]) for row in rows]
+            )
+            conn.commit()
+        conn.close()
+
+        return [
+            {
+                "session_key": row[0],
+                "channel_id": row[1],
+                "user_id": row[2],
+                "is_dm": bool(row[3]),
+                "channel_type": row[4],
+                "created_at": row[5]
+            }
+            for row in rows
+        ]
+
     def get_claude_session_path(self, working_dir: str) -> str:
         """
         获取 Claude Code 会话文件路径（~/.claude/projects）
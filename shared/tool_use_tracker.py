@@ -266,7 +266,7 @@ class ToolUseTracker:
             channel_type: 可选，按频道类型过滤（'discord' 或 'weixin'）
 
         Returns:
-            待处理的工具执行结果列表
+            待处理的工具执行结果列表（按频道类型过滤时包含卡片所在的 channel_id 和 is_dm）
         """
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -274,7 +274,7 @@ class ToolUseTracker:
         if channel_type:
             # JOIN tool_use_messages 来过滤频道类型
             cursor.execute("""
-                SELECT r.message_id, r.tool_use_index, r.success
+                SELECT r.message_id, r.tool_use_index, r.success, m.channel_id, m.is_dm
                 FROM tool_use_results r
                 INNER JOIN tool_use_messages m ON r.message_id = m.message_id AND r.tool_use_index = m.tool_use_index
                 WHERE r.processed = 0 AND m.channel_type = ?
@@ -282,7 +282,7 @@ class ToolUseTracker:
             """, (channel_type,))
         else:
             cursor.execute("""
-                SELECT message_id, tool_use_index, success
+                SELECT message_id, tool_use_index, success, NULL, NULL
                 FROM tool_use_results
                 WHERE processed = 0
                 ORDER BY created_at ASC
@@ -296,7 +296,93 @@ class ToolUseTracker:
             results.append({
                 "message_id": row[0],
                 "tool_use_index": row[1],
-                "success": bool(row[2])
+                "success": bool(row[2]),
+                "channel_id": row[3],
+                "is_dm": bool(row[4]) if row[4] is not None else None
+            })
+
+        return results
+
+    def has_pending_tool_use_results(self, message_id: int, channel_type: str = None) -> bool:
+        """
+        消息是否还有未处理的工具执行结果
+
+        Args:
+            message_id: 消息 ID
+            channel_type: 可选，按频道类型过滤（'discord' 或 'weixin'）
+
+        Returns:
+            是否存在未处理的结果
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        if channel_type:
+            cursor.execute("""
+                SELECT 1
+                FROM tool_use_results r
+                INNER JOIN tool_use_messages m ON r.message_id = m.message_id AND r.tool_use_index = m.tool_use_index
+                WHERE r.message_id = ? AND r.processed = 0 AND m.channel_type = ?
+                LIMIT 1
+            """, (message_id, channel_type))
+        else:
+            cursor.execute("""
+                SELECT 1 FROM tool_use_results
+                WHERE message_id = ? AND processed = 0
+                LIMIT 1
+            """, (message_id,))
+
+        row = cursor.fetchone()
+        conn.close()
+        return row is not None
+
+    def get_pending_tool_use_results_with_messages(self, channel_type: str) -> List[Dict]:
+        """
+        获取待处理的工具执行结果，并在同一次查询中带上发送通知所需的消息字段
+
+        Args:
+            channel_type: 频道类型（'discord' 或 'weixin'）
+
+        Returns:
+            待处理的工具执行结果列表（消息已不存在时 username 为 None，tool_use 为 None）
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT r.message_id, r.tool_use_index, r.success,
+                   msg.username, msg.discord_channel_id, msg.discord_user_id, msg.context_token, msg.tool_uses
+            FROM tool_use_results r
+            INNER JOIN tool_use_messages m ON r.message_id = m.message_id AND r.tool_use_index = m.tool_use_index
+            LEFT JOIN messages msg ON msg.id = r.message_id
+            WHERE r.processed = 0 AND m.channel_type = ?
+            ORDER BY r.created_at ASC
+        """, (channel_type,))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        results = []
+        for row in rows:
+            tool_use_index = row[1]
+            tool_use = None
+            if row[7]:
+                try:
+                    tool_uses = json.loads(row[7])
+                    if tool_use_index < len(tool_uses):
+                        tool_use = tool_uses[tool_use_index]
+                except json.JSONDecodeError:
+                    pass
+
+            results.append({
+                "message_id": row[0],
+                "tool_use_index": tool_use_index,
+                "success": bool(row[2]),
+                "username": row[3],
+                "channel_id": row[4],
+                "user_id": row[5],
+                "context_token": row[6],
+                "tool_use": tool_use
             })
 
         return results